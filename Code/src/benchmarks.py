@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from os import path, makedirs
+from timeit import default_timer
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from metrics import peakRss, resetPeakRss, currentRss
+from concensusFn import least_misery, mean, multiplicative, most_pleasure, borda_count, purity
+import numpy as np
+import pandas
+import argparse
+import datetime
+import platform
+import subprocess
+import random
+import json
+import sys
+import logging
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+RESULTS_DIR = path.join(CURRENT_DIR, '..', 'results')
+
+logger = logging.getLogger('benchmarks')
+logger.setLevel(logging.DEBUG)
+
+SEED = 1985
+# (users, movies, mean ratings by user). MovieLens users rate ~150 movies
+SCALES = OrderedDict([
+    ('small', (1000, 500, 150)),
+    ('medium', (5000, 1000, 150)),
+    ('large', (20000, 2000, 150))
+])
+# Relative increase of wall time or memory flagged as a regression
+DEFAULT_TOLERANCE = 0.2
+# Memory increases below this are ignored (MB)
+MEMORY_SLACK = 10
+
+CONCENSUS_FNS = [least_misery, mean, multiplicative, most_pleasure, purity, borda_count]
+
+
+def syntheticRatings(num_users, num_movies, ratings_by_user, seed=SEED, num_clusters=10):
+    """
+    Synthetic ratings of $num_users with $ratings_by_user on average (see
+    SyntheticDatasetGenerator)
+    """
+    generator = SyntheticDatasetGenerator(num_users, num_movies, ratings_by_user, num_clusters=num_clusters, seed=seed)
+    return generator.getRatings()
+
+
+def _randomGroups(ratings, rng, num_groups, size, num_users=None):
+    # Random groups of the $num_users most active users (all if None)
+    user_ids = ratings.groupby('userId').size().sort_values(ascending=False).index.values
+    user_ids = list(user_ids[:num_users])
+    return [rng.sample(user_ids, size) for _ in range(num_groups)]
+
+
+# Every benchmark prepares its inputs and returns the function to time and
+# the number of items it processes
+
+def benchGetMatrix(generator, ratings, rng):
+    # The large scale is over the dense size limit, but this is the dense matrix of the baseline
+    return lambda: generator.getMatrix(ratings, max_cells=None), len(ratings)
+
+
+def benchGetDistances(generator, ratings, rng):
+    users = rng.sample(list(ratings.userId.unique()), 20)
+    generator.getDistanceEngine(ratings)
+    return lambda: [generator.getDistances(ratings, user_id) for user_id in users], len(users)
+
+
+def benchGetCoRatedMovies(generator, ratings, rng):
+    groups = _randomGroups(ratings, rng, 200, 4)
+    generator.getCoRatedIndex(ratings)
+    return lambda: [generator.getCoRatedMovies(ratings, group) for group in groups], len(groups)
+
+
+def benchGetGroupUsers(generator, ratings, rng):
+    generator.getCoRatedIndex(ratings)
+    generator.getNeighbourIndex(ratings)
+    seed = rng.random()
+
+    def run():
+        return list(generator.getGroupUsers(ratings, 5, 3, rng=random.Random(seed)))
+    # Groups are the same in every run
+    return run, len(run())
+
+
+def _groupMatrices(generator, ratings, rng):
+    # Groups of active users, so they have enough co-rated movies
+    groups = _randomGroups(ratings, rng, 20, 3, num_users=100)
+    return groups, [generator.getGroupMatrix(ratings, group) for group in groups]
+
+
+def benchEvaluateConcensusFns(generator, ratings, rng):
+    groups, _ = _groupMatrices(generator, ratings, rng)
+    concensus_fns = [{'name': fn.__name__, 'fn': fn} for fn in CONCENSUS_FNS]
+    return lambda: [list(generator.evaluateConcensusFns(ratings, group, concensus_fns)) for group in groups], len(groups)
+
+
+def benchConcensusFn(concensus_fn):
+    def bench(generator, ratings, rng):
+        _, group_matrices = _groupMatrices(generator, ratings, rng)
+        return lambda: [concensus_fn(group_matrix) for group_matrix in group_matrices], len(group_matrices)
+    return bench
+
+
+BENCHMARKS = OrderedDict([
+    ('getMatrix', benchGetMatrix),
+    ('getDistances', benchGetDistances),
+    ('getCoRatedMovies', benchGetCoRatedMovies),
+    ('getGroupUsers', benchGetGroupUsers),
+    ('evaluateConcensusFns', benchEvaluateConcensusFns)
+] + [('concensusFn.%s' % fn.__name__, benchConcensusFn(fn)) for fn in CONCENSUS_FNS])
+
+
+def runBenchmark(name, scale, repeat=3, seed=SEED):
+    """
+    Run the benchmark $name at $scale in this process. Returns the best
+    wall time of $repeat runs, its throughput (items / s) and the peak
+    memory of the process and its increase while running the benchmark.
+    """
+    num_users, num_movies, ratings_by_user = SCALES[scale]
+    ratings = syntheticRatings(num_users, num_movies, ratings_by_user, seed)
+    generator = DatasetGenerator(data=ratings)
+    run, items = BENCHMARKS[name](generator, ratings, random.Random(seed))
+
+    resetPeakRss()
+    rss = currentRss()
+    wall_times = []
+    for _ in range(repeat):
+        start = default_timer()
+        run()
+        wall_times.append(default_timer() - start)
+    wall_time = min(wall_times)
+    return {
+        'benchmark': name,
+        'scale': scale,
+        'ratings': len(ratings),
+        'items': items,
+        'wall_time': wall_time,
+        'throughput': items / wall_time if wall_time > 0 else None,
+        'peak_rss_mb': peakRss(),
+        'peak_delta_mb': max(peakRss() - rss, 0)
+    }
+
+
+def measure(name, scale, repeat=3, seed=SEED):
+    """
+    Run the benchmark in a new process, so its peak memory is not the peak
+    of the previous benchmarks
+    """
+    output = subprocess.check_output([sys.executable, path.abspath(__file__), '--run-one', name, scale,
+                                      '--repeat', str(repeat), '--seed', str(seed)])
+    return json.loads(output)
+
+
+def runBenchmarks(names, scales, repeat=3, seed=SEED, subprocesses=True):
+    results = []
+    for scale in scales:
+        for name in names:
+            logger.info("Running %s at %s scale", name, scale)
+            if subprocesses:
+                result = measure(name, scale, repeat, seed)
+            else:
+                result = runBenchmark(name, scale, repeat, seed)
+            logger.info("%s %s: %.4fs, %.1f items/s, %.1f MB", name, scale, result['wall_time'],
+                        result['throughput'] or 0, result['peak_delta_mb'])
+            results.append(result)
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pandas.__version__,
+            'machine': platform.platform(),
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def compareResults(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions of $results against $baseline: the benchmarks (at the same
+    scale) whose wall time or memory increase is more than $tolerance times
+    the baseline
+    """
+    baseline_results = dict(((r['benchmark'], r['scale']), r) for r in baseline['results'])
+    regressions = []
+    for result in results['results']:
+        previous = baseline_results.get((result['benchmark'], result['scale']))
+        if previous is None:
+            continue
+        for metric, slack in [('wall_time', 0), ('peak_delta_mb', MEMORY_SLACK)]:
+            if result[metric] > previous[metric] * (1 + tolerance) and result[metric] - previous[metric] > slack:
+                regressions.append({
+                    'benchmark': result['benchmark'],
+                    'scale': result['scale'],
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'value': result[metric],
+                    'ratio': result[metric] / previous[metric] if previous[metric] else float('inf')
+                })
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the dataset generation and concensus functions')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS.keys(), default=BENCHMARKS.keys())
+    parser.add_argument('--scales', nargs='+', choices=SCALES.keys(), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default=path.join(RESULTS_DIR, 'benchmarks.json'))
+    parser.add_argument('--baseline', help='Results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--run-one', nargs=2, metavar=('BENCHMARK', 'SCALE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        logging.basicConfig(level=logging.WARNING)
+        logging.getLogger().handlers[0].setLevel(logging.WARNING)
+        print json.dumps(runBenchmark(args.run_one[0], args.run_one[1], args.repeat, args.seed))
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger().handlers[0].setLevel(logging.INFO)
+    results = runBenchmarks(args.benchmarks, args.scales, args.repeat, args.seed)
+
+    if not path.isdir(path.dirname(args.output)):
+        makedirs(path.dirname(args.output))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    logger.info("Results saved in %s", args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compareResults(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            logger.warning("Regression in %(benchmark)s (%(scale)s) %(metric)s: %(baseline).4f -> %(value).4f (x%(ratio).2f)",
+                           regression)
+        sys.exit(1 if regressions else 0)
@@ -1,200 +1,464 @@
 #!/usr/bin/env python
 
-import json
-from os import path
-from datasetGenerator import DatasetGenerator
-from concensusFn import least_misery, mean, multiplicative, most_pleasure, borda_count, purity
+from os import path, listdir, makedirs, rename, getpid
+from errors import EvaluationStoppedError
+import argparse
 import logging
-import matplotlib.pyplot as plt
-import numpy as np
-
+import json
 import sys
 import signal
 
+# Heavy modules (pandas, scipy, matplotlib) are imported by the stages that
+# use them, so quick commands start fast and the forked workers don't load
+# the plotting modules
+
 CURRENT_DIR = path.dirname(path.abspath(__file__))
 DIR_CACHE_MODELS = path.join(CURRENT_DIR, 'cache')
-
-logging.basicConfig()
+DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
+RESULTS_DIR = path.join(CURRENT_DIR, '..', 'results')
 
 logger = logging.getLogger('build_min_data')
 logger.setLevel(logging.DEBUG)
 
-# Signal handler
-def exit(signum, frame):
-    sig_name = tuple(v for v, k in signal.__dict__.items() if k == signum)[0]
-    logger.warn('Received signal %s', sig_name)
-    sys.exit(0)
-
-for s in [signal.SIGINT, signal.SIGTERM, signal.SIGABRT]:
-    signal.signal(s, exit)
-
-
-CURRENT_DIR = path.dirname(path.abspath(__file__))
-DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
-RESULTS_DIR = path.join(CURRENT_DIR, '..', 'results')
-
 dataFilename = path.join(DATA_DIR, 'ratings.csv')
 
-logger.debug("Opening database %s" % dataFilename)
-generator = DatasetGenerator(dataFilename, seed=1985)
+SEED = 1985
+# Processes generating groups (None to use all the cpus)
+GROUPS_PROCESSES = None
+# Processes rendering the graphs (None to use all the cpus)
+PLOT_PROCESSES = None
+# Remove users with less than MIN_RATINGS rated movies
+MIN_RATINGS = 20
+# Keep the ratings as CompactRatings (groups are lists of user codes)
+COMPACT = True
+# (number of groups, group size)
+GROUP_SIZES = [
+    (50, 2),
+    (18, 3),
+    (16, 4),
+    (7, 5),
+    (5, 6),
+    (4, 7)
+]
+N_SUCCESS = 3
+# Movies co-rated by all the users of a group (None for the GroupSampler default)
+MIN_CO_RATED = None
+# Evaluate the groups on this number of candidate movies, with the missing
+# ratings predicted by an ALS model (None to use only co-rated movies)
+CANDIDATES = None
+# With candidates, the movies of a valid group only have to be rated by this
+# share of its members (see GroupSampler)
+CANDIDATES_COVERAGE = 0.5
+# Models trained by train_model, by cache key
+DIR_MODELS = path.join(DIR_CACHE_MODELS, 'models')
+# Directory of the evaluation results store (in the results directory)
+EVALUATION_STORE = 'evaluation'
+# Work queues of the evaluation, one by concensus function. Workers sharing
+# the directory evaluate shards of the same queues
+QUEUE_DIR = path.join(DIR_CACHE_MODELS, 'queues')
+# Groups evaluated between checkpoints
+CHECKPOINT_GROUPS = 20
+# Names of the concensus functions of concensusFn that are evaluated
+CONCENSUS_ALG = [
+    ("Least misery", 'least_misery'),
+    ("Mean", 'mean'),
+    ("Multiplicative", 'multiplicative'),
+    ("Most pleasure", 'most_pleasure'),
+    ("Purity", 'purity'),
+    ("Borda count", 'borda_count')
+]
 
-# Filter dataset. (Remove users with less than 20 ratings)
-logger.debug("Filter dataset")
-ratings = generator.filterDataset()
 
-# Generating groups of users
-def get_groups(generator, ratings):
-    groups_cache_file = path.join(DIR_CACHE_MODELS, 'groups.json')
-    # Read grops from cache
-    try:
-        with open(groups_cache_file) as f:
-            groups = json.load(f)
-
-        logger.debug("Groups read from cache")
-        return groups
-    except:
-        pass
-
-    group_sizes = [
-        (50, 2),
-        (18, 3),
-        (16, 4),
-        (7, 5),
-        (5, 6),
-        (4, 7)
-    ]
-    groups = []
-    for num_groups, size in group_sizes:
-        logger.debug("Generating %d groups of %d users", num_groups, size)
-        for group, group_type in generator.getGroupUsers(ratings, num_groups, size):
-            logger.debug("Group generated: %s -> %d", group_type, len(group))
-            groups.append((group, group_type))
-
-    # Save groups in cache
-    logger.debug("Saving groups in cache")
+# Signal handler
+def exit(signum, frame):
+    sig_name = tuple(v for v, k in signal.__dict__.items() if k == signum)[0]
+    logger.warn('Received signal %s', sig_name)
+    # A running evaluation stops after saving its current shard, so it can be continued
+    evaluation_queue = sys.modules.get('evaluationQueue')
+    if evaluation_queue is None or not evaluation_queue.requestStop():
+        sys.exit(0)
+
+
+def stage_cache(directory=path.join(DIR_CACHE_MODELS, 'stages')):
+    from stageCache import StageCache
+    return StageCache(directory)
+
+
+def dataset_inputs(dataset):
+    """
+    Files of $dataset (a csv file or a ratings store) hashed by the cache keys
+    """
+    if path.isdir(dataset):
+        return [path.join(dataset, filename) for filename in sorted(listdir(dataset))]
+    return [dataset]
+
+
+def convert_ratings(csv_filename, directory):
+    """
+    Convert the ratings of $csv_filename to a ratings store in $directory
+    """
+    from ratingsStore import convertCsv
+    convertCsv(csv_filename, directory)
+
+
+def filter_ratings(cache, dataset=dataFilename, min_ratings=MIN_RATINGS, compact=COMPACT):
+    """
+    Ratings of $dataset without the users with less than $min_ratings rated
+    movies. Returns the ratings and the cache key of the stage.
+    """
+    from datasetGenerator import DatasetGenerator
+    from metrics import metrics
+    import datasetGenerator
+    import compactRatings
+    import ratingsStore
+
+    def filter():
+        logger.debug("Opening database %s" % dataset)
+        return DatasetGenerator(dataset, compact=compact).filterDataset(min_ratings)
+
+    logger.debug("Filter dataset")
+    filter_key = cache.key('filter', {'num_ratings': min_ratings, 'compact': compact}, inputs=dataset_inputs(dataset),
+                           code=[datasetGenerator, compactRatings, ratingsStore])
+    with metrics.timer('stage.filter'):
+        return cache.cached(filter_key, filter), filter_key
+
+
+def generate_groups(cache, generator, ratings, filter_key, group_sizes=GROUP_SIZES, seed=SEED, processes=GROUPS_PROCESSES):
+    """
+    Groups of users of $ratings for every (number of groups, group size) in
+    $group_sizes. Returns a list of (group, group_type) and the cache key of
+    the stage.
+    """
+    from parallelGroups import generateGroups
+    from metrics import metrics
+    import datasetGenerator
+    import parallelGroups
+    import groupSampler
+    import distances
+    import coRatedIndex
+    import neighbourIndex
+    import ratingMatrix
+    import compactRatings
+
+    logger.debug("Generating groups")
+    groups_key = cache.key('groups', {'group_sizes': group_sizes, 'seed': seed, 'min_co_rated': generator.min_co_rated,
+                                      'min_coverage': generator.min_coverage},
+                           code=[datasetGenerator, parallelGroups, groupSampler, distances, coRatedIndex, neighbourIndex, ratingMatrix,
+                                 compactRatings],
+                           dependencies=[filter_key])
+    with metrics.timer('stage.groups'):
+        return cache.cached(groups_key, lambda: generateGroups(generator, ratings, group_sizes, seed, processes=processes)), groups_key
+
+
+def train_model(cache, generator, ratings, filter_key, directory=DIR_MODELS, seed=SEED):
+    """
+    ALS model of $ratings, saved in $directory so it is trained once.
+    Returns the model and its key.
+    """
+    from matrixFactorization import ALSModel
+    from metrics import metrics
+    import matrixFactorization
+    import ratingMatrix
+
+    model = ALSModel(seed=seed)
+    model_key = cache.key('model', model.params(), code=[matrixFactorization, ratingMatrix], dependencies=[filter_key])
+    model_filename = path.join(directory, model_key + '.npz')
+    if path.isfile(model_filename):
+        logger.debug("Reading model %s", model_filename)
+        return ALSModel.load(model_filename), model_key
+
+    logger.debug("Training model")
+    with metrics.timer('stage.model'):
+        model.fit(generator.getRatingMatrix(ratings))
+    if not path.isdir(directory):
+        makedirs(directory)
+    tmp_filename = '%s.%d.npz' % (model_filename[:-len('.npz')], getpid())
+    model.save(tmp_filename)
+    rename(tmp_filename, model_filename)
+    return model, model_key
+
+
+def group_matrices(cache, generator, ratings, groups, filter_key, groups_key, model=None, model_key=None,
+                   num_candidates=CANDIDATES):
+    """
+    Matrices of the movies co-rated by every group, or of $num_candidates
+    movies completed with $model if given. Returns the matrices and the
+    cache key of the stage.
+    """
+    from metrics import metrics
+    import datasetGenerator
+    import compactRatings
+    import coRatedIndex
+    import ratingMatrix
+    import matrixFactorization
+
+    logger.debug("Getting group matrices")
+    params = None if model is None else {'num_candidates': num_candidates}
+    matrices_key = cache.key('groupMatrices', params,
+                             code=[datasetGenerator, compactRatings, coRatedIndex, ratingMatrix, matrixFactorization],
+                             dependencies=[filter_key, groups_key] + ([model_key] if model is not None else []))
+    with metrics.timer('stage.groupMatrices'):
+        return cache.cached(matrices_key, lambda: [generator.getGroupMatrix(ratings, group, model, num_candidates)
+                                                   for group, _ in groups]), matrices_key
+
+
+def concensus_algorithms(names=CONCENSUS_ALG):
+    """
+    Concensus functions of the (label, function name) pairs in $names
+    """
+    import concensusFn
+    return [{"name": name, "fn": getattr(concensusFn, fn_name)} for name, fn_name in names]
+
+
+def evaluate_concensus(concensus, matrices, n_success=N_SUCCESS):
+    """
+    Success and unsuccess values of $concensus for every group matrix in
+    $matrices. All the groups are scored at once by the kernel of the
+    function if it has one.
+    """
+    from concensusFn import stack_groups, KERNELS
+    from evaluation import evaluate
+    import numpy as np
+
+    logger.debug("Evaluating %s", concensus['name'])
+    values, mask = stack_groups(matrices)
+    kernel = KERNELS.get(concensus['fn'])
+    if kernel and matrices:
+        scores = kernel(values, mask)
+    else:
+        scores = np.full(values.shape[::2], np.nan)
+        for i, group_matrix in enumerate(matrices):
+            scores[i, :group_matrix.shape[1]] = concensus['fn'](group_matrix).values
+    evaluation_results = evaluate(scores[np.newaxis], values, mask, ns=[n_success])
+    return evaluation_results['success'][n_success][0], evaluation_results['unsuccess'][n_success][0]
+
+
+def evaluate_groups(cache, groups, matrices, matrices_key, directory, concensus_alg=None, n_success=N_SUCCESS,
+                    queue_directory=QUEUE_DIR, checkpoint_groups=CHECKPOINT_GROUPS, worker_only=False):
+    """
+    Evaluate every concensus function of $concensus_alg (all if None) with
+    the $groups and their $matrices. The results are saved in a new results
+    store in $directory, which is returned.
+
+    The groups of a function are evaluated in shards of $checkpoint_groups
+    by a work queue in $queue_directory, so a stopped evaluation continues
+    with the shards that are not done and the processes sharing
+    $queue_directory evaluate the shards of the same queues. If
+    $worker_only, only the shards are evaluated and None is returned.
+    """
+    from evaluationQueue import EvaluationQueue
+    from resultsStore import ResultsStore
+    from metrics import metrics
+    from pandas import DataFrame
+    import evaluation
+    import concensusFn
+    import numpy as np
+
+    def evaluate_shard(concensus):
+        def evaluate(start, stop):
+            success_values, unsuccess_values = evaluate_concensus(concensus, matrices[start:stop], n_success)
+            return {'success': success_values, 'unsuccess': unsuccess_values}
+        return evaluate
+
+    if concensus_alg is None:
+        concensus_alg = concensus_algorithms()
+    # Every function is cached on its own, so only new or changed functions are evaluated
+    evaluation_keys = []
+    queues = []
+    for concensus in concensus_alg:
+        evaluation_key = cache.key('evaluation', {'concensus_name': concensus['name'], 'n_success': n_success},
+                                   code=[concensus['fn'], concensusFn, evaluation, evaluate_concensus],
+                                   dependencies=[matrices_key])
+        evaluation_keys.append(evaluation_key)
+        if evaluation_key not in cache and not groups:
+            # A queue without shards has no results to concatenate
+            cache.save(evaluation_key, evaluate_concensus(concensus, [], n_success))
+        elif evaluation_key not in cache:
+            queue = EvaluationQueue(path.join(queue_directory, evaluation_key), len(groups), checkpoint_groups)
+            queues.append((concensus, evaluation_key, queue))
+
+    with metrics.timer('stage.evaluation'):
+        # Shards of all the functions are evaluated before waiting for the shards of other workers
+        for concensus, _, queue in queues:
+            queue.run(evaluate_shard(concensus), wait=False)
+        if worker_only:
+            return None
+        for concensus, evaluation_key, queue in queues:
+            values = queue.run(evaluate_shard(concensus))
+            cache.save(evaluation_key, (values['success'], values['unsuccess']))
+
+    # Results of every group and concensus function
+    results = ResultsStore(directory, reset=True)
+    group_sizes = np.array([len(group) for group, _ in groups])
+    group_types = [group_type for _, group_type in groups]
+    for concensus, evaluation_key in zip(concensus_alg, evaluation_keys):
+        success_values, unsuccess_values = cache.load(evaluation_key)
+        for (group, group_type), evaluation_success, evaluation_unsuccess in zip(groups, success_values, unsuccess_values):
+            # TODO show number of co-rated movies
+            logger.debug("Group_size: %d, Group_type: %s, Concensus_alg: %s, Success: %.2f%%, Unsuccess: %.2f%%", len(group), group_type, concensus['name'], evaluation_success, evaluation_unsuccess)
+        results.append(DataFrame({
+            "group": np.arange(len(groups), dtype=np.int32),
+            "concensus_name": concensus['name'],
+            "success_value": np.asarray(success_values, dtype=np.float64),
+            "unsuccess_value": np.asarray(unsuccess_values, dtype=np.float64),
+            "group_type": group_types,
+            "group_size": group_sizes.astype(np.int32)
+        }, columns=["group", "concensus_name", "group_type", "group_size", "success_value", "unsuccess_value"]))
+    return results
+
+
+def plot_results(directory, output=RESULTS_DIR, processes=PLOT_PROCESSES):
+    """
+    Save the graphs of the results store in $directory in $output. Returns
+    the image filenames.
+    """
+    from resultsStore import ResultsStore
+    from resultsPlots import plotResults
+    from metrics import metrics
+
+    with metrics.timer('stage.plots'):
+        return plotResults(ResultsStore(directory), output, processes=processes)
+
+
+def dataset_stats(ratings):
+    """
+    Number of users, movies and ratings of $ratings and the mean and standard
+    deviation of the number of ratings by user and by movie
+    """
+    from datasetGenerator import DatasetGenerator
+    stats = DatasetGenerator(data=ratings).getStatsFromDataset(ratings)
+    return dict((name, value) for name, value in stats.items() if not name.startswith(('count', 'hist')))
+
+
+def raw_dataset_stats(dataset, min_ratings=MIN_RATINGS, top=10, processes=1):
+    """
+    Stats of the whole $dataset read in chunks, with the users kept by the
+    filter with $min_ratings and the $top most rated movies and most active
+    users. The row ranges of a ratings store are read by $processes processes.
+    """
+    from datasetStats import computeStats
+    return computeStats(dataset, processes=processes).summary(min_ratings, top)
+
+
+def run(args):
+    """
+    Run the command of the parsed arguments $args. Every command runs the
+    stages it depends on, which are read from the cache when they didn't change.
+    """
+    from datasetGenerator import DatasetGenerator
+
+    if args.command == 'convert':
+        convert_ratings(args.dataset, args.store)
+        return
+    if args.command == 'plot':
+        for filename in plot_results(args.store, args.results, args.plot_processes):
+            logger.debug("Saved %s", filename)
+        return
+
+    if args.command == 'stats' and args.raw:
+        print json.dumps(raw_dataset_stats(args.dataset, args.min_ratings, args.top, args.processes),
+                         indent=2, sort_keys=True, default=float)
+        return
+
+    cache = stage_cache(args.cache)
+    ratings, filter_key = filter_ratings(cache, args.dataset, args.min_ratings, args.compact)
+    if args.command == 'filter':
+        logger.info("%d ratings after the filter", len(ratings))
+        return
+    if args.command == 'stats':
+        print json.dumps(dataset_stats(ratings), indent=2, sort_keys=True, default=float)
+        return
+
+    generator = DatasetGenerator(data=ratings, seed=args.seed)
+    if args.min_co_rated is not None:
+        generator.min_co_rated = args.min_co_rated
+    if args.candidates:
+        # The missing ratings are predicted, so the groups don't have to co-rate all the movies
+        generator.min_coverage = args.min_coverage
+    groups, groups_key = generate_groups(cache, generator, ratings, filter_key, GROUP_SIZES, args.seed, args.processes)
+    if args.command == 'generate-groups':
+        logger.info("%d groups generated", len(groups))
+        return
+
+    model = model_key = None
+    if args.candidates:
+        model, model_key = train_model(cache, generator, ratings, filter_key, seed=args.seed)
+    matrices, matrices_key = group_matrices(cache, generator, ratings, groups, filter_key, groups_key, model, model_key,
+                                            args.candidates)
+    store = evaluate_groups(cache, groups, matrices, matrices_key, args.store, n_success=args.n_success,
+                            queue_directory=args.queue, checkpoint_groups=args.checkpoint_groups,
+                            worker_only=args.worker_only)
+    if store is not None and args.command == 'all':
+        plot_results(store.directory, args.results, args.plot_processes)
+
+
+def arguments_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dataset', default=dataFilename, help='Ratings csv file or ratings store')
+    common.add_argument('--cache', default=path.join(DIR_CACHE_MODELS, 'stages'))
+    common.add_argument('--results', default=RESULTS_DIR)
+    common.add_argument('--store', default=None, help='Results store (ratings store of convert)')
+    common.add_argument('--min-ratings', type=int, default=MIN_RATINGS)
+    common.add_argument('--no-compact', dest='compact', action='store_false', default=COMPACT)
+    common.add_argument('--seed', type=int, default=SEED)
+    common.add_argument('--n-success', type=int, default=N_SUCCESS)
+    common.add_argument('--min-co-rated', type=int, default=MIN_CO_RATED)
+    common.add_argument('--candidates', type=int, default=CANDIDATES,
+                        help='Candidate movies of every group, completed with an ALS model')
+    common.add_argument('--min-coverage', type=float, default=CANDIDATES_COVERAGE,
+                        help='Share of the members of a group that rate its movies with --candidates')
+    common.add_argument('--processes', type=int, default=GROUPS_PROCESSES, help='Processes generating groups')
+    common.add_argument('--plot-processes', type=int, default=PLOT_PROCESSES)
+    common.add_argument('--queue', default=QUEUE_DIR, help='Directory of the evaluation work queues (can be shared)')
+    common.add_argument('--checkpoint-groups', type=int, default=CHECKPOINT_GROUPS)
+    common.add_argument('--worker-only', action='store_true',
+                        help="Evaluate shards of the queues without waiting for other workers or saving the results")
+    common.add_argument('--metrics', action='store_true', help='Save the metrics of the stages in the results directory')
+
+    parser = argparse.ArgumentParser(description='Groups of users and evaluation of the concensus functions')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('convert', parents=[common], help='Convert the csv dataset to a ratings store')
+    commands.add_parser('filter', parents=[common], help='Remove the users with few ratings')
+    stats = commands.add_parser('stats', parents=[common], help='Stats of the filtered dataset')
+    stats.add_argument('--raw', action='store_true', help='Stats of the whole dataset read in chunks')
+    stats.add_argument('--top', type=int, default=10, help='Most rated movies and most active users of --raw')
+    commands.add_parser('generate-groups', parents=[common], help='Generate the groups of users')
+    commands.add_parser('evaluate', parents=[common], help='Evaluate the concensus functions with the groups')
+    commands.add_parser('plot', parents=[common], help='Plot the evaluation results')
+    commands.add_parser('all', parents=[common], help='Evaluate and plot')
+    return parser
+
+
+def parse_args(argv=None):
+    args = arguments_parser().parse_args(argv)
+    if args.store is None:
+        if args.command == 'convert':
+            args.store = path.splitext(args.dataset)[0]
+        else:
+            args.store = path.join(args.results, EVALUATION_STORE)
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig()
+    for s in [signal.SIGINT, signal.SIGTERM, signal.SIGABRT]:
+        signal.signal(s, exit)
+
+    args = parse_args(argv)
+    if args.metrics:
+        from metrics import metrics
+        metrics.enable()
     try:
-        with open(groups_cache_file, 'w') as f:
-            json.dump(groups, f, indent=4)
-    except:
-        logger.debug("Groups couldn't be saved in cache")
-
-    logger.debug("Groups saved in %s", groups_cache_file)
-    return groups
-
-groups = get_groups(generator, ratings)
-
-# Evaluate concensus algorithms
-results = []
-concensus_alg = [{
-    "name": "Least misery",
-    "fn": least_misery
-}, {
-    "name": "Mean",
-    "fn": mean
-}, {
-    "name": "Multiplicative",
-    "fn": multiplicative
-}, {
-    "name": "Most pleasure",
-    "fn": most_pleasure
-}, {
-    "name": "Purity",
-    "fn": purity
-}, {
-    "name": "Borda count",
-    "fn": borda_count
-}]
-group_sizes = set()
-for group, group_type in groups:
-    for concensus_fn_name, evaluation_success, evaluation_unsuccess in generator.evaluateConcensusFns(ratings, group, concensus_alg):
-        # TODO show number of co-rated movies
-        logger.debug("Group_size: %d, Group_type: %s, Concensus_alg: %s, Success: %.2f%%, Unsuccess: %.2f%%", len(group), group_type, concensus_fn_name, evaluation_success, evaluation_unsuccess)
-        group_sizes.add(len(group))
-        results.append({
-            "concensus_name": concensus_fn_name,
-            "success_value": evaluation_success,
-            "unsuccess_value": evaluation_unsuccess,
-            "group_type": group_type,
-            "group_size": len(group)
-        })
-
-
-# Process results
-def filter_results(results, value_type, group_size, concensus_name, group_type):
-    return [result[value_type] for result in results if result['group_size'] == group_size and result['concensus_name'] == concensus_name and result['group_type'] == group_type]
-
-def mean_and_std(values):
-    return np.mean(values), np.std(values)
-
-graphs = []
-for value_type in ["success_value", "unsuccess_value"]:
-    for group_size in group_sizes:
-        # Filter success values with group_size
-        graph_info = []
-        for concensus in concensus_alg:
-            means_values = []
-            std_values = []
-            for group_type in ["similar", "random", "disimilar"]:
-                mean_result, std_result = mean_and_std(filter_results(results, value_type, group_size, concensus['name'], group_type))
-                means_values.append(mean_result)
-                std_values.append(std_result)
-
-            graph_info.append({
-                'label': concensus['name'],
-                'means': means_values,
-                'std': std_values
-            })
-        graphs.append({
-            'data': graph_info,
-            'group_size': group_size,
-            'value_type': "Success 3" if value_type == "success_value" else "Unsuccess 3"
-        })
-
-
-# Plot results
-full_bar_width = 0.7
-bar_width = full_bar_width / len(concensus_alg)
-opacity = 0.4
-error_config = {'ecolor': '0.3'}
-
-for graph in graphs:
-    logger.debug("Show graph: %s group %d", graph['value_type'], graph['group_size'])
-    i = 0
-    for plot in graph['data']:
-        index = np.arange(len(plot['means'])) #similar, random and disimilar
-        plt.bar(index + (i * bar_width), plot['means'], bar_width, alpha=opacity, yerr=plot['std'], error_kw=error_config, label=plot['label'])
-        i += 1
-
-    plt.xlabel('Groups')
-    plt.ylabel(graph['value_type'])
-    plt.title('%s group %d' % (graph['value_type'], graph['group_size']))
-    plt.xticks(index + (bar_width * len(concensus_alg) / 2), ('Similar', 'Random', 'Disimilar'))
-    plt.legend()
-    plt.tight_layout()
-    #plt.show()
-    imagefilename = "{}_{}.png".format(graph['value_type'], graph['group_size'])
-    plt.savefig(path.join(RESULTS_DIR, imagefilename))
-    plt.clf()
-
-
-sys.exit(0)
-
-#bins = np.linspace(0, 2500, 100)
-#plt.hist(stats_100['countRatingsByUsers'], bins, normed=1, alpha=0.5)
-#plt.hist(stats_opt_40['countRatingsByUsers'], bins, normed=1, alpha=0.5)
-#plt.hist(stats_opt['countRatingsByUsers'], bins, normed=1, alpha=0.5)
-#plt.title("Histogram user ratings")
-#plt.show()
-
-
-# Save it
-#rating_min_filename = path.join(DATA_DIR, 'ratings_min.csv')
-#logger.debug("Saving file to %s" % rating_min_filename)
-#ratings.to_csv(rating_min_filename, index=False)
-
-# Save matrix data
-#logger.debug("Generating matrix")
-#matrix = generator.getMatrix(ratings)
-#matrix_filename = path.join(DATA_DIR, 'matrix.csv')
-#logger.debug("Saving matrix file to %s" % matrix_filename)
-#matrix.to_csv(matrix_filename)
+        run(args)
+    except EvaluationStoppedError as e:
+        logger.warn("%s, run it again to continue", e)
+        sys.exit(0)
+    if args.metrics:
+        # Save timers, counters and histograms of the stages (metrics.json and metrics.prom)
+        for metrics_filename in ['metrics.json', 'metrics.prom']:
+            metrics.save(path.join(args.results, metrics_filename))
+        logger.debug("Metrics saved in %s", args.results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+from os import path, rename, remove
+from pandas import read_csv
+from ratingsStore import RatingsStore, isStore
+from datasetStats import DatasetStats, computeStats, CHUNK_SIZE
+from compactRatings import isin
+from metrics import metrics
+import random
+import argparse
+import logging
+
+logger = logging.getLogger('chunkedDataset')
+logger.setLevel(logging.DEBUG)
+
+
+def _readChunks(filename, chunk_size):
+    if isStore(filename):
+        return RatingsStore(filename).chunks(chunk_size)
+    return read_csv(filename, chunksize=chunk_size)
+
+
+class ChunkedDataset(object):
+    """
+    Subsets of the ratings in the csv file or ratings store
+    $filenameDataset, read in chunks of $chunk_size ratings and written to
+    a csv file, so the dataset doesn't have to fit in memory.
+
+    A first pass counts the ratings of every user and movie (see
+    DatasetStats, read by $processes processes) and the next ones write
+    the selected ratings. The subsets are the ones of the DatasetGenerator
+    methods with the same names and $seed, in the same order.
+    """
+    def __init__(self, filenameDataset, seed=None, chunk_size=CHUNK_SIZE, processes=1):
+        self.filename = filenameDataset
+        self.chunk_size = chunk_size
+        self.processes = processes
+        if seed:
+            random.seed(seed)
+        self._stats = None
+
+    def getStats(self):
+        """
+        DatasetStats of the dataset, read in the first pass
+        """
+        if self._stats is None:
+            self._stats = computeStats(self.filename, self.chunk_size, self.processes)
+        return self._stats
+
+    def _write(self, filename, output, select, stats=None):
+        # Write the ratings of $filename where select(chunk) is True to
+        # $output and add them to $stats. Returns the number of ratings written
+        tmp_output = output + '.tmp'
+        num_ratings = 0
+        try:
+            with open(tmp_output, 'w') as f:
+                for i, chunk in enumerate(_readChunks(filename, self.chunk_size)):
+                    selected = chunk[select(chunk)]
+                    if stats is not None:
+                        stats.update(selected)
+                    selected.to_csv(f, header=i == 0, index=False)
+                    num_ratings += len(selected)
+        except Exception:
+            remove(tmp_output)
+            raise
+        rename(tmp_output, output)
+        return num_ratings
+
+    def _select(self, output, column, ids):
+        logger.debug("Writing ratings of %d %s to %s", len(ids), column, output)
+        return self._write(self.filename, output, lambda chunk: isin(chunk, column, ids))
+
+    def filterDataset(self, output, num_ratings=20):
+        """
+        Write the ratings of the users with at least $num_ratings ratings to $output
+        """
+        logger.debug("Filtering users with more than %d rated movies" % num_ratings)
+        with metrics.timer('chunked.filterDataset'):
+            return self._select(output, 'userId', self.getStats().validUsers(num_ratings))
+
+    def getOptimumDataset(self, output, best_users=1000, best_movies=1000):
+        """
+        Write the ratings of the $best_movies most rated movies by the
+        $best_users users with more ratings of them to $output. The ratings
+        of the movies are written to a temporary file first, so the last
+        pass only reads them.
+        """
+        with metrics.timer('chunked.getOptimumDataset'):
+            most_rated_movies = self.getStats().mostRatedMovies(best_movies).index.values
+            movie_ratings = output + '.movies'
+            movie_stats = DatasetStats()
+            self._write(self.filename, movie_ratings, lambda chunk: isin(chunk, 'movieId', most_rated_movies),
+                        movie_stats)
+            try:
+                users_with_more_ratings = movie_stats.mostActiveUsers(best_users).index.values
+                return self._write(movie_ratings, output, lambda chunk: isin(chunk, 'userId', users_with_more_ratings))
+            finally:
+                remove(movie_ratings)
+
+    def getOptimumDatasetPercentage(self, output, percentage=0.6):
+        if percentage <= 0:
+            return None
+        stats = self.getStats()
+        if percentage >= 1:
+            return self._write(self.filename, output, lambda chunk: slice(None))
+        return self.getOptimumDataset(output, best_users=int(len(stats.users) * percentage),
+                                      best_movies=int(len(stats.movies) * percentage))
+
+    def getDatasetPercentage(self, output, percentage=1):
+        if percentage <= 0:
+            return None
+        stats = self.getStats()
+        if percentage >= 1:
+            return self._write(self.filename, output, lambda chunk: slice(None))
+        return self.getDataset(output, int(len(stats.users) * percentage), int(len(stats.movies) * percentage))
+
+    def getDataset(self, output, num_users, num_movies=None, more_rated_movies=None):
+        """
+        Write the ratings of $num_users random users to $output, only of
+        $num_movies random movies rated by them (or the most rated ones with
+        $more_rated_movies)
+        """
+        with metrics.timer('chunked.getDataset'):
+            sample_user_ids = random.sample(self.getStats().userIds(), num_users)
+
+            # The ratings of the sample users are filtered again by movie if needed
+            user_ratings = output + '.users' if num_movies else output
+            user_stats = DatasetStats()
+            num_ratings = self._write(self.filename, user_ratings, lambda chunk: isin(chunk, 'userId', sample_user_ids),
+                                      user_stats)
+            if not num_movies:
+                return num_ratings
+
+            movie_ids = user_stats.movieIds()
+            if num_movies >= len(movie_ids):
+                logger.warning("There is not enough movies. Returning %d movies", len(movie_ids))
+                rename(user_ratings, output)
+                return num_ratings
+
+            if more_rated_movies:
+                sample_movie_ids = user_stats.mostRatedMovies(num_movies).index.values
+            else:
+                sample_movie_ids = random.sample(movie_ids, num_movies)
+            try:
+                return self._write(user_ratings, output, lambda chunk: isin(chunk, 'movieId', sample_movie_ids))
+            finally:
+                remove(user_ratings)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Subsets of a ratings dataset larger than the memory')
+    parser.add_argument('dataset', help='Ratings csv file or ratings store')
+    parser.add_argument('output', help='Csv file of the selected ratings')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--processes', type=int, default=1, help='Processes reading the stats of a ratings store')
+    parser.add_argument('--seed', type=int)
+    subsets = parser.add_mutually_exclusive_group(required=True)
+    subsets.add_argument('--min-ratings', type=int, help='Users with at least this number of ratings')
+    subsets.add_argument('--optimum', type=int, nargs=2, metavar=('USERS', 'MOVIES'),
+                         help='Most rated movies by the users with more ratings of them')
+    subsets.add_argument('--sample', type=int, nargs='+', metavar='NUM',
+                         help='Random users (and random movies rated by them)')
+    args = parser.parse_args()
+
+    dataset = ChunkedDataset(args.dataset, args.seed, args.chunk_size, args.processes)
+    if args.min_ratings is not None:
+        num_ratings = dataset.filterDataset(args.output, args.min_ratings)
+    elif args.optimum:
+        num_ratings = dataset.getOptimumDataset(args.output, *args.optimum)
+    else:
+        num_ratings = dataset.getDataset(args.output, *args.sample[:2])
+    logger.info("%d ratings written to %s", num_ratings, path.abspath(args.output))
@@ -0,0 +1,104 @@
+from pandas import Series
+import numpy as np
+import logging
+
+logger = logging.getLogger('coRatedIndex')
+logger.setLevel(logging.DEBUG)
+
+WORD_BITS = 64
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """
+    Number of set bits of the uint64 $words along the last axis
+    """
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _POPCOUNT[words.view(np.uint8)].reshape(words.shape[:-1] + (-1,)).sum(axis=-1, dtype=np.int64)
+
+
+def _bitsets(indptr, indices, rows, num_words):
+    # Bitsets of the movies of the users in $rows of a CSR structure
+    lengths = indptr[rows + 1] - indptr[rows]
+    positions = np.repeat(indptr[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    movies = indices[positions]
+    bitsets = np.zeros((len(rows), num_words), dtype=np.uint64)
+
+    # Indices are sorted by user and movie, so the bits of a word are contiguous
+    keys = np.repeat(np.arange(len(rows)), lengths) * num_words + movies // WORD_BITS
+    if len(keys):
+        bits = np.left_shift(np.uint64(1), (movies % WORD_BITS).astype(np.uint64))
+        starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        bitsets.ravel()[keys[starts]] = np.bitwise_or.reduceat(bits, starts)
+    return bitsets
+
+
+class CoRatedIndex(object):
+    """
+    User -> movies inverted index of a RatingMatrix.
+
+    The movies of every user are kept both as a sorted int array (the CSR
+    structure of the matrix) and as a packed bitset of one bit per movie,
+    so intersecting the movies of N users takes N * movies / 64 word
+    operations. The bitsets take users * movies / 8 bytes.
+    """
+    def __init__(self, matrix, bitsets=None):
+        self.matrix = matrix
+        self.indptr = matrix.matrix.indptr
+        self.indices = matrix.matrix.indices
+        num_users, num_movies = matrix.shape
+        self.num_words = (num_movies + WORD_BITS - 1) // WORD_BITS
+        if bitsets is None:
+            logger.debug("Creating co-rated index of %d users and %d movies", num_users, num_movies)
+            bitsets = _bitsets(self.indptr, self.indices, np.arange(num_users), self.num_words)
+        self.bitsets = bitsets
+
+    def withMatrix(self, matrix, user_ids):
+        """
+        Index of $matrix, an update of the indexed matrix where only the
+        ratings of $user_ids changed. Only the bitsets of those users are
+        built again, unless there are new movies (the bits would move).
+        """
+        if not np.array_equal(matrix.movie_ids, self.matrix.movie_ids):
+            return CoRatedIndex(matrix)
+        logger.debug("Updating co-rated index of %d users", len(user_ids))
+        bitsets = np.zeros((matrix.shape[0], self.num_words), dtype=np.uint64)
+        bitsets[matrix.userIndex(self.matrix.user_ids)] = self.bitsets
+        rows = matrix.userIndex(np.unique(user_ids))
+        bitsets[rows] = _bitsets(matrix.matrix.indptr, matrix.matrix.indices, rows, self.num_words)
+        return CoRatedIndex(matrix, bitsets)
+
+    def userMovies(self, user_id):
+        """
+        Sorted ids of the movies rated by $user_id
+        """
+        row = self.matrix.userIndex(user_id)
+        return self.matrix.movie_ids[self.indices[self.indptr[row]:self.indptr[row + 1]]]
+
+    def coRatedBitset(self, users_id):
+        if len(users_id) == 0:
+            return np.zeros(self.num_words, dtype=np.uint64)
+        return np.bitwise_and.reduce(self.bitsets[self.matrix.userIndex(list(users_id))], axis=0)
+
+    def coRatedMovies(self, users_id):
+        """
+        Sorted ids of the movies rated by all the users in $users_id
+        """
+        words = self.coRatedBitset(users_id).astype('<u8')
+        bits = np.unpackbits(words.view(np.uint8)).reshape(-1, 8)[:, ::-1].ravel()
+        return self.matrix.movie_ids[np.flatnonzero(bits[:self.matrix.shape[1]])]
+
+    def coRatedCount(self, users_id):
+        return int(popcount(self.coRatedBitset(users_id)))
+
+    def coRatedCounts(self, user_id):
+        """
+        Number of movies co-rated with $user_id by every user
+        """
+        row = self.matrix.userIndex(user_id)
+        rated = np.zeros(self.matrix.shape[1], dtype=np.int64)
+        rated[self.indices[self.indptr[row]:self.indptr[row + 1]]] = 1
+        cumulative = np.concatenate([[0], np.cumsum(rated[self.indices])])
+        return Series(cumulative[self.indptr[1:]] - cumulative[self.indptr[:-1]], index=self.matrix.user_ids)
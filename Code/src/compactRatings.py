@@ -0,0 +1,117 @@
+from pandas import DataFrame, Series, Index
+from ratingsStore import RATING_SCALE, halfStars
+import numpy as np
+import logging
+
+logger = logging.getLogger('compactRatings')
+logger.setLevel(logging.DEBUG)
+
+
+def isin(ratings, column, values):
+    """
+    Mask of the rows of $ratings whose $column is in $values. The codes of
+    CompactRatings are looked up in a table instead of a hash table.
+    """
+    if not isinstance(ratings, CompactRatings):
+        return ratings[column].isin(values).values
+    if isinstance(values, (set, frozenset)):
+        values = list(values)
+    lookup = np.zeros(len(ratings.user_ids if column == 'userId' else ratings.movie_ids), dtype=bool)
+    values = np.asarray(values, dtype=np.int64)
+    # Codes added after $ratings (see encode) are not in it
+    lookup[values[values < len(lookup)]] = True
+    return lookup[ratings[column].values]
+
+
+class CompactRatings(DataFrame):
+    """
+    Ratings frame with dense codes instead of the raw ids.
+
+    The userId and movieId columns are int32 codes and the ratings are
+    saved as uint8 half stars (halfStars column), so a rating takes 9 bytes
+    instead of 24. The rating property gives the ratings in stars, so the
+    frame can be used where a ratings frame is expected.
+
+    The raw ids of the codes are kept in the user_ids and movie_ids indexes.
+    Codes are given in the order of the raw ids (new ids added by encode
+    get the next codes), and filtered frames keep the codes and the indexes
+    of the whole dataset.
+    """
+    _metadata = ['user_ids', 'movie_ids']
+
+    @property
+    def _constructor(self):
+        return CompactRatings
+
+    @classmethod
+    def fromCodes(cls, user_codes, movie_codes, half_stars, user_ids, movie_ids):
+        ratings = cls({
+            'userId': np.asarray(user_codes, dtype=np.int32),
+            'movieId': np.asarray(movie_codes, dtype=np.int32),
+            'halfStars': np.asarray(half_stars, dtype=np.uint8)
+        }, columns=['userId', 'movieId', 'halfStars'])
+        ratings.user_ids = Index(user_ids)
+        ratings.movie_ids = Index(movie_ids)
+        return ratings
+
+    @classmethod
+    def fromRatings(cls, ratings):
+        """
+        Compact frame of a ratings frame (userId, movieId and rating columns)
+        with the rows in the same order
+        """
+        logger.debug("Compacting %d ratings", len(ratings))
+        user_ids, user_codes = np.unique(ratings.userId.values, return_inverse=True)
+        movie_ids, movie_codes = np.unique(ratings.movieId.values, return_inverse=True)
+        return cls.fromCodes(user_codes, movie_codes, halfStars(ratings.rating.values), user_ids, movie_ids)
+
+    @classmethod
+    def fromStore(cls, store):
+        # The store columns are already codes over the sorted ids
+        return cls.fromCodes(store.user_codes, store.movie_codes, store.half_stars, store.user_ids, store.movie_ids)
+
+    @property
+    def rating(self):
+        return Series(self['halfStars'].values / float(RATING_SCALE), index=self.index, name='rating')
+
+    def _codes(self, ids, all_ids, name):
+        codes = all_ids.get_indexer(np.atleast_1d(ids))
+        if (codes < 0).any():
+            raise KeyError("Unknown %s ids: %s" % (name, list(np.atleast_1d(ids)[codes < 0])))
+        return codes.astype(np.int32)
+
+    def userCodes(self, user_ids):
+        return self._codes(user_ids, self.user_ids, 'user')
+
+    def movieCodes(self, movie_ids):
+        return self._codes(movie_ids, self.movie_ids, 'movie')
+
+    def userIds(self, user_codes):
+        return self.user_ids.values[np.asarray(user_codes, dtype=np.int64)]
+
+    def movieIds(self, movie_codes):
+        return self.movie_ids.values[np.asarray(movie_codes, dtype=np.int64)]
+
+    def encode(self, ratings):
+        """
+        Compact frame of the raw $ratings with the codes of this frame. New
+        ids get new codes after the known ones.
+        """
+        def codes(ids, all_ids):
+            new_ids = np.setdiff1d(ids, all_ids.values)
+            all_ids = all_ids.append(Index(new_ids)) if len(new_ids) else all_ids
+            return all_ids.get_indexer(ids), all_ids
+
+        user_codes, user_ids = codes(ratings.userId.values, self.user_ids)
+        movie_codes, movie_ids = codes(ratings.movieId.values, self.movie_ids)
+        return CompactRatings.fromCodes(user_codes, movie_codes, halfStars(ratings.rating.values), user_ids, movie_ids)
+
+    def toRatings(self):
+        """
+        Ratings frame with the raw ids
+        """
+        return DataFrame({
+            'userId': self.userIds(self.userId.values),
+            'movieId': self.movieIds(self.movieId.values),
+            'rating': self.rating.values
+        }, index=self.index, columns=['userId', 'movieId', 'rating'])
@@ -1,30 +1,133 @@
 import numpy as np
+from pandas import Series
+
+# Concensus kernels work on a stack of groups: a (groups x users x movies)
+# array of ratings and a boolean mask of the same shape with the rated
+# cells. They return the (groups x movies) concensus scores, with NaN in
+# the movies not rated in a group.
+
+
+def stack_groups(group_matrices):
+    """
+    Padded (groups x users x movies) array and mask of the group matrices
+    """
+    group_matrices = [np.asarray(group_matrix, dtype=np.float64) for group_matrix in group_matrices]
+    num_users = max([group_values.shape[0] for group_values in group_matrices] or [0])
+    num_movies = max([group_values.shape[1] for group_values in group_matrices] or [0])
+    values = np.zeros((len(group_matrices), num_users, num_movies))
+    mask = np.zeros(values.shape, dtype=bool)
+    for i, group_values in enumerate(group_matrices):
+        users, movies = group_values.shape
+        mask[i, :users, :movies] = ~np.isnan(group_values)
+        values[i, :users, :movies] = np.where(mask[i, :users, :movies], group_values, 0)
+    return values, mask
+
+
+def _not_rated_as_nan(scores, mask):
+    scores = np.asarray(scores, dtype=np.float64)
+    scores[~mask.any(axis=1)] = np.nan
+    return scores
+
+
+def least_misery_kernel(values, mask):
+    return _not_rated_as_nan(np.where(mask, values, np.inf).min(axis=1), mask)
+
+
+def mean_kernel(values, mask):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mask, values, 0).sum(axis=1) / mask.sum(axis=1)
+
+
+def purity_kernel(values, mask):
+    """
+    1 - std / mean of the ratings of every movie. Movies with a lower
+    dispersion of their ratings relative to its mean are purer.
+    """
+    count = mask.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(mask, values, 0).sum(axis=1) / count
+        deviations = np.where(mask, values - means[:, np.newaxis, :], 0)
+        stds = np.sqrt((deviations ** 2).sum(axis=1) / count)
+        return 1 - stds / means
+
+
+def multiplicative_kernel(values, mask):
+    return _not_rated_as_nan(np.where(mask, values, 1).prod(axis=1), mask)
+
+
+def most_pleasure_kernel(values, mask):
+    return _not_rated_as_nan(np.where(mask, values, -np.inf).max(axis=1), mask)
+
+
+def average_ranks(values, mask):
+    """
+    Ascending rank of every rating among the rated movies of each user.
+    Tied ratings get the average of their ranks.
+    """
+    keys = np.where(mask, values, np.inf)
+    order = np.argsort(keys, axis=-1, kind='mergesort')
+    sorted_keys = np.take_along_axis(keys, order, axis=-1)
+    positions = np.broadcast_to(np.arange(keys.shape[-1]), keys.shape)
+
+    # First and last position of the run of equal ratings of every movie
+    changes = sorted_keys[..., 1:] != sorted_keys[..., :-1]
+    run_starts = np.concatenate([np.ones(keys.shape[:-1] + (1,), dtype=bool), changes], axis=-1)
+    run_ends = np.concatenate([changes, np.ones(keys.shape[:-1] + (1,), dtype=bool)], axis=-1)
+    first = np.maximum.accumulate(np.where(run_starts, positions, 0), axis=-1)
+    last = np.minimum.accumulate(np.where(run_ends, positions, keys.shape[-1])[..., ::-1], axis=-1)[..., ::-1]
+
+    ranks = np.empty(keys.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2.0 + 1, axis=-1)
+    return np.where(mask, ranks, 0)
+
+
+def borda_count_kernel(values, mask):
+    return _not_rated_as_nan(average_ranks(values, mask).sum(axis=1), mask)
+
+
+def concensus_scores(kernels, values, mask):
+    """
+    (kernels x groups x movies) scores of every kernel in $kernels
+    """
+    return np.array([kernel(values, mask) for kernel in kernels])
+
+
+def _apply_kernel(kernel, group_matrix):
+    values, mask = stack_groups([group_matrix])
+    return Series(kernel(values, mask)[0], index=group_matrix.columns)
+
 
 def least_misery(group_matrix):
-    return group_matrix.apply(min)
+    return _apply_kernel(least_misery_kernel, group_matrix)
 
 def mean(group_matrix):
-    return group_matrix.apply(np.mean)
+    return _apply_kernel(mean_kernel, group_matrix)
 
 def purity(group_matrix):
-    std_array = group_matrix.apply(np.std)
-    # TODO Not working
-    return (group_matrix-std_array).apply(sum) / group_matrix.apply(sum)
+    return _apply_kernel(purity_kernel, group_matrix)
 
 def multiplicative(group_matrix):
-    def multiply(array):
-        return reduce(lambda x, y: x*y, array)
-    return group_matrix.apply(multiply)
+    return _apply_kernel(multiplicative_kernel, group_matrix)
 
 def most_pleasure(group_matrix):
-    return group_matrix.apply(max)
+    return _apply_kernel(most_pleasure_kernel, group_matrix)
 
 def borda_count(group_matrix):
-    ranks = group_matrix.copy()
-    for index, row in group_matrix.iterrows():
-        i = 0
-        for rank, count_rank in row.value_counts().sort_index().iteritems():
-            new_rank = np.mean(range(i+1, i+count_rank+1))
-            i += count_rank
-            ranks.loc[index].replace(to_replace=rank, value=new_rank, inplace=True)
-    return ranks.apply(sum)
+    return _apply_kernel(borda_count_kernel, group_matrix)
+
+
+KERNELS = {
+    least_misery: least_misery_kernel,
+    mean: mean_kernel,
+    purity: purity_kernel,
+    multiplicative: multiplicative_kernel,
+    most_pleasure: most_pleasure_kernel,
+    borda_count: borda_count_kernel
+}
+
+
+def kernel_of(concensus_fn):
+    """
+    Kernel of a per group concensus function
+    """
+    return KERNELS[concensus_fn]
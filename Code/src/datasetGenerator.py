@@ -1,5 +1,18 @@
-from pandas import read_csv, DataFrame, Series
+from pandas import read_csv, concat, DataFrame, Series
 from errors import InvalidGroupError, MaxInvalidIterationsError
+from ratingMatrix import RatingMatrix, DENSE_MAX_CELLS
+from distances import DistanceEngine
+from coRatedIndex import CoRatedIndex
+from neighbourIndex import NeighbourIndex
+from groupSampler import GroupSampler, MIN_CO_RATED, MIN_COVERAGE
+from matrixFactorization import candidateMovies, NUM_CANDIDATES
+from similarityStore import SimilarityStore
+from ratingsStore import RatingsStore, isStore
+from datasetStats import DatasetStats
+from compactRatings import CompactRatings, isin
+from concensusFn import stack_groups, KERNELS
+from evaluation import evaluate
+from metrics import metrics
 import numpy as np
 import random
 import logging
@@ -7,39 +20,97 @@ import logging
 logger = logging.getLogger('datasetGenerator')
 logger.setLevel(logging.DEBUG)
 
+GROUP_TYPES = ['similar', 'disimilar', 'random']
+
+# Number of ratings frames whose derived structures are kept in memory
+CACHE_SIZE = 2
+
+# Ratings added at once by appendRatingsStream
+DEFAULT_APPEND_BATCH = 100000
+
+
+def mergeRatings(ratings, new_ratings):
+    """
+    $ratings with the new or changed $new_ratings. A changed rating
+    replaces the previous rating of the same user and movie. The result
+    keeps the id maps of $new_ratings if they are CompactRatings.
+    """
+    new_ratings = new_ratings.drop_duplicates(['userId', 'movieId'], keep='last')
+    affected = ratings[isin(ratings, 'userId', new_ratings.userId.unique())]
+    # (user, movie) pairs as int64 keys
+    num_movies = max(ratings.movieId.max(), new_ratings.movieId.max()) + 1
+    keys = affected.userId.values.astype(np.int64) * num_movies + affected.movieId.values
+    new_keys = new_ratings.userId.values.astype(np.int64) * num_movies + new_ratings.movieId.values
+    replaced = affected.index[np.in1d(keys, new_keys)]
+    return concat([ratings.drop(replaced), new_ratings], ignore_index=True, sort=False).__finalize__(new_ratings)
+
 
 class DatasetGenerator(object):
-    def __init__(self, filenameDataset, seed=None):
-        logger.debug("Reading file: %s" % filenameDataset)
-        self.data = read_csv(filenameDataset)
+    """
+    With $compact the dataset is kept as CompactRatings, so the methods
+    take and return user and movie codes instead of raw ids (see
+    CompactRatings.userIds and CompactRatings.userCodes). It is the default
+    for a ratings store: its columns are already codes and the rating
+    matrix of the whole dataset is its CSR structure, so it is not sorted
+    again. With compact=False the store is read as a frame of raw ids.
+
+    With $similarities (the directory of a SimilarityStore) similar groups
+    of the ratings the store was written from are ranked by its neighbours.
+    Groups co-rate at least $min_co_rated movies, or with $min_coverage < 1
+    that many movies are rated by that share of the members (see GroupSampler).
+    """
+    def __init__(self, filenameDataset=None, seed=None, data=None, compact=None, similarities=None,
+                 min_co_rated=MIN_CO_RATED, min_coverage=MIN_COVERAGE):
+        self._store = self._store_ratings = None
+        if data is not None:
+            self.data = data
+        elif isStore(filenameDataset):
+            logger.debug("Reading store: %s" % filenameDataset)
+            store = RatingsStore(filenameDataset)
+            if compact is False:
+                self.data = store.toDataFrame()
+            else:
+                self.data = self._store_ratings = CompactRatings.fromStore(store)
+                self._store = store
+        else:
+            logger.debug("Reading file: %s" % filenameDataset)
+            self.data = read_csv(filenameDataset)
+        if compact and not isinstance(self.data, CompactRatings):
+            self.data = CompactRatings.fromRatings(self.data)
         if seed:
             random.seed(seed)
+        self.similarities = similarities
+        self.min_co_rated = min_co_rated
+        self.min_coverage = min_coverage
+        self._cache = {}
 
     def filterDataset(self, num_ratings=20):
         logger.debug("Filtering users with more than %d rated movies" % num_ratings)
-        size_users = self.data.groupby('userId').size()
-        valid_users = [user_id for user_id in size_users.index if size_users[user_id] >= num_ratings]
-        ratings = self.data[self.data.userId.isin(valid_users)]
+        with metrics.timer('filterDataset'):
+            size_users = self.getUserCounts(self.data)
+            valid_users = size_users.index[size_users >= num_ratings]
+            ratings = self.data[isin(self.data, 'userId', valid_users)]
         return ratings
 
     def getOptimumDataset(self, best_users=1000, best_movies=1000):
-        # Get the (best_movies) most rated movies
-        logger.debug("Filtering %d most rated movies" % best_movies)
-        size_most_rated_movies = self.data.groupby('movieId').size().sort_values(ascending=False).head(best_movies)
-        most_rated_movies = size_most_rated_movies.index.values
-
-        # Get all the ratings of (best_users) most rated movies
-        logger.debug("Getting ratings of %d most rated movies" % best_movies)
-        ratings = self.data[self.data.movieId.isin(most_rated_movies)]
-
-        # Get the (best_users) users with more rated top (best_movies) movies
-        logger.debug("Getting %d users with more rated movies" % best_users)
-        size_users_with_more_ratings = ratings.groupby('userId').size().sort_values(ascending=False).head(best_users)
-        users_with_more_ratings = size_users_with_more_ratings.index.values
-
-        # Finally get the final ratings
-        logger.debug("Getting output ratings")
-        ratings = self.data[self.data.movieId.isin(most_rated_movies) & self.data.userId.isin(users_with_more_ratings)]
+        with metrics.timer('getOptimumDataset'):
+            # Get the (best_movies) most rated movies
+            logger.debug("Filtering %d most rated movies" % best_movies)
+            size_most_rated_movies = self.getMovieCounts(self.data).sort_values(ascending=False, kind='mergesort').head(best_movies)
+            most_rated_movies = size_most_rated_movies.index.values
+
+            # Get all the ratings of (best_users) most rated movies
+            logger.debug("Getting ratings of %d most rated movies" % best_movies)
+            ratings = self.data[isin(self.data, 'movieId', most_rated_movies)]
+
+            # Get the (best_users) users with more rated top (best_movies) movies
+            logger.debug("Getting %d users with more rated movies" % best_users)
+            size_users_with_more_ratings = ratings.groupby('userId').size().sort_values(ascending=False, kind='mergesort').head(best_users)
+            users_with_more_ratings = size_users_with_more_ratings.index.values
+
+            # Finally get the final ratings
+            logger.debug("Getting output ratings")
+            ratings = self.data[isin(self.data, 'movieId', most_rated_movies) & isin(self.data, 'userId', users_with_more_ratings)]
         return ratings
 
     def getOptimumDatasetPercentage(self, percentage=0.6):
@@ -76,7 +147,7 @@ class DatasetGenerator(object):
         sample_user_ids = random.sample(user_ids, num_users)
 
         # get movies rated by sample_users
-        ratings_of_sample_users = self.data[self.data.userId.isin(sample_user_ids)]
+        ratings_of_sample_users = self.data[isin(self.data, 'userId', sample_user_ids)]
         if not num_movies:
             return ratings_of_sample_users
 
@@ -87,219 +158,315 @@ class DatasetGenerator(object):
 
         if more_rated_movies:
             # More rated movies samples
-            size_most_rated_movies = ratings_of_sample_users.groupby('movieId').size().sort_values(ascending=False).head(num_movies)
+            size_most_rated_movies = ratings_of_sample_users.groupby('movieId').size().sort_values(ascending=False, kind='mergesort').head(num_movies)
             sample_movie_ids = size_most_rated_movies.index.values
         else:
             # Random movie samples
             sample_movie_ids = random.sample(movie_ids, num_movies)
 
-        ratings = ratings_of_sample_users[ratings_of_sample_users.movieId.isin(sample_movie_ids)]
+        ratings = ratings_of_sample_users[isin(ratings_of_sample_users, 'movieId', sample_movie_ids)]
         return ratings
 
     def getCoRatedMovies(self, ratings, users_id):
         if len(users_id) == 0:
             return set()
 
-        co_rated_movies = set(ratings.movieId.unique())
-        for user_id in users_id:
-            movies_rated_by_user = set(ratings[ratings.userId.isin([user_id])].movieId.unique())
-            co_rated_movies.intersection_update(movies_rated_by_user)
+        index = self.getCoRatedIndex(ratings)
+        try:
+            co_rated_movies = set(index.coRatedMovies(users_id))
+        except KeyError:
+            # Some user has no ratings
+            co_rated_movies = set()
+        metrics.observe('co_rated_movies', len(co_rated_movies))
         return co_rated_movies
 
-    def getMostSimilarUsers(self, ratings, user_id, num_users):
+    def _validGroup(self, ratings, user_ids, num_users):
+        # $user_ids if they are $num_users users of a valid group of the GroupSampler
+        sampler = self.getGroupSampler(ratings)
+        if len(user_ids) < num_users or not sampler.isValid(sampler.matrix.userIndex(list(user_ids))):
+            raise InvalidGroupError()
+        return list(user_ids)
+
+    def getMostSimilarUsers(self, ratings, user_id, num_users, candidate_ids=None):
         """
         Get the $num_users most similars to $user_id in $ratings dataset
+        among $candidate_ids (all the users if None)
         """
         logger.debug("Getting %d most similar users for %s", num_users, user_id)
-        distances = self.getDistances(ratings, user_id)
-        similar_users = distances.sort_values().head(num_users).index
-        if len(self.getCoRatedMovies(ratings, similar_users)) < 10:
-            raise InvalidGroupError()
-        return list(similar_users)
+        similar_users = self.getNeighbourIndex(ratings).nearest(user_id, num_users, candidate_ids).index
+        return self._validGroup(ratings, similar_users, num_users)
 
-    def getMostDisimilarUsers(self, ratings, user_id, num_users):
+    def getMostDisimilarUsers(self, ratings, user_id, num_users, candidate_ids=None):
         """
         Get the $num_users most disimilars to $user_id in $ratings dataset
+        among $candidate_ids (all the users if None)
         """
         logger.debug("Getting %d most disimilar users for %s", num_users, user_id)
-        distances = self.getDistances(ratings, user_id)
-        disimilar_users = distances.sort_values(ascending=False).head(num_users).index
-        if len(self.getCoRatedMovies(ratings, disimilar_users)) < 10:
-            raise InvalidGroupError()
-        return list(disimilar_users)
+        disimilar_users = self.getNeighbourIndex(ratings).farthest(user_id, num_users, candidate_ids).index
+        return self._validGroup(ratings, disimilar_users, num_users)
 
-    def getRandomUsers(self, ratings, num_users):
+    def getRandomUsers(self, ratings, num_users, rng=random):
         logger.debug("Getting %d random users", num_users)
         user_ids = ratings.userId.unique()
         if len(user_ids) <= num_users:
             sample_user_ids = user_ids
         else:
-            sample_user_ids = random.sample(user_ids, num_users)
-
-        if len(self.getCoRatedMovies(ratings, sample_user_ids)) < 10:
-            raise InvalidGroupError()
-        return list(sample_user_ids)
+            sample_user_ids = rng.sample(user_ids, num_users)
+        return self._validGroup(ratings, sample_user_ids, min(num_users, len(user_ids)))
 
-    def getGroupUsersFn(self, ratings, num_groups, size, selectFunction):
-        remaining_dataset = ratings
-        num_generated_groups = 0
-        num_invalid = 0
-        while num_generated_groups < num_groups:
+    def getGroupUsers(self, ratings, num_groups, size, group_types=GROUP_TYPES, rng=random):
+        """
+        Generate $num_groups groups of $size users of each type in $group_types
+        with GroupSampler. Users are not repeated in groups of the same type.
+        $rng is the random generator used to choose the groups.
+        """
+        sampler = self.getGroupSampler(ratings)
+        for group_type in group_types:
+            sampler.reset()
+            achievable = sampler.plan(num_groups, size, group_type)
+            if achievable < num_groups:
+                logger.warning("Only about %d of %d %s groups of %d users can be generated",
+                               achievable, num_groups, group_type, size)
+            num_generated_groups = 0
             try:
-                group = selectFunction(remaining_dataset, size)
-                num_invalid = 0
-                num_generated_groups += 1
-                remaining_dataset = remaining_dataset[~remaining_dataset.userId.isin(group)]
-                yield group
-            except InvalidGroupError:
-                num_invalid += 1
-                logger.warning("Invalid group iteration %d", num_invalid)
-                if num_invalid > 20:
-                    raise MaxInvalidIterationsError()
-
-    def getGroupUsers(self, ratings, num_groups, size):
-        def reduceRatings(ratings, user_id):
-            # Reduce the number of ratings
-            logger.debug("Reducing ratings for user %s", user_id)
-            filtered_ratings = self.filterCoRatedMovies(ratings, user_id)
-            size_filtered_users = filtered_ratings.groupby('userId').size().sort_values(ascending=False).head(10000)
-            filtered_user_ids = size_filtered_users.index.values
-            filtered_ratings = filtered_ratings[filtered_ratings.userId.isin(filtered_user_ids)]
-            logger.debug("Ratings reduced from %d to %d", len(ratings), len(filtered_ratings))
-            return filtered_ratings
-
-        def selectSimilarGroup(ratings, num_users):
-            user_ids = ratings.userId.unique()
-            user_id = random.choice(user_ids)
-            reduced_ratings = reduceRatings(ratings, user_id)
-            return self.getMostSimilarUsers(reduced_ratings, user_id, num_users)
-
-        def selectDisimilarGroup(ratings, num_users):
-            user_ids = ratings.userId.unique()
-            user_id = random.choice(user_ids)
-            reduced_ratings = reduceRatings(ratings, user_id)
-            return self.getMostDisimilarUsers(reduced_ratings, user_id, num_users)
-
-        def selectRandomGroup(ratings, num_users):
-            user_ids = ratings.userId.unique()
-            user_id = random.choice(user_ids)
-            reduced_ratings = reduceRatings(ratings, user_id)
-            return self.getRandomUsers(reduced_ratings, num_users)
+                for group in sampler.groups(num_groups, size, group_type, rng):
+                    num_generated_groups += 1
+                    yield group, group_type
+            except MaxInvalidIterationsError:
+                logger.warning("Generated %d of %d %s groups of %d users", num_generated_groups, num_groups,
+                               group_type, size)
 
+    def filterCoRatedMovies(self, ratings, user_id):
         try:
-            for group in self.getGroupUsersFn(ratings, num_groups, size, selectSimilarGroup):
-                yield group, 'similar'
-        except:
-            logger.warning("Max iteration errors")
+            movies_rated_by_user = self.getCoRatedIndex(ratings).userMovies(user_id)
+        except KeyError:
+            movies_rated_by_user = []
+        return ratings[isin(ratings, 'movieId', movies_rated_by_user)]
 
-        try:
-            for group in self.getGroupUsersFn(ratings, num_groups, size, selectDisimilarGroup):
-                yield group, 'disimilar'
-        except:
-            logger.warning("Max iteration errors")
+    def getDistances(self, ratings, user_id):
+        logger.debug("Getting distances for user %s", user_id)
+        return self.getDistanceEngine(ratings).distances(user_id)
 
-        try:
-            for group in self.getGroupUsersFn(ratings, num_groups, size, selectRandomGroup):
-                yield group, 'random'
-        except:
-            logger.warning("Max iteration errors")
+    def getDistancesMany(self, ratings, users_id):
+        """
+        Get the distances of every user in $ratings (rows) to each user in $users_id (columns)
+        """
+        logger.debug("Getting distances for %d users", len(users_id))
+        return self.getDistanceEngine(ratings).distancesMany(users_id)
 
-    def filterCoRatedMovies(self, ratings, user_id):
-        movies_rated_by_user = ratings[ratings.userId.isin([user_id])].movieId.unique()
-        return ratings[ratings.movieId.isin(movies_rated_by_user)]
+    def getDistanceEngine(self, ratings):
+        return self._cached('distanceEngine', ratings, lambda r: DistanceEngine(self.getRatingMatrix(r)))
 
-    def getDistances(self, ratings, user_id):
-        matrix = self.getMatrix(self.filterCoRatedMovies(ratings, user_id))
-        logger.debug("Getting distances for user %s", user_id)
-        distances = []
-        users = []
-        num_rated_movies = matrix.loc[user_id].count()
-        for user_idx in matrix.index:
-            common_rated_movies = np.count_nonzero(~(matrix.loc[user_idx].isnull() | matrix.loc[user_id].isnull()))
-            if common_rated_movies > 5: # It should have more than 5 common rated movies to get a valid distance
-                distance = abs(matrix.loc[user_idx] - matrix.loc[user_id]).sum()
-                normalized_distance = distance * num_rated_movies / common_rated_movies
-            else:
-                normalized_distance = np.nan
-            # Save distance between user_idx and user_id
-            distances.append(normalized_distance)
-            users.append(user_idx)
-        return Series(distances, index=users)
+    def getNeighbourIndex(self, ratings):
+        return self._cached('neighbourIndex', ratings, lambda r: NeighbourIndex(self.getRatingMatrix(r), self.getDistanceEngine(r)))
 
-    def getMatrix(self, ratings):
-        logger.debug("Creating matrix data")
-        userIds = sorted(ratings.userId.unique())
-        movieIds = sorted(ratings.movieId.unique())
-        matrix = DataFrame([[np.nan] * len(movieIds) for i in xrange(len(userIds))], columns=movieIds, index=userIds)  # initialize matrix with nan values
+    def getGroupSampler(self, ratings):
+        return self._cached('groupSampler', ratings, lambda r: GroupSampler(self, r, self.min_co_rated, self.min_coverage))
 
-        # Fill matrix
-        i = 0
-        rows = ratings.iterrows()
-        percentage_10 = len(ratings) / 10
-        percentage_done = 0
-        for row in rows:
-            userId = row[1].userId
-            movieId = row[1].movieId
-            rating = row[1].rating
+    def getSimilarityStore(self, ratings):
+        """
+        SimilarityStore of $ratings or None if there is no store of them
+        """
+        if self.similarities is None:
+            return None
+        store = self._cachedValue('similarityStore', ratings)
+        if store is None:
+            matrix = self.getRatingMatrix(ratings)
+            store = SimilarityStore(self.similarities)
+            if not store.matches(matrix):
+                logger.debug("Similarity store %s is not of these ratings", self.similarities)
+                return None
+            store.attach(matrix)
+            self._cached('similarityStore', ratings, lambda r: store)
+        return store
+
+    def getCoRatedIndex(self, ratings):
+        return self._cached('coRatedIndex', ratings, lambda r: CoRatedIndex(self.getRatingMatrix(r)))
+
+    def _cached(self, name, ratings, build):
+        # Keep the structures built for the last used ratings frames. Frames
+        # are compared by identity, so they must not be modified in place.
+        value = self._cachedValue(name, ratings)
+        if value is not None:
+            return value
+        with metrics.timer('build.%s' % name):
+            value = build(ratings)
+        cache = self._cache.setdefault(name, [])
+        cache.append((ratings, value))
+        del cache[:-CACHE_SIZE]
+        return value
+
+    def _cachedValue(self, name, ratings):
+        for cached_ratings, value in self._cache.get(name, []):
+            if cached_ratings is ratings:
+                return value
+        return None
+
+    def getRatingMatrix(self, ratings):
+        def build(r):
+            if r is self._store_ratings:
+                # Every code of the store has ratings, so its codes are the ids of the matrix
+                matrix = self._store.toRatingMatrix()
+                return RatingMatrix(matrix.matrix, np.arange(matrix.shape[0]), np.arange(matrix.shape[1]))
+            return RatingMatrix.fromRatings(r)
+        return self._cached('ratingMatrix', ratings, build)
+
+    def getUserCounts(self, ratings):
+        """
+        Number of ratings of every user in $ratings
+        """
+        def build(r):
+            matrix = self.getRatingMatrix(r)
+            return Series(matrix.userCounts(), index=matrix.user_ids)
+        return self._cached('userCounts', ratings, build)
 
-            matrix.ix[userId, movieId] = rating
+    def getMovieCounts(self, ratings):
+        """
+        Number of ratings of every movie in $ratings
+        """
+        def build(r):
+            matrix = self.getRatingMatrix(r)
+            return Series(matrix.movieCounts(), index=matrix.movie_ids)
+        return self._cached('movieCounts', ratings, build)
 
-            if i == percentage_done * percentage_10:
-                logger.debug("{0:.0f}% done".format(percentage_done * 10))
-                percentage_done += 1
-            i += 1
+    def appendRatings(self, ratings):
+        """
+        Add the new or changed $ratings to the dataset. The structures
+        cached for the current dataset are updated for the users in
+        $ratings instead of built again, and kept for the new dataset.
+        """
+        logger.debug("Appending %d ratings", len(ratings))
+        if isinstance(self.data, CompactRatings) and not isinstance(ratings, CompactRatings):
+            ratings = self.data.encode(ratings)
+        with metrics.timer('appendRatings'):
+            return self._appendRatings(ratings)
+
+    def _appendRatings(self, ratings):
+        previous_data = self.data
+        self.data = mergeRatings(previous_data, ratings)
+
+        previous_matrix = self._cachedValue('ratingMatrix', previous_data)
+        if previous_matrix is None:
+            return self.data
+        user_ids = np.unique(ratings.userId.values)
+        matrix = previous_matrix.withRatings(ratings)
+
+        def updateUserCounts(counts):
+            counts = counts.reindex(matrix.user_ids, fill_value=0)
+            rows = matrix.userIndex(user_ids)
+            counts.values[rows] = matrix.matrix.indptr[rows + 1] - matrix.matrix.indptr[rows]
+            return counts
+
+        def updateMovieCounts(counts):
+            previous_users = user_ids[np.in1d(user_ids, previous_matrix.user_ids)]
+            removed = Series(previous_matrix.movieCounts(previous_users), index=previous_matrix.movie_ids)
+            added = Series(matrix.movieCounts(user_ids), index=matrix.movie_ids)
+            return (counts - removed).reindex(matrix.movie_ids, fill_value=0) + added
+
+        updates = [
+            ('ratingMatrix', lambda previous: matrix),
+            ('userCounts', updateUserCounts),
+            ('movieCounts', updateMovieCounts),
+            ('coRatedIndex', lambda previous: previous.withMatrix(matrix, user_ids)),
+            ('distanceEngine', lambda previous: previous.withMatrix(matrix, user_ids)),
+            ('neighbourIndex', lambda previous: previous.withMatrix(matrix, self.getDistanceEngine(self.data),
+                                                                   ratings.rating.values))
+        ]
+        for name, update in updates:
+            previous = self._cachedValue(name, previous_data)
+            if previous is not None:
+                value = update(previous)
+                self._cached(name, self.data, lambda r: value)
+        return self.data
+
+    def appendRatingsStream(self, chunks, batch_size=DEFAULT_APPEND_BATCH):
+        """
+        Add the ratings of the frames in $chunks (e.g. read_csv with
+        chunksize) in batches of at least $batch_size ratings
+        """
+        pending = []
+        num_pending = 0
+        for chunk in chunks:
+            pending.append(chunk)
+            num_pending += len(chunk)
+            if num_pending >= batch_size:
+                self.appendRatings(concat(pending, ignore_index=True, sort=False))
+                pending = []
+                num_pending = 0
+        if pending:
+            self.appendRatings(concat(pending, ignore_index=True, sort=False))
+        return self.data
+
+    def getMatrix(self, ratings, max_cells=DENSE_MAX_CELLS):
+        """
+        Dense users x movies frame of $ratings. Raises ValueError if it has
+        more than $max_cells cells (None for no limit).
+        """
+        logger.debug("Creating matrix data")
+        return RatingMatrix.fromRatings(ratings).toDataFrame(max_cells)
 
-        return matrix
+    def getDatasetStats(self, ratings):
+        """
+        DatasetStats of $ratings
+        """
+        return self._cached('datasetStats', ratings, lambda r: DatasetStats().update(r))
 
     def getStatsFromDataset(self, dataset):
-        num_users = len(dataset.userId.unique())
-        num_movies = len(dataset.movieId.unique())
-        count_ratings_by_users = dataset.groupby('userId')['rating'].count()
-        count_ratings_by_movies = dataset.groupby('movieId')['rating'].count()
-        return {
-            "numUsers": num_users,
-            "numMovies": num_movies,
-            "numRatings": len(dataset),
-            "meanRatingsByUsers": count_ratings_by_users.mean(),
-            "meanRatingsByMovies": count_ratings_by_movies.mean(),
-            "standardDeviationRatingsByUsers": count_ratings_by_users.std(),
-            "standardDeviationRatingsByMovies": count_ratings_by_movies.std(),
-            "countRatingsByUsers": count_ratings_by_users,
-            "countRatingsByMovies": count_ratings_by_movies,
-            "histRatingsByUsers": np.histogram(count_ratings_by_users),
-            "histRatingsByMovies": np.histogram(count_ratings_by_movies)
-        }
+        with metrics.timer('getStatsFromDataset'):
+            return self.getDatasetStats(dataset).stats()
+
+    def getGroupMatrix(self, ratings, group, model=None, num_candidates=NUM_CANDIDATES):
+        """
+        Ratings of the users in $group for the movies co-rated by all of
+        them. With $model (an ALSModel of $ratings) the ratings of the
+        $num_candidates movies rated by most of them, with the missing
+        ratings predicted by the model.
+        """
+        with metrics.timer('getGroupMatrix'):
+            matrix = self.getRatingMatrix(ratings)
+            if model is not None:
+                return model.completeMatrix(matrix, group, candidateMovies(matrix, group, num_candidates))
+            co_rated_movies = self.getCoRatedMovies(ratings, group)
+            return matrix.subMatrix(user_ids=group, movie_ids=co_rated_movies).toDataFrame()
 
     def evaluateConcensusFns(self, ratings, group, concensusFns, n_success=3):
-        def successN(model1, model2, n):
-            n_movies1_id = set(model1.sort_values(ascending=False).head(n).index)
-            n_movies2_id = set(model2.sort_values(ascending=False).head(n).index)
-            return 1 if len(n_movies1_id.intersection(n_movies2_id)) > 0 else 0
-
-        def unsuccessN(model1, model2, n):
-            n_movies1_id = set(model1.sort_values(ascending=False).head(n).index)
-            n_movies2_id = set(model2.sort_values(ascending=False).tail(n).index)
-            return 1 if len(n_movies1_id.intersection(n_movies2_id)) > 0 else 0
-
-        def evaluate(concensusFn, group_matrix):
-            concensus_model = concensusFn(group_matrix)
-            success_array = []
-            unsuccess_array = []
-            for i in range(group_matrix.shape[0]):
-                user_model = group_matrix.iloc[i]
-                success_array.append(
-                    successN(concensus_model, user_model, n_success)
-                )
-                unsuccess_array.append(
-                    unsuccessN(concensus_model, user_model, n_success)
-                )
-
-            return np.mean(success_array) * 100, np.mean(unsuccess_array) * 100
-
-        # Filter ratings to only co-rated movies by all users in group
-        co_rated_movies = self.getCoRatedMovies(ratings, group)
-        group_ratings = ratings[ratings.movieId.isin(co_rated_movies) & ratings.userId.isin(group)]
-        group_matrix = self.getMatrix(group_ratings)
-        for concensusObj in concensusFns:
-            evaluation_success, evaluation_unsuccess = evaluate(concensusObj['fn'], group_matrix)
-            yield concensusObj['name'], evaluation_success, evaluation_unsuccess
+        group_matrix = self.getGroupMatrix(ratings, group)
+        values, mask = stack_groups([group_matrix])
+        scores = np.array([concensusObj['fn'](group_matrix).values for concensusObj in concensusFns])
+        results = evaluate(scores[:, np.newaxis, :], values, mask, ns=[n_success])
+        for i, concensusObj in enumerate(concensusFns):
+            yield concensusObj['name'], results['success'][n_success][i, 0], results['unsuccess'][n_success][i, 0]
+
+    def evaluateGroups(self, ratings, groups, concensusFns, ns=(3,), ks=(), tau=False):
+        """
+        Evaluate the concensus functions in all the $groups at once.
+        Returns a DataFrame with a row by group and concensus function and a
+        column by metric (success_n, unsuccess_n, precision_k, ndcg_k and kendall_tau).
+        """
+        with metrics.timer('evaluateGroups'):
+            return self._evaluateGroups(ratings, groups, concensusFns, ns, ks, tau)
+
+    def _evaluateGroups(self, ratings, groups, concensusFns, ns, ks, tau):
+        group_matrices = [self.getGroupMatrix(ratings, group) for group in groups]
+        values, mask = stack_groups(group_matrices)
+        scores = np.full((len(concensusFns),) + values.shape[::2], np.nan)
+        for i, concensusObj in enumerate(concensusFns):
+            kernel = KERNELS.get(concensusObj['fn'])
+            if kernel:
+                scores[i] = kernel(values, mask)
+            else:
+                for j, group_matrix in enumerate(group_matrices):
+                    scores[i, j, :group_matrix.shape[1]] = concensusObj['fn'](group_matrix).values
+
+        results = evaluate(scores, values, mask, ns=ns, ks=ks, tau=tau)
+        rows = []
+        for i, concensusObj in enumerate(concensusFns):
+            for j, group in enumerate(groups):
+                row = {'group': j, 'concensus_name': concensusObj['name'], 'group_size': len(group)}
+                for metric in ['success', 'unsuccess', 'precision', 'ndcg']:
+                    for n, values_n in results[metric].items():
+                        row['%s_%d' % (metric, n)] = values_n[i, j]
+                if tau:
+                    row['kendall_tau'] = results['kendall_tau'][i, j]
+                rows.append(row)
+        return DataFrame(rows)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+from multiprocessing import Pool, cpu_count
+from pandas import DataFrame, Index, factorize, read_csv
+from ratingsStore import RatingsStore, isStore
+from metrics import metrics
+import numpy as np
+import argparse
+import json
+import logging
+
+logger = logging.getLogger('datasetStats')
+logger.setLevel(logging.DEBUG)
+
+# Ratings read at once from a csv file or a ratings store
+CHUNK_SIZE = 1000000
+# Accumulators kept by user and by movie. first is the row of the first
+# rating, so the ids can be listed in order of appearance
+COLUMNS = ['count', 'sum', 'squares', 'first']
+
+
+def _moments(keys, ratings, name, offset=0):
+    # Number of ratings, sum and sum of squares of $ratings by key and row of
+    # the first rating (after $offset rows)
+    codes, uniques = factorize(keys)
+    size = len(uniques)
+    return DataFrame({
+        'count': np.bincount(codes, minlength=size).astype(np.int64),
+        'sum': np.bincount(codes, weights=ratings, minlength=size),
+        'squares': np.bincount(codes, weights=ratings * ratings, minlength=size),
+        'first': offset + np.unique(codes, return_index=True)[1].astype(np.int64)
+    }, index=Index(uniques, name=name), columns=COLUMNS)
+
+
+def _empty(name):
+    return DataFrame(dict((column, np.zeros(0, dtype=np.int64 if column in ['count', 'first'] else np.float64))
+                          for column in COLUMNS), index=Index([], name=name), columns=COLUMNS)
+
+
+def _merge(left, right, offset=0):
+    # Accumulators of $left and $right, whose rows come after the $offset rows of $left
+    if len(right) == 0:
+        return left
+    if len(left) == 0:
+        return right.assign(first=right['first'] + offset)
+    index = left.index.union(right.index)
+    left, right = left.reindex(index), right.reindex(index)
+    merged = DataFrame(dict((column, left[column].fillna(0) + right[column].fillna(0))
+                            for column in ['count', 'sum', 'squares']), index=index, columns=COLUMNS)
+    merged['count'] = merged['count'].astype(np.int64)
+    merged['first'] = np.fmin(left['first'].values, right['first'].values + offset).astype(np.int64)
+    return merged
+
+
+class DatasetStats(object):
+    """
+    Statistics of a ratings dataset read in chunks. For every user and
+    movie it keeps the number of ratings, the sum and sum of squares of
+    the ratings and the row of the first rating, so the statistics of
+    shards of a dataset are combined with merge and nothing else is read
+    to filter the users or rank the movies.
+    """
+    def __init__(self):
+        self.users = _empty('userId')
+        self.movies = _empty('movieId')
+        self.num_ratings = 0
+
+    def update(self, ratings):
+        """
+        Add the $ratings DataFrame (userId, movieId and rating columns)
+        """
+        values = np.asarray(ratings.rating, dtype=np.float64)
+        self.users = _merge(self.users, _moments(ratings.userId.values, values, 'userId'), self.num_ratings)
+        self.movies = _merge(self.movies, _moments(ratings.movieId.values, values, 'movieId'), self.num_ratings)
+        self.num_ratings += len(ratings)
+        return self
+
+    def merge(self, other):
+        """
+        Add the statistics of $other, computed with the ratings that come
+        after the ratings of these stats
+        """
+        self.users = _merge(self.users, other.users, self.num_ratings)
+        self.movies = _merge(self.movies, other.movies, self.num_ratings)
+        self.num_ratings += other.num_ratings
+        return self
+
+    @classmethod
+    def fromChunks(cls, chunks):
+        stats = cls()
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    @classmethod
+    def fromCsv(cls, filename, chunk_size=CHUNK_SIZE):
+        logger.debug("Reading stats of %s", filename)
+        return cls.fromChunks(read_csv(filename, usecols=['userId', 'movieId', 'rating'], chunksize=chunk_size))
+
+    @classmethod
+    def fromStore(cls, directory, chunk_size=CHUNK_SIZE, start=0, stop=None):
+        """
+        Stats of the rows $start to $stop of the ratings store in $directory
+        """
+        logger.debug("Reading stats of %s (rows %d to %s)", directory, start, stop)
+        return cls.fromChunks(RatingsStore(directory).chunks(chunk_size, start, stop, timestamp=False))
+
+    def _counts(self, accumulators):
+        counts = accumulators['count'].sort_index()
+        counts.name = None
+        return counts
+
+    def userCounts(self):
+        """
+        Number of ratings of every user, sorted by id
+        """
+        return self._counts(self.users)
+
+    def movieCounts(self):
+        """
+        Number of ratings of every movie, sorted by id
+        """
+        return self._counts(self.movies)
+
+    def userIds(self):
+        """
+        Ids of the users in order of appearance (as ratings.userId.unique())
+        """
+        return self.users['first'].sort_values().index.values
+
+    def movieIds(self):
+        """
+        Ids of the movies in order of appearance (as ratings.movieId.unique())
+        """
+        return self.movies['first'].sort_values().index.values
+
+    def ratingMoments(self, by='userId'):
+        """
+        Number of ratings and mean and standard deviation of the ratings of
+        every user ($by userId) or movie ($by movieId)
+        """
+        accumulators = (self.users if by == 'userId' else self.movies).sort_index()
+        counts = accumulators['count'].values.astype(np.float64)
+        means = accumulators['sum'].values / counts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variances = (accumulators['squares'].values - counts * means ** 2) / (counts - 1)
+        return DataFrame({
+            'count': accumulators['count'].values,
+            'mean': means,
+            'std': np.sqrt(np.maximum(variances, 0))
+        }, index=accumulators.index, columns=['count', 'mean', 'std'])
+
+    def validUsers(self, num_ratings):
+        """
+        Ids of the users with at least $num_ratings ratings (the users kept
+        by DatasetGenerator.filterDataset)
+        """
+        counts = self.userCounts()
+        return counts.index[counts >= num_ratings]
+
+    def userThreshold(self, num_users):
+        """
+        Highest minimum number of ratings that keeps at least $num_users users
+        """
+        counts = np.sort(self.users['count'].values)[::-1]
+        if len(counts) == 0 or num_users > len(counts):
+            return 0
+        return int(counts[max(num_users, 1) - 1])
+
+    def mostRatedMovies(self, n):
+        """
+        Number of ratings of the $n most rated movies, ties by id
+        """
+        return self.movieCounts().sort_values(ascending=False, kind='mergesort').head(n)
+
+    def mostActiveUsers(self, n):
+        """
+        Number of ratings of the $n users with most ratings, ties by id
+        """
+        return self.userCounts().sort_values(ascending=False, kind='mergesort').head(n)
+
+    def stats(self):
+        """
+        Stats with the keys of DatasetGenerator.getStatsFromDataset
+        """
+        count_ratings_by_users = self.userCounts()
+        count_ratings_by_movies = self.movieCounts()
+        return {
+            "numUsers": len(count_ratings_by_users),
+            "numMovies": len(count_ratings_by_movies),
+            "numRatings": self.num_ratings,
+            "meanRatingsByUsers": count_ratings_by_users.mean(),
+            "meanRatingsByMovies": count_ratings_by_movies.mean(),
+            "standardDeviationRatingsByUsers": count_ratings_by_users.std(),
+            "standardDeviationRatingsByMovies": count_ratings_by_movies.std(),
+            "countRatingsByUsers": count_ratings_by_users,
+            "countRatingsByMovies": count_ratings_by_movies,
+            "histRatingsByUsers": np.histogram(count_ratings_by_users),
+            "histRatingsByMovies": np.histogram(count_ratings_by_movies)
+        }
+
+    def summary(self, min_ratings, top=10):
+        """
+        Stats without the per user and per movie series, the users and
+        ratings kept by filterDataset with $min_ratings and the $top most
+        rated movies and most active users
+        """
+        summary = dict((name, value) for name, value in self.stats().items() if not name.startswith(('count', 'hist')))
+        counts = self.userCounts()
+        summary['filter'] = {
+            'minRatings': min_ratings,
+            'numUsers': int((counts >= min_ratings).sum()),
+            'numRatings': int(counts[counts >= min_ratings].sum())
+        }
+        summary['mostRatedMovies'] = [[movie_id, int(count)] for movie_id, count in self.mostRatedMovies(top).iteritems()]
+        summary['mostActiveUsers'] = [[user_id, int(count)] for user_id, count in self.mostActiveUsers(top).iteritems()]
+        return summary
+
+
+def _shardStats(shard):
+    source, start, stop, chunk_size = shard
+    if start is None:
+        return DatasetStats.fromCsv(source, chunk_size)
+    return DatasetStats.fromStore(source, chunk_size, start, stop)
+
+
+def computeStats(datasets, chunk_size=CHUNK_SIZE, processes=1):
+    """
+    Stats of the ratings of $datasets, a csv file or ratings store or a
+    list of them (shards of a dataset). The csv files and the row ranges of
+    the stores are read by $processes processes (None to use all the cpus)
+    and their stats merged.
+    """
+    if isinstance(datasets, basestring):
+        datasets = [datasets]
+    processes = processes or cpu_count()
+    shards = []
+    for dataset in datasets:
+        if isStore(dataset):
+            num_ratings = len(RatingsStore(dataset))
+            shard_size = max(-(-num_ratings // processes), 1)
+            shards.extend((dataset, start, min(start + shard_size, num_ratings), chunk_size)
+                          for start in range(0, num_ratings, shard_size))
+        else:
+            shards.append((dataset, None, None, chunk_size))
+
+    with metrics.timer('computeStats'):
+        if processes == 1 or len(shards) <= 1:
+            results = map(_shardStats, shards)
+        else:
+            pool = Pool(min(processes, len(shards)))
+            try:
+                results = pool.map(_shardStats, shards, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        return reduce(lambda stats, other: stats.merge(other), results, DatasetStats())
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Stats of a ratings dataset read in chunks')
+    parser.add_argument('datasets', nargs='+', help='Ratings csv files or ratings stores (shards of the dataset)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--min-ratings', type=int, default=20, help='Minimum number of ratings of the users kept')
+    parser.add_argument('--top', type=int, default=10, help='Most rated movies and most active users listed')
+    args = parser.parse_args()
+
+    stats = computeStats(args.datasets, args.chunk_size, args.processes)
+    print json.dumps(stats.summary(args.min_ratings, args.top), indent=2, sort_keys=True, default=float)
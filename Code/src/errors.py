@@ -3,3 +3,6 @@ class InvalidGroupError(Exception):
 
 class MaxInvalidIterationsError(Exception):
     pass
+
+class EvaluationStoppedError(Exception):
+    pass
@@ -0,0 +1,138 @@
+import numpy as np
+from scipy.stats import kendalltau
+
+# Evaluation of concensus scores against the ratings of the group members.
+# Ratings are a (groups x users x movies) array with its mask as built by
+# concensusFn.stack_groups, and the scores a (functions x groups x movies)
+# array as returned by concensusFn.concensus_scores.
+
+# Movies of a group up to which Kendall tau is computed with pairwise sign arrays
+TAU_PAIRWISE_MOVIES = 500
+
+
+def top_positions(keys, valid, n):
+    """
+    Positions of the $n highest $keys along the last axis, in descending
+    order, and whether each of them is a valid position. It only sorts the
+    selected positions.
+    """
+    n = min(n, keys.shape[-1])
+    keys = np.where(valid, keys, -np.inf)
+    if n < keys.shape[-1]:
+        selected = np.argpartition(-keys, n - 1, axis=-1)[..., :n]
+    else:
+        selected = np.broadcast_to(np.arange(keys.shape[-1]), keys.shape)
+    selected_keys = np.take_along_axis(keys, selected, axis=-1)
+    order = np.argsort(-selected_keys, axis=-1, kind='mergesort')
+    positions = np.take_along_axis(selected, order, axis=-1)
+    return positions, np.take_along_axis(valid, positions, axis=-1)
+
+
+def _matches(positions1, valid1, positions2, valid2):
+    # Pairs of equal valid positions of (functions, groups, 1, n) and (1, groups, users, n)
+    equal = positions1[..., :, np.newaxis] == positions2[..., np.newaxis, :]
+    return equal & valid1[..., :, np.newaxis] & valid2[..., np.newaxis, :]
+
+
+def _members_mean(values, users_mask):
+    # Mean over the users of every group: (functions, groups, users) -> (functions, groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(users_mask, values, 0).sum(axis=-1) / users_mask.sum(axis=-1).astype(np.float64)
+
+
+def _pairwise_tau(scores, values, valid):
+    # Tau-b of (functions, 1, movies) scores and (1, users, movies) values
+    # with the pairs of sign arrays, (functions, users, movies, movies) cells
+    def signs(x):
+        return np.sign(x[..., :, np.newaxis] - x[..., np.newaxis, :])
+
+    pairs = valid[..., :, np.newaxis] & valid[..., np.newaxis, :]
+    score_signs = np.where(pairs, signs(scores), 0)
+    value_signs = np.where(pairs, signs(values), 0)
+    concordance = (score_signs * value_signs).sum(axis=(-1, -2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return concordance / np.sqrt((score_signs ** 2).sum(axis=(-1, -2)) * (value_signs ** 2).sum(axis=(-1, -2)))
+
+
+def kendall_tau(scores, values, mask):
+    """
+    Kendall tau-b between the concensus scores and the ratings of every
+    member over the movies the member rated. Returns a (functions x groups
+    x users) array.
+
+    Every group only compares its own movies, not the padded ones. Groups
+    with more than TAU_PAIRWISE_MOVIES movies use the O(n log n) tau of
+    scipy instead of the pairwise sign arrays.
+    """
+    taus = np.full(scores.shape[:2] + mask.shape[1:2], np.nan)
+    movies_mask = mask.any(axis=1)
+    for group in range(scores.shape[1]):
+        movies = np.flatnonzero(movies_mask[group])
+        group_scores = scores[:, group, movies]
+        group_values = values[group][:, movies]
+        group_mask = mask[group][:, movies]
+        if len(movies) <= TAU_PAIRWISE_MOVIES:
+            taus[:, group] = _pairwise_tau(group_scores[:, np.newaxis, :], group_values[np.newaxis],
+                                           group_mask[np.newaxis])
+            continue
+        for user in np.flatnonzero(group_mask.any(axis=1)):
+            rated = group_mask[user]
+            for function in range(scores.shape[0]):
+                taus[function, group, user] = kendalltau(group_scores[function, rated], group_values[user, rated])[0]
+    return taus
+
+
+def evaluate(scores, values, mask, ns=(3,), ks=(), tau=False):
+    """
+    Evaluate the concensus $scores against the $values of every member.
+
+    Returns a dict with (functions x groups) arrays averaged over the members:
+    - success and unsuccess: {n: %} of members with one of the top n concensus
+      movies in their top n or bottom n movies respectively.
+    - precision and ndcg: {k: value} of the top k concensus movies using the
+      member ratings as relevance.
+    - kendall_tau: tau-b between concensus scores and member ratings over
+      all the movies of the group (if $tau), so it doesn't depend on $ns
+      and $ks.
+    The other metrics come from one partial selection of max(ns + ks) movies.
+    """
+    max_n = max(list(ns) + list(ks))
+    movies_mask = mask.any(axis=1)
+    users_mask = mask.any(axis=2)
+
+    concensus_top, concensus_top_valid = top_positions(scores, np.broadcast_to(movies_mask, scores.shape), max_n)
+    user_top, user_top_valid = top_positions(values, mask, max_n)
+    user_bottom, user_bottom_valid = top_positions(-values, mask, max_n)
+
+    # Align as (functions, groups, users, n)
+    concensus_top = concensus_top[:, :, np.newaxis, :]
+    concensus_top_valid = concensus_top_valid[:, :, np.newaxis, :]
+    user_top, user_top_valid = user_top[np.newaxis], user_top_valid[np.newaxis]
+    user_bottom, user_bottom_valid = user_bottom[np.newaxis], user_bottom_valid[np.newaxis]
+
+    results = {'success': {}, 'unsuccess': {}, 'precision': {}, 'ndcg': {}}
+    for n in ns:
+        success = _matches(concensus_top[..., :n], concensus_top_valid[..., :n], user_top[..., :n], user_top_valid[..., :n]).any(axis=(-1, -2))
+        unsuccess = _matches(concensus_top[..., :n], concensus_top_valid[..., :n], user_bottom[..., :n], user_bottom_valid[..., :n]).any(axis=(-1, -2))
+        results['success'][n] = _members_mean(success, users_mask) * 100
+        results['unsuccess'][n] = _members_mean(unsuccess, users_mask) * 100
+
+    if ks:
+        num_users = values.shape[1]
+        # Member ratings of the concensus top movies: (functions, groups, users, n)
+        concensus_positions = np.broadcast_to(concensus_top, concensus_top.shape[:2] + (num_users, concensus_top.shape[-1]))
+        gains = np.take_along_axis(np.broadcast_to(values, concensus_positions.shape[:3] + values.shape[-1:]), concensus_positions, axis=-1)
+        gains = np.where(concensus_top_valid, gains, 0)
+        ideal_gains = np.where(user_top_valid, np.take_along_axis(values, user_top[0], axis=-1)[np.newaxis], 0)
+        discounts = 1 / np.log2(np.arange(2, gains.shape[-1] + 2))
+        for k in ks:
+            common = _matches(concensus_top[..., :k], concensus_top_valid[..., :k], user_top[..., :k], user_top_valid[..., :k]).sum(axis=(-1, -2))
+            results['precision'][k] = _members_mean(common / float(k), users_mask)
+            dcg = (gains[..., :k] * discounts[:k]).sum(axis=-1)
+            idcg = (ideal_gains[..., :k] * discounts[:k]).sum(axis=-1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                results['ndcg'][k] = _members_mean(dcg / idcg, users_mask)
+
+    if tau:
+        results['kendall_tau'] = _members_mean(kendall_tau(scores, values, mask), users_mask)
+    return results
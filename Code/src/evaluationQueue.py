@@ -0,0 +1,221 @@
+from os import path, makedirs, listdir, rename, remove, utime, getpid, fsync
+from errors import EvaluationStoppedError
+from metrics import metrics
+import numpy as np
+import shutil
+import socket
+import time
+import json
+import logging
+
+logger = logging.getLogger('evaluationQueue')
+logger.setLevel(logging.DEBUG)
+
+QUEUE_VERSION = 1
+META_FILENAME = 'meta.json'
+# Groups evaluated between checkpoints
+SHARD_SIZE = 20
+# Seconds a claimed shard is kept by a worker before other workers can take it
+LEASE_SECONDS = 600
+# Seconds between checks of the shards of other workers
+POLL_SECONDS = 5
+
+# Set by requestStop, usually from a signal handler. Workers stop after the
+# shard they are evaluating is saved.
+_state = {'running': 0, 'stop': False}
+
+
+def requestStop():
+    """
+    Ask the running workers to stop after their current shard. Returns False
+    if no worker is running or a stop was already requested.
+    """
+    if not _state['running'] or _state['stop']:
+        return False
+    _state['stop'] = True
+    return True
+
+
+def _shardName(shard):
+    return 'shard-%06d' % shard
+
+
+def _shardIndex(filename):
+    # Claimed shards are named shard-NNNNNN.worker
+    return int(filename.split('.', 1)[0].split('-')[1])
+
+
+class EvaluationQueue(object):
+    """
+    Work queue of the evaluation of $num_items groups in shards of
+    $shard_size groups, in $directory.
+
+    Every shard is a file that moves from todo/ to claimed/ (renamed with the
+    worker name, so only one worker gets it) and its results are saved in
+    done/. Renames are atomic, so several processes or machines sharing
+    $directory can pull shards, and a stopped run continues with the shards
+    that are not done. Claims older than $lease seconds are returned to
+    todo/, so the shards of workers that died are evaluated again.
+    """
+    def __init__(self, directory, num_items, shard_size=SHARD_SIZE, lease=LEASE_SECONDS, worker=None):
+        self.directory = directory
+        self.lease = lease
+        self.worker = worker or '%s-%d' % (socket.gethostname(), getpid())
+        if not path.isdir(directory):
+            self._create(num_items, shard_size)
+        with open(path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != QUEUE_VERSION:
+            raise ValueError("Unsupported queue version %s" % self.meta['version'])
+        if self.meta['numItems'] != num_items:
+            raise ValueError("Queue %s has %d groups, not %d" % (directory, self.meta['numItems'], num_items))
+
+    def _create(self, num_items, shard_size):
+        # The queue is built aside and renamed, so other workers see all of it or nothing
+        tmp_directory = '%s.%s.tmp' % (self.directory, self.worker)
+        for name in ['todo', 'claimed', 'done']:
+            makedirs(path.join(tmp_directory, name))
+        num_shards = (num_items + shard_size - 1) // shard_size
+        for shard in range(num_shards):
+            open(path.join(tmp_directory, 'todo', _shardName(shard)), 'w').close()
+        with open(path.join(tmp_directory, META_FILENAME), 'w') as f:
+            json.dump({'version': QUEUE_VERSION, 'numItems': num_items, 'shardSize': shard_size,
+                       'numShards': num_shards}, f, indent=4)
+        try:
+            rename(tmp_directory, self.directory)
+            logger.debug("Created queue %s of %d shards", self.directory, num_shards)
+        except OSError:
+            # Created by another worker
+            shutil.rmtree(tmp_directory)
+            if not path.isdir(self.directory):
+                raise
+
+    def _path(self, *names):
+        return path.join(self.directory, *names)
+
+    def shardRange(self, shard):
+        start = shard * self.meta['shardSize']
+        return start, min(start + self.meta['shardSize'], self.meta['numItems'])
+
+    def done(self):
+        return sorted(_shardIndex(filename) for filename in listdir(self._path('done')) if filename.endswith('.npz'))
+
+    def isDone(self):
+        return len(self.done()) == self.meta['numShards']
+
+    def claim(self):
+        """
+        Claim a shard of todo/. Returns its index or None if there are none left.
+        """
+        done = set(self.done())
+        for filename in sorted(listdir(self._path('todo'))):
+            shard = _shardIndex(filename)
+            claimed = self._path('claimed', '%s.%s' % (filename, self.worker))
+            try:
+                rename(self._path('todo', filename), claimed)
+            except OSError:
+                # Claimed by another worker
+                continue
+            if shard in done:
+                # Saved by a worker whose lease expired
+                remove(claimed)
+                continue
+            # The lease starts now
+            utime(claimed, None)
+            return shard
+        return None
+
+    def release(self, shard):
+        """
+        Return the claimed $shard to todo/
+        """
+        try:
+            rename(self._path('claimed', '%s.%s' % (_shardName(shard), self.worker)), self._path('todo', _shardName(shard)))
+        except OSError:
+            logger.warn("Shard %d was taken from %s", shard, self.worker)
+
+    def complete(self, shard, **arrays):
+        """
+        Save the result $arrays of the claimed $shard
+        """
+        filename = self._path('done', _shardName(shard) + '.npz')
+        tmp_filename = '%s.%s.tmp' % (filename, self.worker)
+        with open(tmp_filename, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            fsync(f.fileno())
+        rename(tmp_filename, filename)
+        try:
+            remove(self._path('claimed', '%s.%s' % (_shardName(shard), self.worker)))
+        except OSError:
+            logger.warn("Shard %d was taken from %s", shard, self.worker)
+
+    def requeueExpired(self):
+        """
+        Return the claims older than the lease to todo/. Returns the number of shards.
+        """
+        num_shards = 0
+        now = time.time()
+        for filename in listdir(self._path('claimed')):
+            claimed = self._path('claimed', filename)
+            try:
+                if now - path.getmtime(claimed) < self.lease:
+                    continue
+                rename(claimed, self._path('todo', filename.split('.', 1)[0]))
+            except OSError:
+                # Completed or requeued by another worker
+                continue
+            logger.warn("Lease of %s expired", filename)
+            metrics.increment('evaluation_expired_leases')
+            num_shards += 1
+        return num_shards
+
+    def results(self):
+        """
+        Results of all the shards, concatenated in the order of the groups
+        """
+        if not self.isDone():
+            raise ValueError("Queue %s is not done" % self.directory)
+        shards = []
+        for shard in range(self.meta['numShards']):
+            with np.load(self._path('done', _shardName(shard) + '.npz')) as data:
+                shards.append(dict((name, data[name]) for name in data.files))
+        if not shards:
+            return {}
+        return dict((name, np.concatenate([shard[name] for shard in shards])) for name in shards[0])
+
+    def run(self, evaluate, wait=True, poll=POLL_SECONDS):
+        """
+        Evaluate the shards of the queue with $evaluate(start, stop), which
+        returns a dict of arrays with a value by group. If $wait, also wait
+        for the shards of other workers and return the results. Raises
+        EvaluationStoppedError if a stop is requested.
+        """
+        _state['running'] += 1
+        try:
+            while True:
+                if _state['stop']:
+                    raise EvaluationStoppedError("Evaluation of %s stopped" % self.directory)
+                shard = self.claim()
+                if shard is None and self.requeueExpired():
+                    shard = self.claim()
+                if shard is None:
+                    if not wait or self.isDone():
+                        break
+                    time.sleep(poll)
+                    continue
+                start, stop = self.shardRange(shard)
+                try:
+                    with metrics.timer('evaluation.shard'):
+                        arrays = evaluate(start, stop)
+                except BaseException:
+                    self.release(shard)
+                    raise
+                self.complete(shard, **arrays)
+                metrics.increment('evaluation_shards')
+                logger.debug("Shard %d of %s saved (groups %d-%d)", shard, self.directory, start, stop)
+        finally:
+            _state['running'] -= 1
+            if not _state['running']:
+                _state['stop'] = False
+        return self.results() if wait else None
@@ -0,0 +1,228 @@
+from collections import OrderedDict
+from coRatedIndex import popcount
+from errors import MaxInvalidIterationsError
+from metrics import metrics
+import numpy as np
+import random
+import logging
+
+logger = logging.getLogger('groupSampler')
+logger.setLevel(logging.DEBUG)
+
+# Movies co-rated by all the users of a valid group
+MIN_CO_RATED = 10
+# Seeds that give no group in a row before giving up
+MAX_INVALID_ITERATIONS = 20
+# Ranked users tried by the greedy search of similar and disimilar groups (x group size)
+CANDIDATES_FACTOR = 4
+# Seeds whose neighbourhood is kept
+NEIGHBOURHOOD_CACHE_SIZE = 1024
+# Seeds sampled to estimate the achievable groups
+PLAN_SAMPLE = 50
+# Share of the members that rate a movie of a valid group (1 for the movies co-rated by all of them)
+MIN_COVERAGE = 1.0
+
+
+def _bits(words):
+    # One uint8 by bit of the uint64 $words (the order of the bits is the same for every bitset)
+    return np.unpackbits(np.ascontiguousarray(words).view(np.uint8))
+
+
+class GroupSampler(object):
+    """
+    Samples groups of users of a ratings dataset that co-rate at least
+    $min_co_rated movies.
+
+    With $min_coverage < 1 (groups whose missing ratings are predicted by
+    a model) a group is valid if $min_co_rated movies are rated by at
+    least that share of its members (at least one of them), so larger
+    groups are feasible.
+
+    Instead of building a group and rejecting it when it has too few
+    co-rated movies, only feasible users are proposed:
+    - Seeds of similar and random groups come from the users with at least
+      $min_co_rated ratings, and their members from the seed neighbourhood
+      (the users that co-rate $min_co_rated movies with it).
+    - Members are added greedily in the order of the group type (most
+      similar, most disimilar or random) if the bitset of the movies
+      co-rated by the group keeps $min_co_rated movies.
+    Users already in a group of the same type are removed from an active
+    mask, so the ratings are never copied. Similar groups are ranked by the
+    SimilarityStore of the generator if it has one of $ratings.
+    """
+    def __init__(self, generator, ratings, min_co_rated=MIN_CO_RATED, min_coverage=MIN_COVERAGE):
+        self.generator = generator
+        self.ratings = ratings
+        self.min_co_rated = min_co_rated
+        self.min_coverage = min_coverage
+        self.index = generator.getCoRatedIndex(ratings)
+        self.matrix = self.index.matrix
+        self.eligible = np.diff(self.index.indptr) >= min_co_rated
+        self.active = self.eligible.copy()
+        self.similarities = generator.getSimilarityStore(ratings)
+        self._neighbourhoods = OrderedDict()
+
+    def reset(self):
+        """
+        Make all the users available again
+        """
+        self.active = self.eligible.copy()
+
+    def neighbourhood(self, row):
+        """
+        Rows of the users that co-rate $min_co_rated movies with the user of $row
+        """
+        neighbourhood = self._neighbourhoods.pop(row, None)
+        if neighbourhood is None:
+            indptr, indices = self.index.indptr, self.index.indices
+            rated = np.zeros(self.matrix.shape[1], dtype=np.int32)
+            rated[indices[indptr[row]:indptr[row + 1]]] = 1
+            cumulative = np.concatenate([[0], np.cumsum(rated[indices])])
+            counts = cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+            counts[row] = 0
+            neighbourhood = np.flatnonzero(counts >= self.min_co_rated).astype(np.int32)
+            metrics.observe('neighbourhood_size', len(neighbourhood))
+        self._neighbourhoods[row] = neighbourhood
+        while len(self._neighbourhoods) > NEIGHBOURHOOD_CACHE_SIZE:
+            self._neighbourhoods.popitem(last=False)
+        return neighbourhood
+
+    def _raters(self, size):
+        # Members of a group of $size users that rate a covered movie
+        return max(1, int(np.ceil(self.min_coverage * size - 1e-9)))
+
+    def isValid(self, rows):
+        """
+        Whether the users of $rows co-rate at least $min_co_rated movies
+        (or cover them with $min_coverage)
+        """
+        if len(rows) == 0:
+            return False
+        if self.min_coverage >= 1:
+            return popcount(np.bitwise_and.reduce(self.index.bitsets[rows])) >= self.min_co_rated
+        counts = np.sum([_bits(self.index.bitsets[row]) for row in rows], axis=0)
+        return (counts >= self._raters(len(rows))).sum() >= self.min_co_rated
+
+    def _activeNeighbourhood(self, row):
+        neighbourhood = self.neighbourhood(row)
+        return neighbourhood[self.active[neighbourhood]]
+
+    def _greedy(self, rows, size, bitset=None):
+        # First $size rows keeping $min_co_rated co-rated (or covered) movies
+        # of $bitset (all the movies if None)
+        if self.min_coverage < 1:
+            return self._greedyCoverage(rows, size, bitset)
+        group = []
+        for row in rows:
+            co_rated = self.index.bitsets[row] if bitset is None else bitset & self.index.bitsets[row]
+            if popcount(co_rated) >= self.min_co_rated:
+                group.append(row)
+                bitset = co_rated
+                if len(group) == size:
+                    return group
+        return None
+
+    def _greedyCoverage(self, rows, size, bitset=None):
+        # The members of a group of n users cover the movies rated by _raters(n) of them
+        movies = None if bitset is None else _bits(bitset)
+        counts = np.zeros(self.index.bitsets.shape[1] * 64, dtype=np.int32)
+        group = []
+        for row in rows:
+            rated = _bits(self.index.bitsets[row])
+            if movies is not None:
+                rated &= movies
+            new_counts = counts + rated
+            if (new_counts >= self._raters(len(group) + 1)).sum() >= self.min_co_rated:
+                group.append(row)
+                counts = new_counts
+                if len(group) == size:
+                    return group
+        return None
+
+    def _ranked(self, seed, rows, size, farthest):
+        if self.similarities is not None and not farthest:
+            # The store has no self similarities, but the seed is the most similar to itself
+            ranked = self.similarities.ranked(seed, rows[rows != seed], size * CANDIDATES_FACTOR - 1)
+            return np.append([seed], ranked) if seed in rows else ranked
+        index = self.generator.getNeighbourIndex(self.ratings)
+        user_ids = self.matrix.user_ids
+        query = index.farthest if farthest else index.nearest
+        ranked = query(user_ids[seed], size * CANDIDATES_FACTOR, user_ids[rows]).index
+        return self.matrix.userIndex(list(ranked))
+
+    def _similarGroup(self, seed, size, rng):
+        rows = self._activeNeighbourhood(seed)
+        if len(rows) < size - 1:
+            return None
+        # The seed is the most similar to itself
+        return self._greedy(self._ranked(seed, np.append(rows, seed), size, False), size)
+
+    def _disimilarGroup(self, seed, size, rng):
+        rows = np.flatnonzero(self.active)
+        return self._greedy(self._ranked(seed, rows, size, True), size)
+
+    def _randomGroup(self, seed, size, rng):
+        rows = self._activeNeighbourhood(seed)
+        if len(rows) < size - 1:
+            return None
+        # Random users among the seed and its neighbourhood, co-rating movies of the seed
+        rows = list(np.append(rows, seed))
+        rng.shuffle(rows)
+        return self._greedy(rows, size, self.index.bitsets[seed])
+
+    def _selector(self, group_type):
+        return {
+            'similar': self._similarGroup,
+            'disimilar': self._disimilarGroup,
+            'random': self._randomGroup
+        }[group_type]
+
+    def plan(self, num_groups, size, group_type):
+        """
+        Estimate of the groups of $size users of $group_type (at most
+        $num_groups) that can be sampled from the active users: the share
+        of PLAN_SAMPLE active seeds that give a group with the selector of
+        $group_type, split in groups of $size users. The active users are
+        not changed.
+        """
+        select = self._selector(group_type)
+        rows = np.flatnonzero(self.active)
+        if len(rows) < size:
+            return 0
+        sample = rows[np.random.RandomState(size).permutation(len(rows))[:PLAN_SAMPLE]]
+        rng = random.Random(size)
+        feasible = np.mean([select(seed, size, rng) is not None for seed in sample])
+        return min(num_groups, int(feasible * len(rows) / size))
+
+    def groups(self, num_groups, size, group_type, rng=random):
+        """
+        Generate up to $num_groups groups of $size users of $group_type.
+        Users are not repeated in the groups. Raises MaxInvalidIterationsError
+        after MAX_INVALID_ITERATIONS seeds in a row give no group or when
+        there are no seeds left.
+        """
+        select = self._selector(group_type)
+        labels = {'group_type': group_type, 'size': size}
+        num_invalid = 0
+        num_generated_groups = 0
+        tried = np.zeros(len(self.active), dtype=bool)
+        while num_generated_groups < num_groups:
+            seeds = np.flatnonzero(self.active & ~tried)
+            if len(seeds) == 0 or num_invalid > MAX_INVALID_ITERATIONS:
+                metrics.increment('max_invalid_iterations_aborts', labels=labels)
+                raise MaxInvalidIterationsError()
+            seed = rng.choice(seeds)
+            tried[seed] = True
+            with metrics.timer('selectGroup.%s' % group_type):
+                group = select(seed, size, rng)
+            if group is None:
+                num_invalid += 1
+                metrics.increment('invalid_group_retries', labels=labels)
+                logger.debug("Invalid group iteration %d", num_invalid)
+                continue
+            num_invalid = 0
+            num_generated_groups += 1
+            metrics.increment('groups', labels=labels)
+            metrics.observe('group_co_rated_movies', popcount(np.bitwise_and.reduce(self.index.bitsets[group])))
+            self.active[group] = False
+            yield list(self.matrix.user_ids[group])
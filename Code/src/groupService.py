@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from collections import OrderedDict
+from urlparse import urlparse, parse_qs
+from os import path
+from pandas import read_csv
+from datasetGenerator import DatasetGenerator
+from concensusFn import KERNELS
+from movieMetadata import MovieMetadata
+import argparse
+import threading
+import json
+import logging
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
+
+logger = logging.getLogger('groupService')
+logger.setLevel(logging.DEBUG)
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_TOP_N = 10
+
+CONCENSUS_FNS = dict((fn.__name__, fn) for fn in KERNELS)
+
+
+class LRUCache(object):
+    """
+    Thread safe LRU cache of at most $max_size values.
+
+    Concurrent calls to get with the same key are coalesced: the first one
+    computes the value and the others wait for it.
+    """
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.values:
+                self.hits += 1
+                value = self.values.pop(key)
+                self.values[key] = value
+                return value
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                self.misses += 1
+                pending = self.pending[key] = {'done': threading.Event()}
+
+        if not owner:
+            pending['done'].wait()
+            if 'error' in pending:
+                raise pending['error']
+            return pending['value']
+
+        try:
+            pending['value'] = value = compute()
+        except Exception as e:
+            pending['error'] = e
+            raise
+        else:
+            with self.lock:
+                self.values[key] = value
+                while len(self.values) > self.max_size:
+                    self.values.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.pending[key]
+            pending['done'].set()
+        return value
+
+
+class GroupRecommender(object):
+    """
+    Concensus rankings of groups of users of a ratings dataset.
+
+    The group matrices and the rankings of every concensus function are
+    kept in LRU caches keyed by the sorted group, so a group is only
+    computed once while it is in the cache. The rankings can be restricted
+    to the movies of a MovieFilter of the $movies metadata, which are
+    selected before the concensus scores are computed.
+    """
+    def __init__(self, ratings, movies, cache_size=DEFAULT_CACHE_SIZE):
+        self.ratings = ratings
+        self.titles = movies.set_index('movieId').title
+        self.metadata = MovieMetadata(movies)
+        self.generator = DatasetGenerator(data=ratings)
+        self.matrices = LRUCache(cache_size)
+        self.rankings = LRUCache(cache_size)
+        # Build the shared structures before serving concurrent requests
+        self.generator.getRatingMatrix(ratings)
+        self.generator.getCoRatedIndex(ratings)
+
+    def groupMatrix(self, group):
+        group = tuple(sorted(set(group)))
+        return self.matrices.get(group, lambda: self.generator.getGroupMatrix(self.ratings, group))
+
+    def ranking(self, group, concensus_name, movie_filter=None):
+        """
+        Concensus scores of the co-rated movies of $group (that pass
+        $movie_filter) in descending order
+        """
+        if concensus_name not in CONCENSUS_FNS:
+            raise ValueError("Unknown concensus function: %s" % concensus_name)
+        group = tuple(sorted(set(group)))
+        movie_filter = self.metadata.checkFilter(movie_filter) if movie_filter else None
+
+        def compute():
+            logger.debug("Computing %s of group %s (%s)", concensus_name, group, movie_filter)
+            group_matrix = self.groupMatrix(group)
+            if movie_filter is not None:
+                group_matrix = group_matrix.loc[:, self.metadata.mask(movie_filter, group_matrix.columns.values)]
+            scores = CONCENSUS_FNS[concensus_name](group_matrix)
+            return scores.dropna().sort_values(ascending=False)
+        return self.rankings.get((group, concensus_name, str(movie_filter or '')), compute)
+
+    def recommend(self, group, concensus_name, n=DEFAULT_TOP_N, movie_filter=None):
+        """
+        Top $n movies of $group with their titles and concensus scores
+        """
+        ranking = self.ranking(group, concensus_name, movie_filter).head(n)
+        return [{'movieId': int(movie_id), 'title': self.titles.get(movie_id), 'score': float(score)}
+                for movie_id, score in ranking.iteritems()]
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def makeHandler(recommender):
+    class GroupRequestHandler(BaseHTTPRequestHandler):
+        """
+        GET /recommend?users=1,2,3&concensus=mean&n=10&filter=Comedy and not Horror, after 1990
+        """
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/recommend':
+                return self.reply(404, {'error': 'Not found'})
+            query = parse_qs(url.query)
+            try:
+                group = [int(user_id) for user_id in query['users'][0].split(',')]
+                concensus_name = query.get('concensus', ['mean'])[0]
+                n = int(query.get('n', [DEFAULT_TOP_N])[0])
+                movie_filter = query.get('filter', [None])[0]
+                movies = recommender.recommend(group, concensus_name, n, movie_filter)
+            except (KeyError, ValueError) as e:
+                return self.reply(400, {'error': str(e)})
+            self.reply(200, {'group': sorted(set(group)), 'concensus': concensus_name, 'movies': movies})
+
+        def reply(self, status, content):
+            body = json.dumps(content)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return GroupRequestHandler
+
+
+def serve(recommender, host='localhost', port=8000):
+    server = ThreadingHTTPServer((host, port), makeHandler(recommender))
+    logger.info("Serving group recommendations on %s:%d", host, port)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Group recommendation service')
+    parser.add_argument('--ratings', default=path.join(DATA_DIR, 'ratings.csv'))
+    parser.add_argument('--movies', default=path.join(DATA_DIR, 'movies.csv'))
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    ratings = DatasetGenerator(args.ratings, compact=False).data
+    recommender = GroupRecommender(ratings, read_csv(args.movies), args.cache_size)
+    serve(recommender, args.host, args.port)
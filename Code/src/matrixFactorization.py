@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+from multiprocessing.pool import ThreadPool
+from pandas import DataFrame
+from ratingMatrix import RatingMatrix, idsIndex
+from metrics import metrics
+import numpy as np
+import argparse
+import json
+import logging
+
+logger = logging.getLogger('matrixFactorization')
+logger.setLevel(logging.DEBUG)
+
+DEFAULT_FACTORS = 20
+DEFAULT_REGULARIZATION = 0.05
+DEFAULT_ITERATIONS = 10
+# Ratings of the users (or movies) solved at once by a thread. Every chunk
+# takes chunk_ratings x factors x factors floats
+CHUNK_RATINGS = 20000
+# Movies of a group matrix completed with the model
+NUM_CANDIDATES = 200
+
+
+def _chunks(indptr, chunk_ratings):
+    # (start, stop) row ranges with about $chunk_ratings ratings each
+    bounds = np.searchsorted(indptr, np.arange(0, indptr[-1], chunk_ratings), side='right') - 1
+    bounds = np.unique(np.concatenate([bounds, [len(indptr) - 1]]))
+    return zip(bounds[:-1], bounds[1:])
+
+
+class ALSModel(object):
+    """
+    Matrix factorization of a RatingMatrix trained with alternating least
+    squares.
+
+    A rating is predicted as mean + p_u . q_m with $num_factors factors by
+    user and movie. Every half iteration fixes the factors of one side and
+    solves the ridge regression of each user (or movie)
+        (Q_u' Q_u + $regularization * n_u * I) p_u = Q_u' (r_u - mean)
+    over its n_u ratings. The systems of a chunk of rows are built with a
+    segmented sum and solved in a batch, and the chunks are solved by
+    $threads threads (numpy releases the GIL).
+    """
+    def __init__(self, num_factors=DEFAULT_FACTORS, regularization=DEFAULT_REGULARIZATION,
+                 iterations=DEFAULT_ITERATIONS, threads=None, seed=None):
+        self.num_factors = num_factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.threads = threads
+        self.seed = seed
+        self.mean = 0.
+        self.user_factors = self.movie_factors = None
+        self.user_ids = self.movie_ids = None
+        self.min_rating = self.max_rating = None
+
+    def params(self):
+        return {'num_factors': self.num_factors, 'regularization': self.regularization,
+                'iterations': self.iterations, 'seed': self.seed}
+
+    def _solveChunk(self, csr, fixed, solution, start, stop):
+        indptr = csr.indptr[start:stop + 1]
+        counts = np.diff(indptr)
+        rated = counts > 0
+        if not rated.any():
+            solution[start:stop] = 0
+            return
+        indices = csr.indices[indptr[0]:indptr[-1]]
+        residuals = csr.data[indptr[0]:indptr[-1]] - self.mean
+        factors = fixed[indices]
+        offsets = indptr[:-1][rated] - indptr[0]
+
+        systems = np.zeros((stop - start, self.num_factors, self.num_factors))
+        systems[rated] = np.add.reduceat(factors[:, :, np.newaxis] * factors[:, np.newaxis, :], offsets, axis=0)
+        systems += (self.regularization * np.maximum(counts, 1))[:, np.newaxis, np.newaxis] * np.eye(self.num_factors)
+        targets = np.zeros((stop - start, self.num_factors))
+        targets[rated] = np.add.reduceat(factors * residuals[:, np.newaxis], offsets, axis=0)
+        solution[start:stop] = np.linalg.solve(systems, targets[:, :, np.newaxis])[:, :, 0]
+
+    def _solve(self, csr, fixed, solution, pool):
+        chunks = _chunks(csr.indptr, CHUNK_RATINGS)
+        pool.map(lambda chunk: self._solveChunk(csr, fixed, solution, *chunk), chunks, chunksize=1)
+
+    def fit(self, matrix):
+        """
+        Train the model with the ratings of the RatingMatrix $matrix
+        """
+        logger.debug("Training ALS model of %d factors with %d ratings", self.num_factors, matrix.nnz)
+        csr = matrix.matrix
+        csr_t = matrix.csc.T.tocsr()
+        self.user_ids, self.movie_ids = matrix.user_ids, matrix.movie_ids
+        self.mean = csr.data.mean() if matrix.nnz else 0.
+        self.min_rating, self.max_rating = (csr.data.min(), csr.data.max()) if matrix.nnz else (0., 0.)
+
+        rng = np.random.RandomState(self.seed)
+        self.user_factors = rng.normal(scale=0.1, size=(matrix.shape[0], self.num_factors))
+        self.movie_factors = rng.normal(scale=0.1, size=(matrix.shape[1], self.num_factors))
+        pool = ThreadPool(self.threads)
+        try:
+            for iteration in range(self.iterations):
+                with metrics.timer('als.iteration'):
+                    self._solve(csr, self.movie_factors, self.user_factors, pool)
+                    self._solve(csr_t, self.user_factors, self.movie_factors, pool)
+                logger.debug("Iteration %d, RMSE %.4f", iteration, self.rmse(matrix))
+        finally:
+            pool.close()
+            pool.join()
+        return self
+
+    def rmse(self, matrix):
+        """
+        Root mean squared error of the predictions of the ratings of $matrix
+        (with the users and movies of the model)
+        """
+        coo = matrix.matrix.tocoo()
+        rows = np.searchsorted(self.user_ids, matrix.user_ids)[coo.row]
+        cols = np.searchsorted(self.movie_ids, matrix.movie_ids)[coo.col]
+        predictions = self.mean + np.einsum('ij,ij->i', self.user_factors[rows], self.movie_factors[cols])
+        return np.sqrt(np.mean((predictions - coo.data) ** 2))
+
+    def predictRows(self, rows, cols):
+        """
+        Predicted ratings (rows x cols) of the users in $rows and movies in
+        $cols (indexes of the training matrix), within the ratings range
+        """
+        predictions = self.mean + self.user_factors[rows].dot(self.movie_factors[cols].T)
+        return np.clip(predictions, self.min_rating, self.max_rating)
+
+    def predict(self, user_ids, movie_ids):
+        """
+        Predicted ratings of the users in $user_ids (rows) for the movies in $movie_ids (columns)
+        """
+        rows = idsIndex(user_ids, self.user_ids, 'user')
+        cols = idsIndex(movie_ids, self.movie_ids, 'movie')
+        return DataFrame(self.predictRows(rows, cols), index=user_ids, columns=movie_ids)
+
+    def completeMatrix(self, matrix, user_ids, movie_ids):
+        """
+        Ratings of $user_ids (rows) for $movie_ids (columns) in the
+        RatingMatrix $matrix, with the missing ones predicted. Users and
+        movies are sorted as in RatingMatrix.subMatrix.
+        """
+        user_ids, movie_ids = sorted(user_ids), sorted(movie_ids)
+        observed = matrix.subMatrix(user_ids=user_ids, movie_ids=movie_ids).toDataFrame()
+        predictions = self.predict(user_ids, movie_ids)
+        return observed.where(observed.notnull(), predictions)
+
+    def save(self, filename):
+        """
+        Save the model in the .npz file $filename
+        """
+        np.savez(filename, user_factors=self.user_factors, movie_factors=self.movie_factors,
+                 user_ids=self.user_ids, movie_ids=self.movie_ids,
+                 ratings=np.array([self.mean, self.min_rating, self.max_rating]),
+                 params=np.array(json.dumps(self.params())))
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            model = cls(**json.loads(str(data['params'])))
+            model.user_factors = data['user_factors']
+            model.movie_factors = data['movie_factors']
+            model.user_ids = data['user_ids']
+            model.movie_ids = data['movie_ids']
+            model.mean, model.min_rating, model.max_rating = data['ratings']
+        return model
+
+
+def candidateMovies(matrix, user_ids, num_candidates=NUM_CANDIDATES):
+    """
+    The $num_candidates movies rated by most of the users in $user_ids
+    (ties by the total number of ratings), so the movies co-rated by all
+    of them come first
+    """
+    rows = matrix.userIndex(sorted(user_ids))
+    group_counts = np.asarray(matrix.presence()[rows].sum(axis=0)).ravel()
+    rated = np.flatnonzero(group_counts)
+    order = np.lexsort((-np.diff(matrix.csc.indptr)[rated], -group_counts[rated]))
+    return list(matrix.movie_ids[rated[order[:num_candidates]]])
+
+
+if __name__ == '__main__':
+    from ratingsStore import RatingsStore, isStore
+    from pandas import read_csv
+
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='ALS matrix factorization of a ratings dataset')
+    parser.add_argument('ratings', help='Ratings csv file or ratings store')
+    parser.add_argument('output', help='Model .npz file')
+    parser.add_argument('--factors', type=int, default=DEFAULT_FACTORS)
+    parser.add_argument('--regularization', type=float, default=DEFAULT_REGULARIZATION)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--seed', type=int, default=1985)
+    args = parser.parse_args()
+
+    if isStore(args.ratings):
+        matrix = RatingsStore(args.ratings).toRatingMatrix()
+    else:
+        matrix = RatingMatrix.fromRatings(read_csv(args.ratings))
+    model = ALSModel(args.factors, args.regularization, args.iterations, args.threads, args.seed).fit(matrix)
+    model.save(args.output)
+    logger.info("Model saved in %s (RMSE %.4f)", args.output, model.rmse(matrix))
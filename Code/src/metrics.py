@@ -0,0 +1,274 @@
+from timeit import default_timer
+import threading
+import resource
+import json
+import re
+
+# Upper bounds of the histogram buckets (sizes of frames and sets)
+DEFAULT_BUCKETS = (1, 5, 10, 50, 100, 500, 1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, float('inf'))
+PROMETHEUS_PREFIX = 'groups_'
+
+
+def peakRss():
+    """
+    Peak resident memory of the process in MB since the last reset
+    """
+    try:
+        with open('/proc/self/status') as f:
+            return int(re.search(r'VmHWM:\s+(\d+)', f.read()).group(1)) / 1024.
+    except (IOError, AttributeError):
+        # ru_maxrss is in KB on Linux and it can't be reset
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def resetPeakRss():
+    """
+    Reset the peak to the current resident memory (Linux only)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except IOError:
+        pass
+
+
+def currentRss():
+    """
+    Resident memory of the process in MB, or the peak if not available
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024. ** 2
+    except IOError:
+        return peakRss()
+
+
+def _boundText(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    """
+    Wall time and peak resident memory of a stage. The peak is reset when
+    a stage starts, so the peak reached before it is first carried to the
+    running stages (the enclosing ones and those of other threads), and
+    the peak of the stage is carried to them when it ends.
+    """
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.peak_rss_mb = 0.
+
+    def __enter__(self):
+        with self.metrics.rss_lock:
+            self.metrics.carryPeakRss(peakRss())
+            resetPeakRss()
+            self.peak_rss_mb = currentRss()
+            self.metrics.running.append(self)
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *args):
+        seconds = default_timer() - self.start
+        with self.metrics.rss_lock:
+            self.metrics.running.remove(self)
+            peak_rss_mb = max(self.peak_rss_mb, peakRss())
+            self.metrics.carryPeakRss(peak_rss_mb)
+        self.metrics.addTime(self.name, seconds, peak_rss_mb)
+        return False
+
+
+class Metrics(object):
+    """
+    Timers, counters and histograms of the stages of the group generation
+    and evaluation.
+
+    - timer(stage): wall time (count, total and max) and the peak resident
+      memory of the process while the stage runs.
+    - increment(name, labels): counters, e.g. retries by group type.
+    - observe(name, value): histograms of sizes in DEFAULT_BUCKETS.
+
+    Nothing is recorded while disabled, and every call returns at once.
+    """
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # Timers running, whose peak memory is kept when the peak is reset
+        self.rss_lock = threading.Lock()
+        self.running = []
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def carryPeakRss(self, peak_rss_mb):
+        for timer in self.running:
+            timer.peak_rss_mb = max(timer.peak_rss_mb, peak_rss_mb)
+
+    def addTime(self, stage, seconds, peak_rss_mb=0):
+        with self.lock:
+            timer = self.timers.get(stage)
+            if timer is None:
+                timer = self.timers[stage] = {'count': 0, 'total': 0., 'max': 0., 'peak_rss_mb': 0.}
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+            timer['peak_rss_mb'] = max(timer['peak_rss_mb'], peak_rss_mb)
+
+    def increment(self, name, value=1, labels=None):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'count': 0, 'sum': 0., 'buckets': [0] * len(self.buckets)}
+            histogram['count'] += 1
+            histogram['sum'] += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+
+    def snapshot(self):
+        """
+        Copy of the metrics that can be pickled and merged
+        """
+        with self.lock:
+            return {
+                'timers': dict((stage, dict(timer)) for stage, timer in self.timers.items()),
+                'counters': dict(self.counters),
+                'histograms': dict((key, {'count': h['count'], 'sum': h['sum'], 'buckets': list(h['buckets'])})
+                                   for key, h in self.histograms.items())
+            }
+
+    def merge(self, snapshot):
+        """
+        Add the metrics of $snapshot (e.g. from a worker process)
+        """
+        with self.lock:
+            for stage, other in snapshot['timers'].items():
+                timer = self.timers.setdefault(stage, {'count': 0, 'total': 0., 'max': 0., 'peak_rss_mb': 0.})
+                timer['count'] += other['count']
+                timer['total'] += other['total']
+                timer['max'] = max(timer['max'], other['max'])
+                timer['peak_rss_mb'] = max(timer['peak_rss_mb'], other['peak_rss_mb'])
+            for key, value in snapshot['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, other in snapshot['histograms'].items():
+                histogram = self.histograms.setdefault(key, {'count': 0, 'sum': 0., 'buckets': [0] * len(self.buckets)})
+                histogram['count'] += other['count']
+                histogram['sum'] += other['sum']
+                histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], other['buckets'])]
+
+    def toDict(self):
+        snapshot = self.snapshot()
+        # json has no infinity
+        bounds = [bound if bound != float('inf') else '+Inf' for bound in self.buckets]
+
+        def labelled(key, values):
+            name, labels = key
+            values['name'] = name
+            values['labels'] = dict(labels)
+            return values
+
+        return {
+            'timers': dict((stage, timer) for stage, timer in snapshot['timers'].items()),
+            'counters': [labelled(key, {'value': value}) for key, value in sorted(snapshot['counters'].items())],
+            'histograms': [labelled(key, {'count': h['count'], 'sum': h['sum'], 'buckets': zip(bounds, h['buckets'])})
+                           for key, h in sorted(snapshot['histograms'].items())]
+        }
+
+    def toJson(self):
+        return json.dumps(self.toDict(), indent=2)
+
+    def toPrometheus(self):
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def labelsText(labels):
+            if not labels:
+                return ''
+            return '{%s}' % ','.join('%s="%s"' % (name, value) for name, value in labels)
+
+        if snapshot['timers']:
+            name = PROMETHEUS_PREFIX + 'stage_seconds'
+            lines.append('# TYPE %s summary' % name)
+            for stage, timer in sorted(snapshot['timers'].items()):
+                labels = labelsText([('stage', stage)])
+                lines.append('%s_count%s %d' % (name, labels, timer['count']))
+                lines.append('%s_sum%s %r' % (name, labels, timer['total']))
+            for suffix, field in [('stage_max_seconds', 'max'), ('stage_peak_rss_megabytes', 'peak_rss_mb')]:
+                lines.append('# TYPE %s%s gauge' % (PROMETHEUS_PREFIX, suffix))
+                for stage, timer in sorted(snapshot['timers'].items()):
+                    lines.append('%s%s%s %r' % (PROMETHEUS_PREFIX, suffix, labelsText([('stage', stage)]), timer[field]))
+
+        for name in sorted(set(name for name, _ in snapshot['counters'])):
+            lines.append('# TYPE %s%s_total counter' % (PROMETHEUS_PREFIX, name))
+            for (counter_name, labels), value in sorted(snapshot['counters'].items()):
+                if counter_name == name:
+                    lines.append('%s%s_total%s %d' % (PROMETHEUS_PREFIX, name, labelsText(labels), value))
+
+        for name in sorted(set(name for name, _ in snapshot['histograms'])):
+            lines.append('# TYPE %s%s histogram' % (PROMETHEUS_PREFIX, name))
+            for (histogram_name, labels), histogram in sorted(snapshot['histograms'].items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append('%s%s_bucket%s %d' % (PROMETHEUS_PREFIX, name,
+                                                       labelsText(labels + (('le', _boundText(bound)),)), cumulative))
+                lines.append('%s%s_count%s %d' % (PROMETHEUS_PREFIX, name, labelsText(labels), histogram['count']))
+                lines.append('%s%s_sum%s %r' % (PROMETHEUS_PREFIX, name, labelsText(labels), histogram['sum']))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, filename):
+        """
+        Save the metrics as json (.json) or in the Prometheus text format
+        """
+        with open(filename, 'w') as f:
+            f.write(self.toJson() if filename.endswith('.json') else self.toPrometheus())
+
+
+# Metrics of the process, disabled by default
+metrics = Metrics()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+from pandas import read_csv
+from os import path
+import numpy as np
+import argparse
+import logging
+import re
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
+
+logger = logging.getLogger('movieMetadata')
+logger.setLevel(logging.DEBUG)
+
+# Year at the end of a title: "Toy Story (1995)" or "Fawlty Towers (1975-1979)"
+YEAR_PATTERN = r'\((\d{4})[^()]*\)\s*$'
+# Year clauses of a filter
+YEAR_CLAUSES = [
+    (re.compile(r'\bbetween\s+(\d{4})\s+and\s+(\d{4})\b', re.I), lambda first, last: (int(first), int(last))),
+    (re.compile(r'\bafter\s+(\d{4})\b', re.I), lambda year: (int(year) + 1, None)),
+    (re.compile(r'\b(?:since|from)\s+(\d{4})\b', re.I), lambda year: (int(year), None)),
+    (re.compile(r'\bbefore\s+(\d{4})\b', re.I), lambda year: (None, int(year) - 1)),
+    (re.compile(r'\buntil\s+(\d{4})\b', re.I), lambda year: (None, int(year))),
+    (re.compile(r'\bin\s+(\d{4})\b', re.I), lambda year: (int(year), int(year)))
+]
+
+
+class MovieFilter(object):
+    """
+    Condition on the genres and year of a movie. The movie has at least
+    one genre of every tuple of $genres, none of $excluded and was
+    released between $min_year and $max_year (both included, None for no
+    limit).
+    """
+    def __init__(self, genres=(), excluded=(), min_year=None, max_year=None):
+        self.genres = [tuple(alternatives) for alternatives in genres]
+        self.excluded = list(excluded)
+        self.min_year = min_year
+        self.max_year = max_year
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Filter of a text like "Comedy and not Horror, after 1990": clauses
+        joined by commas or "and", each one a genre, "not" a genre, genres
+        joined by "or", or a year condition (after, before, since, until,
+        in or between years)
+        """
+        movie_filter = cls()
+        for clause in text.split(','):
+            for pattern, limits in YEAR_CLAUSES:
+                for match in pattern.finditer(clause):
+                    min_year, max_year = limits(*match.groups())
+                    if min_year is not None:
+                        movie_filter.min_year = max(min_year, movie_filter.min_year)
+                    if max_year is not None:
+                        movie_filter.max_year = min(max_year, movie_filter.max_year or max_year)
+                clause = pattern.sub(' ', clause)
+
+            for term in re.split(r'\band\b', clause, flags=re.I):
+                term = term.strip()
+                if not term:
+                    continue
+                negated = re.match(r'not\s+(.+)$', term, re.I)
+                if negated:
+                    movie_filter.excluded.append(negated.group(1).strip())
+                else:
+                    movie_filter.genres.append(tuple(genre.strip() for genre in re.split(r'\bor\b', term, flags=re.I)))
+        return movie_filter
+
+    def isEmpty(self):
+        return not self.genres and not self.excluded and self.min_year is None and self.max_year is None
+
+    def __str__(self):
+        clauses = [' or '.join(alternatives) for alternatives in self.genres]
+        clauses += ['not %s' % genre for genre in self.excluded]
+        if self.min_year is not None:
+            clauses.append('since %d' % self.min_year)
+        if self.max_year is not None:
+            clauses.append('until %d' % self.max_year)
+        return ' and '.join(clauses)
+
+
+def movieFilter(movie_filter):
+    """
+    $movie_filter as a MovieFilter (it can be the text of MovieFilter.parse)
+    """
+    if isinstance(movie_filter, basestring):
+        return MovieFilter.parse(movie_filter)
+    return movie_filter
+
+
+class MovieMetadata(object):
+    """
+    Title, year and genres of the movies of the $movies DataFrame (movieId,
+    title and genres columns of movies.csv) and the IMDb and TMDb ids of
+    $links (links.csv).
+
+    The genres of every movie are a bitmap with a bit by genre, so a
+    filter is evaluated with a few vectorized and/or over all the movies.
+    """
+    def __init__(self, movies, links=None):
+        movies = movies.sort_values('movieId')
+        self.movie_ids = movies.movieId.values
+        self.titles = movies.title.values
+        self.years = movies.title.str.extract(YEAR_PATTERN, expand=False).astype(np.float64).values
+
+        genres = movies.genres.fillna('').str.get_dummies('|')
+        if len(genres.columns) > 64:
+            raise ValueError("Too many genres for the bitmaps: %d" % len(genres.columns))
+        self.genres = list(genres.columns)
+        self._genre_bits = dict((genre.lower(), np.uint64(1) << np.uint64(i)) for i, genre in enumerate(self.genres))
+        weights = np.uint64(1) << np.arange(len(self.genres), dtype=np.uint64)
+        self.genre_bits = (genres.values.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+        self.imdb_ids = self.tmdb_ids = None
+        if links is not None:
+            links = links.set_index('movieId').reindex(self.movie_ids)
+            self.imdb_ids = links.imdbId.values
+            self.tmdb_ids = links.tmdbId.values
+
+    @classmethod
+    def fromCsv(cls, movies_filename=path.join(DATA_DIR, 'movies.csv'), links_filename=None):
+        logger.debug("Reading movies: %s", movies_filename)
+        links = read_csv(links_filename) if links_filename else None
+        return cls(read_csv(movies_filename), links)
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def _positions(self, movie_ids):
+        # Positions of $movie_ids in the metadata and whether they are in it
+        movie_ids = np.asarray(movie_ids)
+        if len(self.movie_ids) == 0:
+            return np.zeros(len(movie_ids), dtype=np.int64), np.zeros(len(movie_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.movie_ids, movie_ids), len(self.movie_ids) - 1)
+        return positions, self.movie_ids[positions] == movie_ids
+
+    def genreBits(self, genres):
+        """
+        Bitmap of $genres (names in any case)
+        """
+        bits = np.uint64(0)
+        for genre in genres:
+            if genre.lower() not in self._genre_bits:
+                raise ValueError("Unknown genre: %s" % genre)
+            bits |= self._genre_bits[genre.lower()]
+        return bits
+
+    def checkFilter(self, movie_filter):
+        """
+        $movie_filter as a MovieFilter. Raises ValueError if it has genres
+        that are not in the metadata.
+        """
+        movie_filter = movieFilter(movie_filter)
+        self.genreBits([genre for alternatives in movie_filter.genres for genre in alternatives] + movie_filter.excluded)
+        return movie_filter
+
+    def mask(self, movie_filter, movie_ids=None):
+        """
+        Mask of the movies in $movie_ids (all the movies of the metadata by
+        default) that pass $movie_filter. Movies without metadata only pass
+        an empty filter.
+        """
+        movie_filter = movieFilter(movie_filter)
+        if movie_filter.isEmpty():
+            return np.ones(len(self.movie_ids if movie_ids is None else movie_ids), dtype=bool)
+
+        mask = np.ones(len(self.movie_ids), dtype=bool)
+        for alternatives in movie_filter.genres:
+            mask &= (self.genre_bits & self.genreBits(alternatives)) != 0
+        if movie_filter.excluded:
+            mask &= (self.genre_bits & self.genreBits(movie_filter.excluded)) == 0
+        with np.errstate(invalid='ignore'):
+            if movie_filter.min_year is not None:
+                mask &= self.years >= movie_filter.min_year
+            if movie_filter.max_year is not None:
+                mask &= self.years <= movie_filter.max_year
+        if movie_ids is None:
+            return mask
+        positions, found = self._positions(movie_ids)
+        return mask[positions] & found
+
+    def select(self, movie_filter):
+        """
+        Ids of the movies that pass $movie_filter
+        """
+        return self.movie_ids[self.mask(movie_filter)]
+
+    def info(self, movie_id):
+        """
+        Title, year, genres and links of $movie_id
+        """
+        positions, found = self._positions([movie_id])
+        if not found[0]:
+            raise KeyError("Unknown movie id: %s" % movie_id)
+        position = positions[0]
+        info = {
+            'movieId': self.movie_ids[position],
+            'title': self.titles[position],
+            'year': None if np.isnan(self.years[position]) else int(self.years[position]),
+            'genres': [genre for genre in self.genres if self.genre_bits[position] & self._genre_bits[genre.lower()]]
+        }
+        if self.imdb_ids is not None:
+            info['imdbId'] = self.imdb_ids[position]
+            info['tmdbId'] = None if np.isnan(self.tmdb_ids[position]) else int(self.tmdb_ids[position])
+        return info
+
+    def title(self, movie_id):
+        positions, found = self._positions([movie_id])
+        return self.titles[positions[0]] if found[0] else None
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Movies that pass a filter like "Comedy and not Horror, after 1990"')
+    parser.add_argument('filter')
+    parser.add_argument('--movies', default=path.join(DATA_DIR, 'movies.csv'))
+    args = parser.parse_args()
+
+    metadata = MovieMetadata.fromCsv(args.movies)
+    for movie_id in metadata.select(args.filter):
+        print "%d,%s" % (movie_id, metadata.title(movie_id))
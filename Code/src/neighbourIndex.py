@@ -0,0 +1,149 @@
+from pandas import Series
+from distances import DistanceEngine, MIN_COMMON_MOVIES, _withData
+import numpy as np
+import logging
+
+logger = logging.getLogger('neighbourIndex')
+logger.setLevel(logging.DEBUG)
+
+DEFAULT_CHUNK_SIZE = 256
+
+# Relative tolerance of the bounds against rounding errors
+BOUND_TOLERANCE = 1e-9
+
+
+def _sortDistances(distances, descending=False):
+    # Ties are ordered by user id
+    keys = -distances.values if descending else distances.values
+    return distances.iloc[np.lexsort((distances.index.values, keys))]
+
+
+class NeighbourIndex(object):
+    """
+    Nearest and farthest users of a RatingMatrix by the DistanceEngine distance.
+
+    For a seed s and every user u the co-rated count n and the sum of squared
+    differences q over the co-rated movies come from a few sparse products.
+    If every rating difference x is 0 or gap <= |x| <= span (gap and span
+    being the smallest and largest difference between rating levels), the
+    L1 distance is bounded by
+        max(sqrt(q), q / span) <= L1 <= min(sqrt(n * q), q / gap)
+    so users are ranked exactly in order of their best bound, and the
+    search stops when no remaining user can improve the k-th distance.
+    Only users with more than MIN_COMMON_MOVIES co-rated movies are valid.
+
+    If $max_candidates is given at most that number of users are ranked
+    exactly for each query, so the result is approximate (see recall).
+    """
+    def __init__(self, matrix, engine=None, max_candidates=None, chunk_size=DEFAULT_CHUNK_SIZE, levels=None):
+        self.matrix = matrix
+        self.engine = engine or DistanceEngine(matrix)
+        self.max_candidates = max_candidates
+        self.chunk_size = chunk_size
+
+        self.levels = levels = np.unique(matrix.matrix.data) if levels is None else levels
+        if len(levels) > 1:
+            self.gap = np.diff(levels).min()
+            self.span = levels[-1] - levels[0]
+        else:
+            # All the differences are 0
+            self.gap = self.span = 1.
+
+    def withMatrix(self, matrix, engine, ratings):
+        """
+        Index of $matrix, an update of the indexed matrix with the new
+        $ratings values. Rating levels no longer used only make the bounds
+        less tight.
+        """
+        levels = np.union1d(self.levels, ratings)
+        return NeighbourIndex(matrix, engine, self.max_candidates, self.chunk_size, levels)
+
+    def bounds(self, user_id):
+        """
+        Co-rated counts and lower and upper bounds of the distances from
+        $user_id to every user
+        """
+        row = self.matrix.userIndex(user_id)
+        csr = self.matrix.matrix
+        cols = csr.indices[csr.indptr[row]:csr.indptr[row + 1]]
+        seed = csr.data[csr.indptr[row]:csr.indptr[row + 1]]
+
+        ratings = self.matrix.csc[:, cols].tocsr()
+        presence = _withData(ratings, np.ones(len(ratings.data)))
+        common = presence.dot(np.ones(len(cols)))
+        squares = _withData(ratings, ratings.data ** 2).dot(np.ones(len(cols))) - 2 * ratings.dot(seed) + presence.dot(seed ** 2)
+        squares = np.maximum(squares, 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = self.engine.num_rated[row] / common
+            lower = np.maximum(np.sqrt(squares), squares / self.span) * scale
+            upper = np.minimum(np.sqrt(common * squares), squares / self.gap) * scale
+        return common.astype(np.int64), lower, upper
+
+    def _query(self, user_id, k, candidate_ids, farthest):
+        common, lower, upper = self.bounds(user_id)
+        valid = common > MIN_COMMON_MOVIES
+        if candidate_ids is not None:
+            allowed = np.zeros(len(valid), dtype=bool)
+            allowed[self.matrix.userIndex(candidate_ids)] = True
+            valid &= allowed
+        rows = np.flatnonzero(valid)
+
+        # Most promising users first, so their bounds only get worse
+        bound = upper if farthest else lower
+        rows = rows[np.argsort(-bound[rows] if farthest else bound[rows], kind='mergesort')]
+        max_candidates = len(rows) if self.max_candidates is None else self.max_candidates
+
+        found = Series([], dtype=np.float64)
+        start = 0
+        chunk_size = self.chunk_size
+        while start < min(len(rows), max_candidates):
+            if len(found) >= k:
+                kth = found.iloc[k - 1]
+                tolerance = BOUND_TOLERANCE * max(1., abs(kth))
+                next_bound = bound[rows[start]]
+                if (next_bound < kth - tolerance) if farthest else (next_bound > kth + tolerance):
+                    break
+            chunk = rows[start:min(start + chunk_size, max_candidates)]
+            _, distances = self.engine.compute([user_id], self.matrix.user_ids[chunk])
+            found = found.append(Series(distances[:, 0], index=self.matrix.user_ids[chunk]))
+            found = _sortDistances(found, farthest).head(k)
+            start += len(chunk)
+            chunk_size *= 2
+
+        logger.debug("Ranked %d of %d valid users for %s", start, len(rows), user_id)
+        return found
+
+    def nearest(self, user_id, k, candidate_ids=None):
+        """
+        Distances of the $k nearest users to $user_id among $candidate_ids
+        (all the users if None), in ascending order
+        """
+        return self._query(user_id, k, candidate_ids, False)
+
+    def farthest(self, user_id, k, candidate_ids=None):
+        """
+        Distances of the $k farthest users from $user_id among $candidate_ids
+        (all the users if None), in descending order
+        """
+        return self._query(user_id, k, candidate_ids, True)
+
+    def recall(self, user_ids, k, farthest=False):
+        """
+        Mean recall of the $k nearest (or farthest) queries of $user_ids
+        against the exact distances of DistanceEngine.distances. A user
+        counts as a hit if it is as close (or far) as the exact k-th user,
+        so ties don't penalize the index.
+        """
+        recalls = []
+        for user_id in user_ids:
+            exact = self.engine.distances(user_id).dropna().sort_values(ascending=not farthest).head(k)
+            if len(exact) == 0:
+                continue
+            found = self._query(user_id, k, None, farthest)
+            if farthest:
+                hits = (found >= exact.iloc[-1]).sum()
+            else:
+                hits = (found <= exact.iloc[-1]).sum()
+            recalls.append(min(hits, len(exact)) / float(len(exact)))
+        return np.mean(recalls) if recalls else np.nan
@@ -0,0 +1,89 @@
+from multiprocessing import Pool
+from datasetGenerator import GROUP_TYPES
+from metrics import metrics
+import hashlib
+import random
+import logging
+
+logger = logging.getLogger('parallelGroups')
+logger.setLevel(logging.DEBUG)
+
+# Read-only state of the worker processes. It is set before the workers
+# are forked, so the ratings are shared instead of pickled for every task.
+_worker_state = {}
+
+
+def taskSeed(seed, size, group_type):
+    """
+    Seed of the task generating the groups of $size users of $group_type.
+    It only depends on the task, so the groups are the same for any number
+    of processes.
+    """
+    digest = hashlib.sha1("%s-%d-%s" % (seed, size, group_type)).hexdigest()
+    return int(digest[:16], 16)
+
+
+def _initWorker(generator, ratings):
+    _worker_state['generator'] = generator
+    _worker_state['ratings'] = ratings
+
+
+def _initPoolWorker(generator, ratings):
+    _initWorker(generator, ratings)
+    # Forked workers only send the metrics of their tasks
+    metrics.reset()
+
+
+def _generatePoolTask(task):
+    groups = _generateTask(task)
+    snapshot = metrics.snapshot()
+    metrics.reset()
+    return groups, snapshot
+
+
+def _generateTask(task):
+    num_groups, size, group_type, seed = task
+    generator = _worker_state['generator']
+    ratings = _worker_state['ratings']
+    groups = generator.getGroupUsers(ratings, num_groups, size, group_types=[group_type], rng=random.Random(seed))
+    return [group for group, _ in groups]
+
+
+def generateGroups(generator, ratings, group_sizes, seed, processes=None, group_types=GROUP_TYPES):
+    """
+    Generate the groups of every (num_groups, size) in $group_sizes for each
+    type in $group_types in a pool of $processes.
+
+    Every (size, type) pair is a task with its own random generator, and a
+    task generates all its groups, so users are not repeated in groups of the
+    same size and type as in DatasetGenerator.getGroupUsers.
+    Returns a list of (group, group_type) in the same order as getGroupUsers.
+    """
+    tasks = [(num_groups, size, group_type, taskSeed(seed, size, group_type))
+             for num_groups, size in group_sizes
+             for group_type in group_types]
+
+    # Build the shared structures once before forking the workers
+    generator.getCoRatedIndex(ratings)
+    generator.getNeighbourIndex(ratings)
+
+    logger.debug("Generating groups of %d tasks in %s processes", len(tasks), processes or 'all')
+    if processes == 1:
+        _initWorker(generator, ratings)
+        results = [_generateTask(task) for task in tasks]
+    else:
+        pool = Pool(processes, initializer=_initPoolWorker, initargs=(generator, ratings))
+        try:
+            results = []
+            for task_groups, snapshot in pool.map(_generatePoolTask, tasks, chunksize=1):
+                metrics.merge(snapshot)
+                results.append(task_groups)
+        finally:
+            pool.close()
+            pool.join()
+
+    groups = []
+    for (num_groups, size, group_type, _), task_groups in zip(tasks, results):
+        logger.debug("Generated %d/%d %s groups of %d users", len(task_groups), num_groups, group_type, size)
+        groups.extend((group, group_type) for group in task_groups)
+    return groups
@@ -0,0 +1,202 @@
+from pandas import DataFrame
+from scipy import sparse
+import numpy as np
+import logging
+
+logger = logging.getLogger('ratingMatrix')
+logger.setLevel(logging.DEBUG)
+
+# Max number of cells of a dense view (users x movies). Dense views are
+# meant for group sub-matrices, not for the whole dataset.
+DENSE_MAX_CELLS = 10 ** 7
+
+
+def idsIndex(ids, all_ids, name):
+    """
+    Positions of $ids in the sorted $all_ids. Raises KeyError if some id is unknown.
+    """
+    scalar = np.ndim(ids) == 0
+    ids = np.atleast_1d(np.asarray(ids))
+    idx = np.searchsorted(all_ids, ids)
+    found = idx < len(all_ids)
+    found[found] = all_ids[idx[found]] == ids[found]
+    if not found.all():
+        raise KeyError("Unknown %s ids: %s" % (name, list(ids[~found][:10])))
+    return idx[0] if scalar else idx
+
+
+class RatingMatrix(object):
+    """
+    Sparse user x movie rating matrix.
+
+    Rows and columns are dense indexes over the sorted user and movie ids.
+    A cell is rated if it is stored in the sparse structure, so ratings are
+    expected to be non zero.
+    """
+    def __init__(self, matrix, user_ids, movie_ids):
+        self.matrix = matrix.tocsr()
+        self.matrix.sort_indices()
+        self.user_ids = np.asarray(user_ids)
+        self.movie_ids = np.asarray(movie_ids)
+        self._csc = None
+
+    @classmethod
+    def fromRatings(cls, ratings):
+        """
+        Build the matrix in one pass from the userId, movieId and rating columns
+        """
+        logger.debug("Creating sparse matrix from %d ratings", len(ratings))
+        if ratings.duplicated(['userId', 'movieId']).any():
+            # Keep the last rating as the dense matrix filling did
+            ratings = ratings.drop_duplicates(['userId', 'movieId'], keep='last')
+
+        user_ids, user_idx = np.unique(ratings.userId.values, return_inverse=True)
+        movie_ids, movie_idx = np.unique(ratings.movieId.values, return_inverse=True)
+        values = ratings.rating.values.astype(np.float64)
+        matrix = sparse.csr_matrix((values, (user_idx, movie_idx)), shape=(len(user_ids), len(movie_ids)))
+        return cls(matrix, user_ids, movie_ids)
+
+    @classmethod
+    def fromDataFrame(cls, matrix):
+        """
+        Build the matrix from a dense users x movies frame with NaN in the not rated cells
+        """
+        ratings = matrix.stack().reset_index()
+        ratings.columns = ['userId', 'movieId', 'rating']
+        return cls.fromRatings(ratings)
+
+    def withRatings(self, ratings):
+        """
+        New matrix with the new or changed $ratings (userId, movieId and
+        rating columns). Only the rows of the users in $ratings are built
+        again, the runs of other rows between them are copied as they are.
+        New movies move the column indexes of every rating, so then all of
+        them are mapped to the new columns.
+        """
+        logger.debug("Updating sparse matrix with %d ratings", len(ratings))
+        ratings = ratings.drop_duplicates(['userId', 'movieId'], keep='last')
+        user_ids = np.union1d(self.user_ids, ratings.userId.values)
+        movie_ids = np.union1d(self.movie_ids, ratings.movieId.values)
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        if len(movie_ids) != len(self.movie_ids):
+            indices = np.searchsorted(movie_ids, self.movie_ids).astype(indices.dtype)[indices]
+
+        # Rows of the affected users: their previous ratings not replaced by a new one and the new ones
+        affected_ids = np.unique(ratings.userId.values)
+        previous_rows = self.userIndex(affected_ids[np.in1d(affected_ids, self.user_ids)])
+        lengths = indptr[previous_rows + 1] - indptr[previous_rows]
+        positions = np.repeat(indptr[previous_rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        old_rows = np.repeat(np.searchsorted(affected_ids, self.user_ids[previous_rows]), lengths)
+        new_rows = np.searchsorted(affected_ids, ratings.userId.values)
+        new_cols = np.searchsorted(movie_ids, ratings.movieId.values)
+        keys = old_rows.astype(np.int64) * len(movie_ids) + indices[positions]
+        kept = ~np.in1d(keys, new_rows.astype(np.int64) * len(movie_ids) + new_cols)
+        block = sparse.csr_matrix((np.concatenate([data[positions[kept]], ratings.rating.values.astype(np.float64)]),
+                                   (np.concatenate([old_rows[kept], new_rows]), np.concatenate([indices[positions[kept]], new_cols]))),
+                                  shape=(len(affected_ids), len(movie_ids)))
+        block.sort_indices()
+
+        affected = np.searchsorted(user_ids, affected_ids)
+        row_lengths = np.zeros(len(user_ids), dtype=np.int64)
+        row_lengths[np.searchsorted(user_ids, self.user_ids)] = np.diff(indptr)
+        row_lengths[affected] = np.diff(block.indptr)
+        new_indptr = np.concatenate([[0], np.cumsum(row_lengths)])
+        new_indices = np.empty(new_indptr[-1], dtype=indices.dtype)
+        new_data = np.empty(new_indptr[-1], dtype=data.dtype)
+
+        # Other rows keep their order, so the rows between two affected ones are a run of the previous matrix
+        old_positions = np.searchsorted(self.user_ids, user_ids)
+        bounds = np.concatenate([[-1], affected, [len(user_ids)]])
+        for first, last in zip(bounds[:-1] + 1, bounds[1:]):
+            if first < last:
+                source = slice(indptr[old_positions[first]], indptr[old_positions[last - 1] + 1])
+                target = slice(new_indptr[first], new_indptr[last])
+                new_indices[target] = indices[source]
+                new_data[target] = data[source]
+        block_lengths = np.diff(block.indptr)
+        targets = np.repeat(new_indptr[affected] - block.indptr[:-1], block_lengths) + np.arange(block.nnz)
+        new_indices[targets] = block.indices
+        new_data[targets] = block.data
+
+        matrix = sparse.csr_matrix((new_data, new_indices, new_indptr), shape=(len(user_ids), len(movie_ids)))
+        matrix.has_sorted_indices = True
+        return RatingMatrix(matrix, user_ids, movie_ids)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @property
+    def nnz(self):
+        return self.matrix.nnz
+
+    @property
+    def csc(self):
+        if self._csc is None:
+            self._csc = self.matrix.tocsc()
+            self._csc.sort_indices()
+        return self._csc
+
+    def userIndex(self, user_ids):
+        return idsIndex(user_ids, self.user_ids, 'user')
+
+    def movieIndex(self, movie_ids):
+        return idsIndex(movie_ids, self.movie_ids, 'movie')
+
+    def userRatings(self, user_id):
+        """
+        Get the (movie indexes, ratings) of $user_id
+        """
+        row = self.userIndex(user_id)
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.matrix.indices[start:end], self.matrix.data[start:end]
+
+    def userCounts(self):
+        """
+        Number of ratings of every user
+        """
+        return np.diff(self.matrix.indptr)
+
+    def movieCounts(self, user_ids=None):
+        """
+        Number of ratings of every movie (by the users in $user_ids if given)
+        """
+        indices = self.matrix.indices if user_ids is None else self.matrix[self.userIndex(user_ids)].indices
+        return np.bincount(indices, minlength=self.shape[1])
+
+    def presence(self, dtype=np.float64):
+        """
+        Binary matrix with ones in rated cells
+        """
+        presence = self.matrix.copy()
+        presence.data = np.ones(len(presence.data), dtype=dtype)
+        return presence
+
+    def subMatrix(self, user_ids=None, movie_ids=None):
+        matrix = self.matrix
+        user_ids_out = self.user_ids
+        movie_ids_out = self.movie_ids
+        if user_ids is not None:
+            rows = self.userIndex(sorted(user_ids))
+            matrix = matrix[rows]
+            user_ids_out = self.user_ids[rows]
+        if movie_ids is not None:
+            cols = self.movieIndex(sorted(movie_ids))
+            matrix = matrix[:, cols]
+            movie_ids_out = self.movie_ids[cols]
+        return RatingMatrix(matrix, user_ids_out, movie_ids_out)
+
+    def toDense(self, max_cells=DENSE_MAX_CELLS):
+        """
+        Dense array with NaN in the not rated cells
+        """
+        num_cells = self.shape[0] * self.shape[1]
+        if max_cells is not None and num_cells > max_cells:
+            raise ValueError("Dense view of %d x %d cells is too big. Use subMatrix first" % self.shape)
+        dense = np.full(self.shape, np.nan)
+        coo = self.matrix.tocoo()
+        dense[coo.row, coo.col] = coo.data
+        return dense
+
+    def toDataFrame(self, max_cells=DENSE_MAX_CELLS):
+        return DataFrame(self.toDense(max_cells), index=self.user_ids, columns=self.movie_ids)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+from pandas import read_csv, DataFrame
+from scipy import sparse
+from ratingMatrix import RatingMatrix
+from os import path, makedirs
+import numpy as np
+import json
+import logging
+import sys
+
+logger = logging.getLogger('ratingsStore')
+logger.setLevel(logging.DEBUG)
+
+STORE_VERSION = 1
+META_FILENAME = 'meta.json'
+
+# Ratings are saved as uint8 number of half stars
+RATING_SCALE = 2
+
+
+def isStore(filename):
+    return path.isdir(filename) and path.isfile(path.join(filename, META_FILENAME))
+
+
+def _idsArray(ids):
+    # Keep integer ids as they are and save other ids as fixed width strings,
+    # so they can be loaded without pickle
+    ids = np.asarray(ids)
+    if ids.dtype.kind == 'O':
+        ids = ids.astype(str)
+    return ids
+
+
+def halfStars(ratings):
+    """
+    $ratings as uint8 number of half stars
+    """
+    half_stars = np.asarray(ratings) * RATING_SCALE
+    rounded = np.round(half_stars)
+    if np.any(rounded != half_stars) or np.any(rounded < 0) or np.any(rounded > np.iinfo(np.uint8).max):
+        raise ValueError("Ratings must be multiples of %s between 0 and %s" % (1.0 / RATING_SCALE, 255.0 / RATING_SCALE))
+    return rounded.astype(np.uint8)
+
+
+def _offsets(codes, size):
+    return np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=size))]).astype(np.int64)
+
+
+def writeStore(ratings, directory):
+    """
+    Write the $ratings DataFrame (userId, movieId, rating and optional timestamp
+    columns) in $directory.
+
+    Each column is a .npy file sorted by user and movie, and the sidecar
+    files keep the raw ids and the per user and per movie offsets.
+    """
+    logger.debug("Writing %d ratings to store %s", len(ratings), directory)
+    if not path.isdir(directory):
+        makedirs(directory)
+
+    if ratings.duplicated(['userId', 'movieId']).any():
+        ratings = ratings.drop_duplicates(['userId', 'movieId'], keep='last')
+
+    user_ids, user_codes = np.unique(ratings.userId.values, return_inverse=True)
+    movie_ids, movie_codes = np.unique(ratings.movieId.values, return_inverse=True)
+
+    half_stars = halfStars(ratings.rating.values)
+
+    order = np.lexsort((movie_codes, user_codes))
+    user_codes = user_codes[order].astype(np.int32)
+    movie_codes = movie_codes[order].astype(np.int32)
+    columns = {
+        'userCodes': user_codes,
+        'movieCodes': movie_codes,
+        'ratings': half_stars[order],
+        'userIds': _idsArray(user_ids),
+        'movieIds': _idsArray(movie_ids),
+        'userOffsets': _offsets(user_codes, len(user_ids)),
+        # Row numbers sorted by movie, so the ratings of a movie are a slice of it
+        'movieOrder': np.argsort(movie_codes, kind='mergesort').astype(np.int32),
+        'movieOffsets': _offsets(movie_codes, len(movie_ids))
+    }
+
+    has_timestamp = 'timestamp' in ratings
+    if has_timestamp:
+        timestamps = ratings.timestamp.values[order]
+        fits_uint32 = len(timestamps) == 0 or (timestamps.min() >= 0 and timestamps.max() <= np.iinfo(np.uint32).max)
+        columns['timestamps'] = timestamps.astype(np.uint32 if fits_uint32 else np.int64)
+
+    for name, values in columns.items():
+        np.save(path.join(directory, name + '.npy'), values)
+
+    with open(path.join(directory, META_FILENAME), 'w') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'numRatings': len(ratings),
+            'numUsers': len(user_ids),
+            'numMovies': len(movie_ids),
+            'ratingScale': RATING_SCALE,
+            'hasTimestamp': has_timestamp
+        }, f, indent=4)
+
+
+def convertCsv(csv_filename, directory):
+    logger.debug("Converting %s to store %s", csv_filename, directory)
+    writeStore(read_csv(csv_filename), directory)
+
+
+class RatingsStore(object):
+    """
+    Ratings store written by writeStore. The columns are memory-mapped, so
+    opening it is almost instant and the pages are shared by the processes
+    reading the same store.
+    """
+    def __init__(self, directory, mmap_mode='r'):
+        logger.debug("Opening ratings store: %s", directory)
+        with open(path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError("Unsupported store version %s" % self.meta['version'])
+
+        def load(name):
+            return np.load(path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+
+        self.directory = directory
+        self.user_codes = load('userCodes')
+        self.movie_codes = load('movieCodes')
+        self.half_stars = load('ratings')
+        self.timestamps = load('timestamps') if self.meta['hasTimestamp'] else None
+        self.user_ids = load('userIds')
+        self.movie_ids = load('movieIds')
+        self.user_offsets = load('userOffsets')
+        self.movie_order = load('movieOrder')
+        self.movie_offsets = load('movieOffsets')
+
+    def __len__(self):
+        return self.meta['numRatings']
+
+    def ratings(self):
+        return self.half_stars.astype(np.float64) / self.meta['ratingScale']
+
+    def userCode(self, user_id):
+        code = np.searchsorted(self.user_ids, user_id)
+        if code >= len(self.user_ids) or self.user_ids[code] != user_id:
+            raise KeyError("Unknown user id: %s" % user_id)
+        return code
+
+    def movieCode(self, movie_id):
+        code = np.searchsorted(self.movie_ids, movie_id)
+        if code >= len(self.movie_ids) or self.movie_ids[code] != movie_id:
+            raise KeyError("Unknown movie id: %s" % movie_id)
+        return code
+
+    def userSlice(self, user_id):
+        code = self.userCode(user_id)
+        return slice(self.user_offsets[code], self.user_offsets[code + 1])
+
+    def movieRows(self, movie_id):
+        code = self.movieCode(movie_id)
+        return self.movie_order[self.movie_offsets[code]:self.movie_offsets[code + 1]]
+
+    def _frame(self, rows, timestamp=True):
+        data = {
+            'userId': self.user_ids[self.user_codes[rows]],
+            'movieId': self.movie_ids[self.movie_codes[rows]],
+            'rating': self.half_stars[rows].astype(np.float64) / self.meta['ratingScale']
+        }
+        columns = ['userId', 'movieId', 'rating']
+        if timestamp and self.timestamps is not None:
+            data['timestamp'] = self.timestamps[rows].astype(np.int64)
+            columns.append('timestamp')
+        return DataFrame(data, columns=columns)
+
+    def userRatings(self, user_id, timestamp=True):
+        return self._frame(self.userSlice(user_id), timestamp)
+
+    def movieRatings(self, movie_id, timestamp=True):
+        return self._frame(self.movieRows(movie_id), timestamp)
+
+    def rows(self, start, stop, timestamp=True):
+        """
+        Ratings in the rows $start to $stop of the store
+        """
+        return self._frame(slice(start, stop), timestamp)
+
+    def chunks(self, chunk_size, start=0, stop=None, timestamp=True):
+        """
+        Ratings of the rows $start to $stop in DataFrames of $chunk_size rows
+        """
+        stop = len(self) if stop is None else stop
+        for chunk_start in range(start, stop, chunk_size):
+            yield self.rows(chunk_start, min(chunk_start + chunk_size, stop), timestamp)
+
+    def toDataFrame(self, timestamp=True):
+        """
+        Ratings with the same columns as the csv file, sorted by user and movie
+        """
+        return self._frame(slice(None), timestamp)
+
+    def toRatingMatrix(self):
+        # Rows are already sorted by user and movie, so they are the CSR structure
+        matrix = sparse.csr_matrix((self.ratings(), self.movie_codes, self.user_offsets),
+                                   shape=(len(self.user_ids), len(self.movie_ids)))
+        return RatingMatrix(matrix, self.user_ids, self.movie_ids)
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    if len(sys.argv) != 3:
+        sys.stderr.write("Usage: %s ratings.csv store_directory\n" % sys.argv[0])
+        sys.exit(1)
+    convertCsv(sys.argv[1], sys.argv[2])
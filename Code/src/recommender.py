@@ -1,21 +1,186 @@
 #!/usr/bin/env python
 
-from pandas import read_csv, DataFrame
+from collections import OrderedDict
+from pandas import read_csv, to_numeric, Series, DataFrame
+from scipy import sparse
+from ratingMatrix import RatingMatrix
+from ratingsStore import RatingsStore, isStore
+from similarityStore import SimilarityStore
+from movieMetadata import movieFilter
+from evaluation import top_positions
 import numpy as np
 from os import path
 
 CURRENT_DIR = path.dirname(path.abspath(__file__))
 DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
 
+DEFAULT_NUM_NEIGHBOURS = 50
+# Users scored at once. Every batch takes batch_size x num users similarities
+DEFAULT_BATCH_SIZE = 64
+# Movie filters whose columns are kept
+FILTERS_CACHE_SIZE = 64
+
 
 class Recommender(object):
-    def __init__(self, matrixFilename):
-        # Read Data file
-        print "Reading file: %s" % matrixFilename
-        self.matrix = read_csv(matrixFilename, index_col=0, header=0)
-        #import ipdb; ipdb.set_trace()  # BREAKPOINT  # TODO Revisar si el indexado es correcto self.matrix.loc[5,'768']
+    """
+    User based collaborative filtering over a RatingMatrix.
+
+    The similarity between two users is the cosine of their mean centred
+    ratings. The predicted rating of a movie for a user u is
+        mean(u) + sum_v sim(u, v) * (r(v) - mean(v)) / sum_v sim(u, v)
+    over the $num_neighbours most similar users v (with positive
+    similarity) that rated the movie. Similarities and predictions of a
+    batch of users are computed with sparse matrix products.
+
+    With $similarities (the directory of a SimilarityStore of the matrix)
+    the neighbours are read from the store, with its metric, instead.
+
+    With $metadata (a MovieMetadata) the recommendations can be restricted
+    to the movies of a MovieFilter, and only those movies are predicted.
+    """
+    def __init__(self, matrixFilename=None, matrix=None, num_neighbours=DEFAULT_NUM_NEIGHBOURS,
+                 batch_size=DEFAULT_BATCH_SIZE, similarities=None, metadata=None):
+        if matrix is None:
+            # Read Data file
+            print "Reading file: %s" % matrixFilename
+            if isStore(matrixFilename):
+                matrix = RatingsStore(matrixFilename).toRatingMatrix()
+            else:
+                dense = read_csv(matrixFilename, index_col=0, header=0)
+                # Movie ids are read as strings from the header
+                dense.columns = to_numeric(dense.columns, errors='ignore')
+                matrix = RatingMatrix.fromDataFrame(dense)
+        self.matrix = matrix
+        self.num_neighbours = num_neighbours
+        self.similarities = None
+        if similarities is not None:
+            self.similarities = SimilarityStore(similarities, matrix)
+            if not self.similarities.higher_is_better:
+                raise ValueError("The %s store has distances, not similarities" % self.similarities.meta['metric'])
+        self.batch_size = batch_size
+        self.metadata = metadata
+        self._filtered = OrderedDict()
+
+        csr = matrix.matrix
+        num_rated = np.diff(csr.indptr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.means = np.asarray(csr.sum(axis=1)).ravel() / num_rated
+        self.centred = sparse.csr_matrix((csr.data - np.repeat(self.means, num_rated), csr.indices, csr.indptr),
+                                         shape=csr.shape)
+        self.norms = np.sqrt(np.asarray(self.centred.multiply(self.centred).sum(axis=1)).ravel())
+        self.centred_t = self.centred.T.tocsr()
+        self.presence = matrix.presence()
+
+    def neighbours(self, rows):
+        """
+        Sparse (rows x users) matrix of the similarities of the users in
+        $rows to their most similar users
+        """
+        if self.similarities is not None:
+            return self._storedNeighbours(rows)
+        similarities = (self.centred[rows] * self.centred_t).toarray()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarities /= np.outer(self.norms[rows], self.norms)
+        # Users with the same rating in all their movies have no similarity
+        similarities[np.isnan(similarities)] = 0
+        similarities[np.arange(len(rows)), rows] = 0
+
+        num_neighbours = min(self.num_neighbours, similarities.shape[1])
+        positions, valid = top_positions(similarities, similarities > 0, num_neighbours)
+        weights = np.where(valid, np.take_along_axis(similarities, positions, axis=-1), 0)
+        indptr = np.arange(0, weights.size + 1, num_neighbours)
+        neighbours = sparse.csr_matrix((weights.ravel(), positions.ravel(), indptr), shape=similarities.shape)
+        neighbours.eliminate_zeros()
+        return neighbours
+
+    def _storedNeighbours(self, rows):
+        positions = self.similarities.neighbour_rows[rows, :self.num_neighbours]
+        weights = self.similarities.scores[rows, :self.num_neighbours].astype(np.float64)
+        valid = (positions >= 0) & (weights > 0)
+        indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))])
+        return sparse.csr_matrix((weights[valid], positions[valid], indptr), shape=(len(rows), self.matrix.shape[0]))
+
+    def movieColumns(self, movie_filter=None):
+        """
+        Columns of the matrix of the movies that pass $movie_filter (None
+        for all the movies). The columns of the last FILTERS_CACHE_SIZE
+        filters are kept.
+        """
+        if movie_filter is None:
+            return None
+        if self.metadata is None:
+            raise ValueError("Filtering the movies needs the movie metadata")
+        movie_filter = movieFilter(movie_filter)
+        key = str(movie_filter)
+        cols = self._filtered.pop(key, None)
+        if cols is None:
+            cols = np.flatnonzero(self.metadata.mask(movie_filter, self.matrix.movie_ids))
+        self._filtered[key] = cols
+        while len(self._filtered) > FILTERS_CACHE_SIZE:
+            self._filtered.popitem(last=False)
+        return cols
+
+    def _neighbourRatings(self, neighbours, cols):
+        # Neighbours of a batch and the centred ratings and presence of the
+        # neighbour users in the columns $cols (all the movies if None)
+        if cols is None:
+            return neighbours, self.centred, self.presence
+        users = np.unique(neighbours.indices)
+        return neighbours[:, users], self.centred[users][:, cols], self.presence[users][:, cols]
+
+    def _predict(self, rows, cols):
+        neighbours, centred, presence = self._neighbourRatings(self.neighbours(rows), cols)
+        weights = (neighbours * presence).toarray()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.means[rows][:, np.newaxis] + (neighbours * centred).toarray() / weights
+
+    def predict(self, rows, movie_filter=None):
+        """
+        Predicted ratings (rows x movies) of the users in $rows, with NaN
+        in the movies no neighbour rated. With $movie_filter only the
+        movies of movieColumns are predicted.
+        """
+        return self._predict(rows, self.movieColumns(movie_filter))
+
+    def _recommendBatch(self, rows, k, cols=None):
+        predictions = self._predict(rows, cols)
+        seen = self.presence[rows] if cols is None else self.presence[rows][:, cols]
+        unseen = ~np.isnan(predictions) & (seen.toarray() == 0)
+        positions, valid = top_positions(predictions, unseen, k)
+        return positions if cols is None else cols[positions], valid, np.take_along_axis(predictions, positions, axis=-1)
+
+    def recommend_many(self, user_ids, k, movie_filter=None):
+        """
+        Top $k unseen movies of every user in $user_ids as a frame of
+        userId, movieId and (predicted) rating, in the order of $user_ids
+        and by descending rating. With $movie_filter (a MovieFilter or its
+        text) only the movies that pass it are recommended.
+        """
+        rows = self.matrix.userIndex(list(user_ids))
+        cols = self.movieColumns(movie_filter)
+        frames = []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            positions, valid, predictions = self._recommendBatch(batch, k, cols)
+            frames.append(DataFrame({
+                'userId': np.repeat(self.matrix.user_ids[batch], valid.shape[1])[valid.ravel()],
+                'movieId': self.matrix.movie_ids[positions[valid]],
+                'rating': predictions[valid]
+            }, columns=['userId', 'movieId', 'rating']))
+        if not frames:
+            return DataFrame(columns=['userId', 'movieId', 'rating'])
+        return frames[0].append(frames[1:], ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def recommend(self, user_id, k, movie_filter=None):
+        """
+        Predicted ratings of the top $k unseen movies of $user_id
+        """
+        recommendations = self.recommend_many([user_id], k, movie_filter)
+        return Series(recommendations.rating.values, index=recommendations.movieId.values)
 
 
 if __name__ == '__main__':
     dataFilename = path.join(DATA_DIR, 'matrix.csv')
     recommender = Recommender(dataFilename)
+    recommendations = recommender.recommend_many(recommender.matrix.user_ids, 10)
+    recommendations.to_csv(path.join(DATA_DIR, 'recommendations.csv'), index=False)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+from multiprocessing import Pool
+from os import path, makedirs
+from resultsStore import ResultsStore
+import numpy as np
+import argparse
+import logging
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+RESULTS_DIR = path.join(CURRENT_DIR, '..', 'results')
+
+logger = logging.getLogger('resultsPlots')
+logger.setLevel(logging.DEBUG)
+
+# Bars of every concensus function, in this order
+GROUP_TYPES = ['similar', 'random', 'disimilar']
+# Plotted columns of the evaluation results and their labels
+VALUE_TYPES = [('success_value', 'Success 3'), ('unsuccess_value', 'Unsuccess 3')]
+GROUP_BY = ['group_size', 'concensus_name', 'group_type']
+
+
+def graphs(store, value_types=VALUE_TYPES):
+    """
+    A graph by value type and group size with the mean and std of every
+    concensus function and group type of the results in $store
+    """
+    if len(store) == 0:
+        return []
+    summary = store.aggregate([value for value, _ in value_types], GROUP_BY)
+    concensus_names = [category for column in store.meta['columns'] if column['name'] == 'concensus_name'
+                       for category in column['categories']]
+    result = []
+    for value, label in value_types:
+        for group_size in sorted(summary.index.get_level_values('group_size').unique()):
+            data = []
+            for concensus_name in concensus_names:
+                index = [(group_size, concensus_name, group_type) for group_type in GROUP_TYPES]
+                stats = summary.reindex(index)
+                data.append({
+                    'label': concensus_name,
+                    'means': list(stats[(value, 'mean')]),
+                    'std': list(stats[(value, 'std')])
+                })
+            result.append({'data': data, 'group_size': group_size, 'value_type': label})
+    return result
+
+
+def _pyplot():
+    # matplotlib is only imported by the processes that plot
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plotGraph(graph, directory):
+    """
+    Save the bar chart of $graph in $directory. Returns the image filename.
+    """
+    plt = _pyplot()
+    full_bar_width = 0.7
+    bar_width = full_bar_width / len(graph['data'])
+    opacity = 0.4
+    error_config = {'ecolor': '0.3'}
+
+    logger.debug("Show graph: %s group %d", graph['value_type'], graph['group_size'])
+    figure = plt.figure()
+    index = np.arange(len(GROUP_TYPES))
+    for i, plot in enumerate(graph['data']):
+        plt.bar(index + (i * bar_width), plot['means'], bar_width, alpha=opacity, yerr=plot['std'],
+                error_kw=error_config, label=plot['label'])
+
+    plt.xlabel('Groups')
+    plt.ylabel(graph['value_type'])
+    plt.title('%s group %d' % (graph['value_type'], graph['group_size']))
+    plt.xticks(index + (bar_width * len(graph['data']) / 2), ('Similar', 'Random', 'Disimilar'))
+    plt.legend()
+    plt.tight_layout()
+    imagefilename = path.join(directory, "{}_{}.png".format(graph['value_type'], graph['group_size']))
+    plt.savefig(imagefilename)
+    plt.close(figure)
+    return imagefilename
+
+
+def _plotGraph(args):
+    return plotGraph(*args)
+
+
+def plotResults(store, directory=RESULTS_DIR, processes=None, value_types=VALUE_TYPES):
+    """
+    Save the graphs of the results in $store in $directory, rendered in a
+    pool of $processes (all the cpus if None, no pool if 1)
+    """
+    if not path.isdir(directory):
+        makedirs(directory)
+    tasks = [(graph, directory) for graph in graphs(store, value_types)]
+    if processes == 1:
+        return [_plotGraph(task) for task in tasks]
+    pool = Pool(processes)
+    try:
+        return pool.map(_plotGraph, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Graphs of the evaluation results')
+    parser.add_argument('--store', default=path.join(RESULTS_DIR, 'evaluation'))
+    parser.add_argument('--output', default=RESULTS_DIR)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    for filename in plotResults(ResultsStore(args.store), args.output, args.processes):
+        logger.info("Saved %s", filename)
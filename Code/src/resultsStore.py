@@ -0,0 +1,146 @@
+from pandas import DataFrame, Categorical
+from os import path, makedirs, rename, remove
+import numpy as np
+import json
+import logging
+
+logger = logging.getLogger('resultsStore')
+logger.setLevel(logging.DEBUG)
+
+STORE_VERSION = 1
+META_FILENAME = 'meta.json'
+COLUMN_EXTENSION = '.bin'
+# Confidence of the intervals of the aggregated results
+CONFIDENCE = 0.95
+
+
+class ResultsStore(object):
+    """
+    Append-only columnar store of evaluation results in $directory.
+
+    Every column is a raw binary file of a fixed dtype, so new rows are
+    appended at the end of the files and the columns are read with memory
+    maps. String columns are saved as int32 codes of their categories. The
+    schema is set by the first appended frame and meta.json is replaced
+    atomically after the columns are written, so readers never see a
+    partial append.
+    """
+    def __init__(self, directory, reset=False):
+        self.directory = directory
+        if not path.isdir(directory):
+            makedirs(directory)
+        meta_filename = path.join(directory, META_FILENAME)
+        if reset or not path.isfile(meta_filename):
+            self._removeColumns()
+            self.meta = {'version': STORE_VERSION, 'numRows': 0, 'columns': []}
+            self._saveMeta()
+        else:
+            with open(meta_filename) as f:
+                self.meta = json.load(f)
+            if self.meta['version'] != STORE_VERSION:
+                raise ValueError("Unsupported results store version %s" % self.meta['version'])
+
+    def __len__(self):
+        return self.meta['numRows']
+
+    def _columnFilename(self, name):
+        return path.join(self.directory, name + COLUMN_EXTENSION)
+
+    def _removeColumns(self):
+        meta_filename = path.join(self.directory, META_FILENAME)
+        if path.isfile(meta_filename):
+            with open(meta_filename) as f:
+                for column in json.load(f)['columns']:
+                    if path.isfile(self._columnFilename(column['name'])):
+                        remove(self._columnFilename(column['name']))
+
+    def _saveMeta(self):
+        tmp_filename = path.join(self.directory, META_FILENAME + '.tmp')
+        with open(tmp_filename, 'w') as f:
+            json.dump(self.meta, f, indent=4)
+        rename(tmp_filename, path.join(self.directory, META_FILENAME))
+
+    def _schema(self, frame):
+        columns = []
+        for name in frame.columns:
+            values = frame[name]
+            if values.dtype.kind in 'OSU' or values.dtype.name == 'category':
+                columns.append({'name': name, 'dtype': 'int32', 'categories': []})
+            else:
+                columns.append({'name': name, 'dtype': values.dtype.str})
+        return columns
+
+    def append(self, frame):
+        """
+        Append the rows of $frame, which must have the columns of the store
+        """
+        if not self.meta['columns']:
+            self.meta['columns'] = self._schema(frame)
+        names = [column['name'] for column in self.meta['columns']]
+        if sorted(frame.columns) != sorted(names):
+            raise ValueError("Columns %s don't match the store columns %s" % (list(frame.columns), names))
+
+        for column in self.meta['columns']:
+            values = frame[column['name']]
+            if 'categories' in column:
+                categories = column['categories']
+                codes = dict((category, code) for code, category in enumerate(categories))
+                for value in values.unique():
+                    if value not in codes:
+                        codes[value] = len(categories)
+                        categories.append(value)
+                values = values.map(codes).values
+            with open(self._columnFilename(column['name']), 'ab') as f:
+                # Drop the rows of an append that didn't finish
+                f.truncate(len(self) * np.dtype(column['dtype']).itemsize)
+                f.write(np.ascontiguousarray(values, dtype=column['dtype']).tobytes())
+        self.meta['numRows'] += len(frame)
+        self._saveMeta()
+        logger.debug("Appended %d results to %s", len(frame), self.directory)
+
+    def column(self, name):
+        """
+        Memory map of the column $name (the codes of string columns)
+        """
+        column = [column for column in self.meta['columns'] if column['name'] == name][0]
+        if len(self) == 0:
+            return np.zeros(0, dtype=column['dtype'])
+        return np.memmap(self._columnFilename(name), dtype=column['dtype'], mode='r', shape=(len(self),))
+
+    def toDataFrame(self, columns=None):
+        """
+        Results as a frame with categorical string columns
+        """
+        data = {}
+        names = []
+        for column in self.meta['columns']:
+            if columns is not None and column['name'] not in columns:
+                continue
+            values = self.column(column['name'])
+            if 'categories' in column:
+                values = Categorical.from_codes(values, column['categories'])
+            data[column['name']] = values
+            names.append(column['name'])
+        return DataFrame(data, columns=names)
+
+    def aggregate(self, values, by, confidence=CONFIDENCE):
+        """
+        Mean, (population) standard deviation, count and half width of the
+        $confidence interval of the mean of every column in $values for
+        each group of the columns in $by
+        """
+        from scipy import stats
+        frame = self.toDataFrame(list(by) + list(values))
+        grouped = frame.groupby(list(by), observed=True)[list(values)]
+        means = grouped.mean()
+        counts = grouped.count()
+        std = grouped.std(ddof=0)
+        sample_std = grouped.std(ddof=1)
+        result = {}
+        for value in values:
+            result[(value, 'mean')] = means[value]
+            result[(value, 'std')] = std[value]
+            result[(value, 'count')] = counts[value]
+            quantile = stats.t.ppf((1 + confidence) / 2., counts[value] - 1)
+            result[(value, 'ci')] = quantile * sample_std[value] / np.sqrt(counts[value])
+        return DataFrame(result, columns=[(value, stat) for value in values for stat in ['mean', 'std', 'count', 'ci']])
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+from pandas import Series
+from scipy import sparse
+from distances import DistanceEngine, MIN_COMMON_MOVIES, _withData
+from evaluation import top_positions
+from os import path, makedirs
+import numpy as np
+import argparse
+import json
+import logging
+
+logger = logging.getLogger('similarityStore')
+logger.setLevel(logging.DEBUG)
+
+STORE_VERSION = 1
+META_FILENAME = 'meta.json'
+# Neighbours kept by user
+DEFAULT_K = 100
+# Users scored at once. Every block takes block_size x num users scores
+DEFAULT_BLOCK_SIZE = 128
+
+
+class Similarity(object):
+    """
+    Scores between users of a RatingMatrix. $higher_is_better tells if the
+    nearest users have the highest or the lowest scores. Only the users
+    with more than MIN_COMMON_MOVIES co-rated movies are valid neighbours.
+    """
+    higher_is_better = True
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.presence = matrix.presence()
+        self.presence_t = self.presence.T.tocsr()
+        self.num_rated = np.diff(matrix.matrix.indptr)
+
+    def common(self, rows):
+        return (self.presence[rows] * self.presence_t).toarray()
+
+    def _scores(self, rows, common):
+        raise NotImplementedError()
+
+    def scores(self, rows):
+        """
+        Scores (rows x users) of the users in $rows against every user and
+        whether each of them is valid
+        """
+        common = self.common(rows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = self._scores(rows, common)
+        valid = (common > MIN_COMMON_MOVIES) & ~np.isnan(scores)
+        valid[np.arange(len(rows)), rows] = False
+        return scores, valid
+
+
+class L1Similarity(Similarity):
+    """
+    Normalized L1 distance of DistanceEngine
+    """
+    higher_is_better = False
+
+    def __init__(self, matrix):
+        super(L1Similarity, self).__init__(matrix)
+        self.engine = DistanceEngine(matrix)
+
+    def _scores(self, rows, common):
+        _, l1 = self.engine._batch(rows)
+        return self.engine._normalize(rows, common.T, l1).T
+
+
+class PearsonSimilarity(Similarity):
+    """
+    Pearson correlation over the co-rated movies of the ratings centred by
+    the mean rating of each user
+    """
+    def __init__(self, matrix):
+        super(PearsonSimilarity, self).__init__(matrix)
+        csr = matrix.matrix
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.asarray(csr.sum(axis=1)).ravel() / self.num_rated
+        self.centred = _withData(csr, csr.data - np.repeat(means, self.num_rated))
+        self.centred_t = self.centred.T.tocsr()
+        self.squares_t = _withData(self.centred, self.centred.data ** 2).T.tocsr()
+
+    def _scores(self, rows, common):
+        products = (self.centred[rows] * self.centred_t).toarray()
+        # Sums of squares of both users over their co-rated movies
+        squares = (self.centred[rows].multiply(self.centred[rows]) * self.presence_t).toarray()
+        squares_t = (self.presence[rows] * self.squares_t).toarray()
+        return products / np.sqrt(squares * squares_t)
+
+
+class AdjustedCosineSimilarity(Similarity):
+    """
+    Cosine of the ratings centred by the mean rating of each movie
+    """
+    def __init__(self, matrix):
+        super(AdjustedCosineSimilarity, self).__init__(matrix)
+        csc = matrix.csc
+        with np.errstate(divide='ignore', invalid='ignore'):
+            movie_means = np.asarray(csc.sum(axis=0)).ravel() / np.diff(csc.indptr)
+        csr = matrix.matrix
+        self.centred = _withData(csr, csr.data - movie_means[csr.indices])
+        self.centred_t = self.centred.T.tocsr()
+        self.norms = np.sqrt(np.asarray(self.centred.multiply(self.centred).sum(axis=1)).ravel())
+
+    def _scores(self, rows, common):
+        return (self.centred[rows] * self.centred_t).toarray() / np.outer(self.norms[rows], self.norms)
+
+
+class JaccardSimilarity(Similarity):
+    """
+    Co-rated movies over the movies rated by any of the two users
+    """
+    def _scores(self, rows, common):
+        return common / (self.num_rated[rows][:, np.newaxis] + self.num_rated - common)
+
+
+SIMILARITIES = {
+    'l1': L1Similarity,
+    'pearson': PearsonSimilarity,
+    'adjusted_cosine': AdjustedCosineSimilarity,
+    'jaccard': JaccardSimilarity
+}
+
+
+def isStore(directory):
+    return path.isdir(directory) and path.isfile(path.join(directory, META_FILENAME))
+
+
+def writeStore(matrix, directory, metric='l1', k=DEFAULT_K, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Write the $k nearest users of every user of the RatingMatrix $matrix by
+    $metric (a name of SIMILARITIES) in $directory.
+
+    The neighbour rows and scores are .npy files of shape (users, $k),
+    nearest first and padded with -1 and NaN, written block by block so
+    only $block_size rows of scores are kept in memory.
+    """
+    logger.debug("Writing %s similarity store of %d users to %s", metric, matrix.shape[0], directory)
+    if not path.isdir(directory):
+        makedirs(directory)
+    similarity = SIMILARITIES[metric](matrix)
+    num_users = matrix.shape[0]
+    k = min(k, max(num_users - 1, 1))
+
+    neighbours = np.lib.format.open_memmap(path.join(directory, 'neighbours.npy'), mode='w+', dtype=np.int32,
+                                           shape=(num_users, k))
+    scores = np.lib.format.open_memmap(path.join(directory, 'scores.npy'), mode='w+', dtype=np.float32,
+                                       shape=(num_users, k))
+    for start in range(0, num_users, block_size):
+        rows = np.arange(start, min(start + block_size, num_users))
+        block_scores, valid = similarity.scores(rows)
+        keys = block_scores if similarity.higher_is_better else -block_scores
+        positions, valid = top_positions(keys, valid, k)
+        neighbours[rows] = np.where(valid, positions, -1)
+        scores[rows] = np.where(valid, np.take_along_axis(block_scores, positions, axis=-1), np.nan)
+    neighbours.flush()
+    scores.flush()
+    del neighbours, scores
+    np.save(path.join(directory, 'userIds.npy'), matrix.user_ids)
+
+    with open(path.join(directory, META_FILENAME), 'w') as f:
+        json.dump({
+            'version': STORE_VERSION,
+            'metric': metric,
+            'k': k,
+            'numUsers': num_users,
+            'numRatings': matrix.nnz,
+            'higherIsBetter': similarity.higher_is_better
+        }, f, indent=4)
+
+
+class SimilarityStore(object):
+    """
+    Nearest users of every user written by writeStore. The tables are
+    memory-mapped, so the processes using the same store share them.
+
+    With the RatingMatrix $matrix of the store, the users whose stored
+    neighbours don't cover a query are scored again with the metric.
+    """
+    def __init__(self, directory, matrix=None, mmap_mode='r'):
+        logger.debug("Opening similarity store: %s", directory)
+        with open(path.join(directory, META_FILENAME)) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != STORE_VERSION:
+            raise ValueError("Unsupported store version %s" % self.meta['version'])
+        self.directory = directory
+        self.neighbour_rows = np.load(path.join(directory, 'neighbours.npy'), mmap_mode=mmap_mode)
+        self.scores = np.load(path.join(directory, 'scores.npy'), mmap_mode=mmap_mode)
+        self.user_ids = np.load(path.join(directory, 'userIds.npy'))
+        self.higher_is_better = self.meta['higherIsBetter']
+        self.matrix = None
+        self._similarity = None
+        if matrix is not None:
+            self.attach(matrix)
+
+    def matches(self, matrix):
+        """
+        Whether the store was written from a matrix with the users and ratings of $matrix
+        """
+        return matrix.nnz == self.meta['numRatings'] and np.array_equal(matrix.user_ids, self.user_ids)
+
+    def attach(self, matrix):
+        if not self.matches(matrix):
+            raise ValueError("Similarity store %s was not written from this matrix" % self.directory)
+        self.matrix = matrix
+
+    def neighbours(self, user_id):
+        """
+        Scores of the nearest users of $user_id, nearest first
+        """
+        row = np.searchsorted(self.user_ids, user_id)
+        if row >= len(self.user_ids) or self.user_ids[row] != user_id:
+            raise KeyError("Unknown user id: %s" % user_id)
+        valid = self.neighbour_rows[row] >= 0
+        return Series(self.scores[row][valid].astype(np.float64), index=self.user_ids[self.neighbour_rows[row][valid]])
+
+    def ranked(self, row, candidate_rows, k):
+        """
+        Rows of the $k nearest valid users to $row among $candidate_rows,
+        nearest first
+        """
+        neighbours = self.neighbour_rows[row]
+        valid = neighbours >= 0
+        candidates = np.zeros(len(self.user_ids), dtype=bool)
+        candidates[candidate_rows] = True
+        ranked = neighbours[valid][candidates[neighbours[valid]]]
+        # The stored neighbours are all the valid users or they include the k nearest candidates
+        if len(ranked) >= k or not valid.all() or self.matrix is None:
+            return ranked[:k]
+
+        if self._similarity is None:
+            self._similarity = SIMILARITIES[self.meta['metric']](self.matrix)
+        scores, valid = self._similarity.scores(np.array([row]))
+        keys = scores if self.higher_is_better else -scores
+        positions, valid = top_positions(keys, valid & candidates, k)
+        return positions[0][valid[0]]
+
+    def toSparse(self):
+        """
+        Sparse (users x users) matrix of the scores of the nearest users
+        """
+        num_users, k = self.neighbour_rows.shape
+        valid = np.asarray(self.neighbour_rows) >= 0
+        indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))])
+        return sparse.csr_matrix((np.asarray(self.scores)[valid].astype(np.float64), np.asarray(self.neighbour_rows)[valid],
+                                  indptr), shape=(num_users, num_users))
+
+
+if __name__ == '__main__':
+    from ratingMatrix import RatingMatrix
+    from ratingsStore import RatingsStore, isStore as isRatingsStore
+    from pandas import read_csv
+
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Nearest users of every user of a ratings dataset')
+    parser.add_argument('ratings', help='Ratings csv file or ratings store')
+    parser.add_argument('directory')
+    parser.add_argument('--metric', choices=sorted(SIMILARITIES.keys()), default='l1')
+    parser.add_argument('-k', type=int, default=DEFAULT_K)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    if isRatingsStore(args.ratings):
+        matrix = RatingsStore(args.ratings).toRatingMatrix()
+    else:
+        matrix = RatingMatrix.fromRatings(read_csv(args.ratings))
+    writeStore(matrix, args.directory, args.metric, args.k, args.block_size)
@@ -0,0 +1,119 @@
+from os import path, makedirs, listdir, remove, rename, utime, getpid
+import cPickle as pickle
+import hashlib
+import inspect
+import json
+import logging
+
+logger = logging.getLogger('stageCache')
+logger.setLevel(logging.DEBUG)
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+CACHE_EXTENSION = '.pkl'
+
+_file_hashes = {}
+
+
+def fileHash(filename, block_size=2 ** 20):
+    """
+    sha1 of the content of $filename. It is hashed once by process while
+    its size and modification time don't change.
+    """
+    stat_key = (path.abspath(filename), path.getsize(filename), path.getmtime(filename))
+    if stat_key not in _file_hashes:
+        logger.debug("Hashing file %s", filename)
+        digest = hashlib.sha1()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        _file_hashes[stat_key] = digest.hexdigest()
+    return _file_hashes[stat_key]
+
+
+def sourceHash(obj):
+    """
+    sha1 of the source code of a module, class or function
+    """
+    return hashlib.sha1(inspect.getsource(obj)).hexdigest()
+
+
+class StageCache(object):
+    """
+    Content-addressed cache of the outputs of the pipeline stages.
+
+    The key of a stage output is a hash of the stage name, its parameters,
+    its input files, the source code it runs and the keys of the stages it
+    depends on, so any change of them gives a new key. Outputs are saved
+    with pickle and the least recently used ones are removed when the cache
+    takes more than $max_bytes.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not path.isdir(directory):
+            makedirs(directory)
+
+    def key(self, stage, params=None, inputs=(), code=(), dependencies=()):
+        digest = hashlib.sha1()
+        digest.update(stage)
+        digest.update(json.dumps(params, sort_keys=True, default=str))
+        for filename in inputs:
+            digest.update(fileHash(filename))
+        for obj in code:
+            digest.update(sourceHash(obj))
+        for dependency in dependencies:
+            digest.update(dependency)
+        return '%s-%s' % (stage, digest.hexdigest())
+
+    def _filename(self, key):
+        return path.join(self.directory, key + CACHE_EXTENSION)
+
+    def __contains__(self, key):
+        return path.isfile(self._filename(key))
+
+    def load(self, key):
+        filename = self._filename(key)
+        if not path.isfile(filename):
+            raise KeyError(key)
+        with open(filename, 'rb') as f:
+            value = pickle.load(f)
+        # Mark as recently used
+        utime(filename, None)
+        return value
+
+    def save(self, key, value):
+        filename = self._filename(key)
+        tmp_filename = '%s.%d.tmp' % (filename, getpid())
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        rename(tmp_filename, filename)
+        self.evict()
+
+    def cached(self, key, compute):
+        """
+        Load the output of $key or compute and save it
+        """
+        try:
+            value = self.load(key)
+            logger.debug("Stage %s read from cache", key)
+            return value
+        except KeyError:
+            pass
+        value = compute()
+        self.save(key, value)
+        return value
+
+    def evict(self):
+        entries = []
+        for filename in listdir(self.directory):
+            if filename.endswith(CACHE_EXTENSION):
+                filename = path.join(self.directory, filename)
+                entries.append((path.getmtime(filename), path.getsize(filename), filename))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            logger.debug("Evicting %s from cache", filename)
+            remove(filename)
+            total_bytes -= size
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+from os import path
+from pandas import DataFrame, concat
+import numpy as np
+import argparse
+import hashlib
+import logging
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_DIR = path.join(CURRENT_DIR, '..', 'data')
+
+logger = logging.getLogger('syntheticDatasetGenerator')
+logger.setLevel(logging.DEBUG)
+
+# Users generated with the same random generator. Blocks don't depend on
+# the chunk size, so the output only depends on the seed and the parameters.
+BLOCK_USERS = 1000
+DEFAULT_CHUNK_SIZE = 10 ** 6
+# Blocks generated to estimate the ratings by user
+CALIBRATION_BLOCKS = 5
+# Rounds drawing the movies not rated yet by every user by popularity
+MAX_ROUNDS = 20
+# Timestamps between the first and last MovieLens 20M ratings
+MIN_TIMESTAMP = 789652009
+MAX_TIMESTAMP = 1427784002
+
+
+def _blockSeed(seed, block):
+    digest = hashlib.sha1("%s-%d" % (seed, block)).hexdigest()
+    return int(digest[:8], 16)
+
+
+class SyntheticDatasetGenerator(object):
+    """
+    Synthetic ratings with the MovieLens schema (userId, movieId, rating,
+    timestamp) generated by blocks of users, so the memory only depends on
+    the number of movies and the chunk size.
+
+    - User activity follows a Pareto law with at least $min_ratings and
+      $mean_ratings on average (before capping at half of the movies).
+    - Movie popularity follows a Zipf law of $popularity_exponent.
+    - Users and movies belong to $num_clusters taste clusters. Users rate
+      $cluster_boost times more the movies of their own cluster and every
+      user cluster likes or dislikes every movie cluster, so similar and
+      disimilar users exist.
+    Ratings are in half stars, sorted by user and movie.
+    """
+    def __init__(self, num_users, num_movies, mean_ratings=150, min_ratings=40, num_clusters=20,
+                 cluster_boost=30., popularity_exponent=1.4, seed=None):
+        self.num_users = num_users
+        self.num_movies = num_movies
+        self.min_ratings = min(min_ratings, mean_ratings, num_movies)
+        self.max_ratings = max(self.min_ratings, num_movies // 2)
+        # Pareto shape giving the mean ratings with the minimum as scale
+        self.activity_exponent = mean_ratings / float(max(mean_ratings - self.min_ratings, 1))
+        self.num_clusters = num_clusters
+        self.seed = seed
+
+        rng = np.random.RandomState(_blockSeed(seed, -1))
+        popularity = 1. / np.arange(1, num_movies + 1) ** popularity_exponent
+        popularity = popularity[rng.permutation(num_movies)]
+        self.movie_clusters = rng.randint(num_clusters, size=num_movies)
+        self.movie_quality = rng.normal(0, 0.5, num_movies)
+        # Taste of every user cluster for every movie cluster. Own cluster is liked.
+        self.affinity = rng.uniform(-1.5, 1.5, (num_clusters, num_clusters))
+        np.fill_diagonal(self.affinity, 1.5)
+
+        # Probability of every movie to be rated by every cluster
+        weights = popularity * np.where(self.movie_clusters == np.arange(num_clusters)[:, np.newaxis], cluster_boost, 1.)
+        self.cumulative_weights = np.cumsum(weights, axis=1)
+        self.cumulative_weights /= self.cumulative_weights[:, -1:]
+
+    @classmethod
+    def fromNumRatings(cls, num_ratings, num_movies, mean_ratings=150, **kwargs):
+        """
+        Generator of about $num_ratings ratings. The ratings by user are
+        measured in the first blocks of users, as the activity is capped and
+        a user can't rate the same movie twice.
+        """
+        generator = cls(CALIBRATION_BLOCKS * BLOCK_USERS, num_movies, mean_ratings, **kwargs)
+        ratings_by_user = sum(len(generator._block(block)) for block in range(CALIBRATION_BLOCKS)) / float(generator.num_users)
+        num_users = max(int(np.ceil(num_ratings / ratings_by_user)), 1)
+        return cls(num_users, num_movies, mean_ratings, **kwargs)
+
+    def _activity(self, rng, size):
+        counts = self.min_ratings * (rng.pareto(self.activity_exponent, size) + 1)
+        return np.minimum(counts, self.max_ratings).astype(np.int64)
+
+    def _movies(self, rng, clusters):
+        # Inverse transform sampling of the movies of every cluster
+        uniforms = rng.rand(len(clusters))
+        movies = np.empty(len(clusters), dtype=np.int64)
+        for cluster in np.unique(clusters):
+            selected = clusters == cluster
+            movies[selected] = np.searchsorted(self.cumulative_weights[cluster], uniforms[selected], side='right')
+        return np.minimum(movies, self.num_movies - 1)
+
+    def _block(self, block):
+        rng = np.random.RandomState(_blockSeed(self.seed, block))
+        first_user = block * BLOCK_USERS
+        num_users = min(BLOCK_USERS, self.num_users - first_user)
+        user_clusters = rng.randint(self.num_clusters, size=num_users)
+        user_bias = rng.normal(0, 0.4, num_users)
+        counts = self._activity(rng, num_users)
+
+        # Movies are drawn until every user has rated $counts different
+        # movies, so popular movies don't reduce the activity. After
+        # MAX_ROUNDS the missing movies are drawn uniformly.
+        keys = np.empty(0, dtype=np.int64)
+        missing = counts
+        draws = 0
+        while missing.any():
+            users = np.repeat(np.arange(num_users), missing)
+            if draws < MAX_ROUNDS:
+                movies = self._movies(rng, user_clusters[users])
+            else:
+                movies = rng.randint(self.num_movies, size=len(users))
+            keys = np.union1d(keys, users * self.num_movies + movies)
+            missing = counts - np.bincount(keys // self.num_movies, minlength=num_users)
+            draws += 1
+        users, movies = keys // self.num_movies, keys % self.num_movies
+        clusters = user_clusters[users]
+
+        ratings = (3.25 + self.affinity[clusters, self.movie_clusters[movies]] + self.movie_quality[movies]
+                   + user_bias[users] + rng.normal(0, 0.6, len(users)))
+        ratings = np.clip(np.round(ratings * 2) / 2, 0.5, 5.)
+        timestamps = rng.randint(MIN_TIMESTAMP, MAX_TIMESTAMP, len(users))
+        return DataFrame({
+            'userId': users + first_user + 1,
+            'movieId': movies + 1,
+            'rating': ratings,
+            'timestamp': timestamps
+        }, columns=['userId', 'movieId', 'rating', 'timestamp'])
+
+    def iterChunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Frames of about $chunk_size ratings (whole blocks of users)
+        """
+        num_blocks = (self.num_users + BLOCK_USERS - 1) // BLOCK_USERS
+        pending = []
+        num_pending = 0
+        for block in range(num_blocks):
+            ratings = self._block(block)
+            pending.append(ratings)
+            num_pending += len(ratings)
+            if num_pending >= chunk_size:
+                yield concat(pending, ignore_index=True)
+                pending = []
+                num_pending = 0
+        if pending:
+            yield concat(pending, ignore_index=True)
+
+    def getRatings(self):
+        """
+        All the ratings in one frame
+        """
+        chunks = list(self.iterChunks())
+        return concat(chunks, ignore_index=True) if chunks else DataFrame(columns=['userId', 'movieId', 'rating', 'timestamp'])
+
+    def write(self, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Write the ratings to the csv $filename by chunks. Returns the number of ratings.
+        """
+        num_ratings = 0
+        with open(filename, 'w') as f:
+            f.write('userId,movieId,rating,timestamp\n')
+            for chunk in self.iterChunks(chunk_size):
+                chunk.to_csv(f, header=False, index=False)
+                num_ratings += len(chunk)
+                logger.debug("Written %d ratings", num_ratings)
+        return num_ratings
+
+
+if __name__ == '__main__':
+    logging.basicConfig()
+    parser = argparse.ArgumentParser(description='Synthetic MovieLens like ratings')
+    parser.add_argument('--output', default=path.join(DATA_DIR, 'synthetic_ratings.csv'))
+    parser.add_argument('--ratings', type=int, default=10 ** 6, help='Approximate number of ratings')
+    parser.add_argument('--movies', type=int, default=27000)
+    parser.add_argument('--mean-ratings', type=int, default=150)
+    parser.add_argument('--clusters', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1985)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    generator = SyntheticDatasetGenerator.fromNumRatings(args.ratings, args.movies, args.mean_ratings,
+                                                         num_clusters=args.clusters, seed=args.seed)
+    logger.info("Generating %d users", generator.num_users)
+    generator.write(args.output, args.chunk_size)
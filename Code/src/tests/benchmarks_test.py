@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import unittest
+import benchmarks
+from benchmarks import syntheticRatings, runBenchmark, compareResults
+
+
+def results(*values):
+    return {'results': [{'benchmark': name, 'scale': 'small', 'wall_time': wall_time, 'peak_delta_mb': memory}
+                        for name, wall_time, memory in values]}
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        benchmarks.SCALES['test'] = (60, 40, 20)
+
+    def tearDown(self):
+        del benchmarks.SCALES['test']
+
+    def test_syntheticRatings(self):
+        ratings = syntheticRatings(100, 50, 10, seed=1)
+        self.assertFalse(ratings.duplicated(['userId', 'movieId']).any())
+        self.assertTrue(ratings.rating.isin([i / 2. for i in range(1, 11)]).all())
+        self.assertTrue(ratings.equals(syntheticRatings(100, 50, 10, seed=1)))
+
+    def test_runBenchmark(self):
+        for name in ['getMatrix', 'getCoRatedMovies', 'concensusFn.mean']:
+            result = runBenchmark(name, 'test', repeat=1)
+            self.assertEqual(result['benchmark'], name)
+            self.assertTrue(result['wall_time'] >= 0)
+            self.assertTrue(result['items'] > 0)
+            self.assertTrue(result['peak_rss_mb'] > 0)
+
+    def test_compareResults(self):
+        baseline = results(('a', 1.0, 100), ('b', 1.0, 100), ('c', 1.0, 100))
+        current = results(('a', 1.1, 105), ('b', 1.5, 100), ('c', 1.0, 200), ('new', 9.0, 900))
+        regressions = compareResults(current, baseline, tolerance=0.2)
+        self.assertEqual([(r['benchmark'], r['metric']) for r in regressions], [('b', 'wall_time'), ('c', 'peak_delta_mb')])
+        self.assertEqual(regressions[0]['ratio'], 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
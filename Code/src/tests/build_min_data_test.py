@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import tempfile
+import shutil
+import subprocess
+import sys
+import numpy as np
+import build_min_data
+from pandas import read_csv
+from resultsStore import ResultsStore
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+SRC_DIR = path.join(CURRENT_DIR, '..')
+
+
+class TestBuildMinData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dataset = path.join(self.tmp_dir, 'ratings.csv')
+        SyntheticDatasetGenerator(400, 300, mean_ratings=40, seed=1).write(self.dataset)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def args(self, command, *options):
+        return build_min_data.parse_args([command, '--dataset', self.dataset, '--results', self.tmp_dir,
+                                          '--cache', path.join(self.tmp_dir, 'cache'),
+                                          '--queue', path.join(self.tmp_dir, 'queues'),
+                                          '--processes', '1', '--plot-processes', '1'] + list(options))
+
+    def test_lazy_imports(self):
+        code = "import sys, build_min_data; print [name for name in ['pandas', 'matplotlib'] if name in sys.modules]"
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code], cwd=SRC_DIR).strip(), '[]')
+
+    def test_stages(self):
+        cache = build_min_data.stage_cache(path.join(self.tmp_dir, 'cache'))
+        ratings, filter_key = build_min_data.filter_ratings(cache, self.dataset, min_ratings=40)
+        self.assertTrue(ratings.groupby('userId').size().min() >= 40)
+        self.assertEqual(build_min_data.filter_ratings(cache, self.dataset, min_ratings=40)[1], filter_key)
+        stats = build_min_data.dataset_stats(ratings)
+        self.assertEqual(stats['numRatings'], len(ratings))
+        raw_stats = build_min_data.raw_dataset_stats(self.dataset, min_ratings=40)
+        self.assertEqual(raw_stats['filter']['numRatings'], len(ratings))
+
+    def test_commands(self):
+        build_min_data.run(self.args('all'))
+        store = ResultsStore(path.join(self.tmp_dir, build_min_data.EVALUATION_STORE))
+        self.assertEqual(len(store) % len(build_min_data.CONCENSUS_ALG), 0)
+        self.assertTrue(path.isfile(path.join(self.tmp_dir, 'Success 3_2.png')))
+
+        # The graphs are plotted again from the store
+        build_min_data.run(self.args('plot', '--store', store.directory, '--results', path.join(self.tmp_dir, 'plots')))
+        self.assertTrue(path.isfile(path.join(self.tmp_dir, 'plots', 'Unsuccess 3_2.png')))
+
+    def test_model(self):
+        cache = build_min_data.stage_cache(path.join(self.tmp_dir, 'cache'))
+        ratings, filter_key = build_min_data.filter_ratings(cache, self.dataset)
+        generator = DatasetGenerator(data=ratings)
+        directory = path.join(self.tmp_dir, 'models')
+        model, model_key = build_min_data.train_model(cache, generator, ratings, filter_key, directory)
+        # The model is read from its file
+        saved, saved_key = build_min_data.train_model(cache, generator, ratings, filter_key, directory)
+        self.assertEqual(saved_key, model_key)
+        np.testing.assert_array_equal(saved.user_factors, model.user_factors)
+
+        # Groups with a model only have to cover the movies, so they have another key
+        _, groups_key = build_min_data.generate_groups(cache, generator, ratings, filter_key, [(1, 3)], processes=1)
+        generator.min_coverage = build_min_data.CANDIDATES_COVERAGE
+        self.assertNotEqual(build_min_data.generate_groups(cache, generator, ratings, filter_key, [(1, 3)],
+                                                           processes=1)[1], groups_key)
+
+        groups = [([1, 2, 3], 'random')]
+        matrices, _ = build_min_data.group_matrices(cache, generator, ratings, groups, filter_key, 'groups', model,
+                                                    model_key, 30)
+        self.assertEqual(matrices[0].shape, (3, 30))
+
+    def test_resume(self):
+        cache = build_min_data.stage_cache(path.join(self.tmp_dir, 'cache'))
+        generator = DatasetGenerator(data=read_csv(self.dataset))
+        groups = [(group, 'random') for group in [[1, 2], [3, 4, 5], [6, 7], [8, 9]]]
+        matrices = [generator.getGroupMatrix(generator.data, group) for group, _ in groups]
+        concensus_alg = build_min_data.concensus_algorithms()[:2]
+        queue_directory = path.join(self.tmp_dir, 'queues')
+        # A worker evaluates some shards and stops
+        self.assertEqual(build_min_data.evaluate_groups(cache, groups, matrices, 'matrices', self.tmp_dir, concensus_alg,
+                                                        queue_directory=queue_directory, checkpoint_groups=3,
+                                                        worker_only=True), None)
+        store = build_min_data.evaluate_groups(cache, groups, matrices, 'matrices', path.join(self.tmp_dir, 'store'), concensus_alg,
+                                               queue_directory=queue_directory, checkpoint_groups=3)
+        frame = store.toDataFrame()
+        for concensus in concensus_alg:
+            success_values, _ = build_min_data.evaluate_concensus(concensus, matrices)
+            self.assertEqual(list(frame.success_value[frame.concensus_name == concensus['name']]), list(success_values))
+
+    def test_no_groups(self):
+        cache = build_min_data.stage_cache(path.join(self.tmp_dir, 'cache'))
+        store = build_min_data.evaluate_groups(cache, [], [], 'matrices', path.join(self.tmp_dir, 'store'),
+                                               queue_directory=path.join(self.tmp_dir, 'queues'))
+        self.assertEqual(len(store), 0)
+
+    def test_convert(self):
+        args = self.args('convert')
+        self.assertEqual(args.store, path.join(self.tmp_dir, 'ratings'))
+        build_min_data.run(args)
+        ratings, _ = build_min_data.filter_ratings(build_min_data.stage_cache(path.join(self.tmp_dir, 'cache')), args.store)
+        self.assertEqual(build_min_data.dataset_stats(ratings)['numUsers'], 400)
+
+    def test_evaluate_concensus(self):
+        generator = DatasetGenerator(data=read_csv(self.dataset))
+        matrices = [generator.getGroupMatrix(generator.data, group) for group in [[1, 2], [3, 4, 5], [6, 7]]]
+        for concensus in build_min_data.concensus_algorithms():
+            # Functions without a kernel are scored group by group
+            by_group = {'name': concensus['name'], 'fn': lambda group_matrix: concensus['fn'](group_matrix)}
+            np.testing.assert_array_equal(build_min_data.evaluate_concensus(concensus, matrices),
+                                          build_min_data.evaluate_concensus(by_group, matrices))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+from os import path, listdir
+import unittest
+import tempfile
+import shutil
+from pandas import read_csv
+from pandas.util.testing import assert_frame_equal
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from ratingsStore import writeStore
+from chunkedDataset import ChunkedDataset
+
+
+class TestChunkedDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.dataset = path.join(self.tmp_dir, 'ratings.csv')
+        ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=30, seed=1).getRatings()
+        # Ratings in random order, so the ids appear in a different order than sorted
+        ratings.sample(frac=1, random_state=1).to_csv(self.dataset, index=False)
+        self.output = path.join(self.tmp_dir, 'output.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertSameSubset(self, method, *args):
+        generator = DatasetGenerator(self.dataset, seed=7)
+        expected = getattr(generator, method)(*args).reset_index(drop=True)
+        dataset = ChunkedDataset(self.dataset, seed=7, chunk_size=1000)
+        self.assertEqual(getattr(dataset, method)(self.output, *args), len(expected))
+        assert_frame_equal(read_csv(self.output), expected, check_dtype=False)
+        # Only the output is left in the directory
+        self.assertEqual(sorted(listdir(self.tmp_dir)), ['output.csv', 'ratings.csv'])
+
+    def test_filter(self):
+        self.assertSameSubset('filterDataset', 33)
+
+    def test_optimum(self):
+        self.assertSameSubset('getOptimumDataset', 150, 50)
+        self.assertSameSubset('getOptimumDatasetPercentage', 0.4)
+
+    def test_sample(self):
+        self.assertSameSubset('getDataset', 50)
+        self.assertSameSubset('getDataset', 50, 40)
+        self.assertSameSubset('getDataset', 50, 40, True)
+        self.assertSameSubset('getDatasetPercentage', 0.5)
+
+    def test_store(self):
+        store = path.join(self.tmp_dir, 'store')
+        writeStore(read_csv(self.dataset), store)
+        expected = DatasetGenerator(store, compact=False).filterDataset(33).reset_index(drop=True)
+        ChunkedDataset(store, chunk_size=1000, processes=2).filterDataset(self.output, 33)
+        assert_frame_equal(read_csv(self.output), expected, check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import numpy as np
+from pandas import read_csv, DataFrame
+from ratingMatrix import RatingMatrix
+from coRatedIndex import CoRatedIndex, popcount
+from numpy.testing import assert_equal
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestCoRatedIndex(unittest.TestCase):
+    def setUp(self):
+        self.ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        self.index = CoRatedIndex(RatingMatrix.fromRatings(self.ratings))
+
+    def movies(self, user_id):
+        return set(self.ratings[self.ratings.userId == user_id].movieId)
+
+    def test_userMovies(self):
+        assert_equal(self.index.userMovies(58340), [3, 786])
+
+    def test_coRatedMovies(self):
+        for group in [[55587], [55587, 95577], [55587, 95577, 155465], [91363, 196761, 200012]]:
+            expected = set.intersection(*[self.movies(user_id) for user_id in group])
+            self.assertEqual(set(self.index.coRatedMovies(group)), expected)
+            self.assertEqual(self.index.coRatedCount(group), len(expected))
+
+    def test_coRatedCounts(self):
+        counts = self.index.coRatedCounts(55587)
+        for user_id in counts.index:
+            self.assertEqual(counts[user_id], len(self.movies(user_id) & self.movies(55587)))
+
+    def test_withMatrix(self):
+        new_ratings = DataFrame({'userId': [58340, 1, 1], 'movieId': [5, 3, 5], 'rating': [4.0, 2.5, 3.5]})
+        matrix = self.index.matrix.withRatings(new_ratings)
+        index = self.index.withMatrix(matrix, [58340, 1])
+        assert_equal(index.bitsets, CoRatedIndex(matrix).bitsets)
+        self.assertEqual(set(index.coRatedMovies([58340, 1])), {3, 5})
+
+        # New movies move the bits, so the index is built again
+        matrix = matrix.withRatings(DataFrame({'userId': [1], 'movieId': [2], 'rating': [1.0]}))
+        assert_equal(index.withMatrix(matrix, [1]).bitsets, CoRatedIndex(matrix).bitsets)
+
+    def test_popcount(self):
+        words = np.array([[0, 1, 2 ** 63 + 3], [2 ** 64 - 1, 0, 0]], dtype=np.uint64)
+        assert_equal(popcount(words), [4, 64])
+
+    def test_many_movies(self):
+        # Several words per user
+        ratings = DataFrame({
+            'userId': [1] * 200 + [2] * 100,
+            'movieId': list(range(200)) + list(range(0, 200, 2)),
+            'rating': 3.0
+        })
+        index = CoRatedIndex(RatingMatrix.fromRatings(ratings))
+        self.assertEqual(index.num_words, 4)
+        assert_equal(index.coRatedMovies([1, 2]), range(0, 200, 2))
+        self.assertEqual(index.coRatedCount([1, 2]), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
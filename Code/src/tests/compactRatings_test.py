@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import random
+import cPickle
+import numpy as np
+from pandas import read_csv, DataFrame
+from compactRatings import CompactRatings, isin
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestCompactRatings(unittest.TestCase):
+    def setUp(self):
+        self.ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        self.compact = CompactRatings.fromRatings(self.ratings)
+
+    def test_fromRatings(self):
+        self.assertEqual(self.compact.userId.dtype, np.int32)
+        self.assertEqual(self.compact.movieId.dtype, np.int32)
+        self.assertEqual(self.compact.halfStars.dtype, np.uint8)
+        self.assertEqual(list(self.compact.user_ids), sorted(self.ratings.userId.unique()))
+        self.assertEqual(self.compact.rating.tolist(), self.ratings.rating.tolist())
+        self.assertTrue(self.compact.toRatings().equals(self.ratings[['userId', 'movieId', 'rating']]))
+
+    def test_codes(self):
+        codes = self.compact.userCodes([58340, 55587])
+        self.assertEqual(list(self.compact.userIds(codes)), [58340, 55587])
+        self.assertRaises(KeyError, self.compact.userCodes, [-1])
+
+    def test_filter(self):
+        # Filtered frames keep the id maps
+        filtered = self.compact[isin(self.compact, 'userId', self.compact.userCodes([58340]))]
+        self.assertTrue(isinstance(filtered, CompactRatings))
+        self.assertTrue(filtered.user_ids.equals(self.compact.user_ids))
+        self.assertEqual(set(filtered.toRatings().userId), set([58340]))
+        pickled = cPickle.loads(cPickle.dumps(filtered, 2))
+        self.assertTrue(pickled.movie_ids.equals(self.compact.movie_ids))
+
+    def test_isin(self):
+        movie_codes = self.compact.movieCodes([3, 5])
+        expected = self.ratings.movieId.isin([3, 5]).values
+        np.testing.assert_equal(isin(self.compact, 'movieId', movie_codes), expected)
+        np.testing.assert_equal(isin(self.compact, 'movieId', set(movie_codes)), expected)
+        np.testing.assert_equal(isin(self.ratings, 'movieId', [3, 5]), expected)
+
+    def test_encode(self):
+        new_ratings = DataFrame({'userId': [58340, 1], 'movieId': [3, 999999], 'rating': [4.0, 2.5]},
+                                columns=['userId', 'movieId', 'rating'])
+        encoded = self.compact.encode(new_ratings)
+        self.assertEqual(encoded.userId.tolist(), [self.compact.userCodes([58340])[0], len(self.compact.user_ids)])
+        self.assertTrue(encoded.toRatings().equals(new_ratings))
+
+    def test_datasetGenerator(self):
+        # Compact datasets give the same groups as raw datasets
+        ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=40, seed=1).getRatings()
+        ratings['userId'] = ratings.userId * 7 + 1000
+        raw = DatasetGenerator(data=ratings)
+        compact = DatasetGenerator(data=ratings, compact=True)
+        raw_groups = list(raw.getGroupUsers(raw.data, 2, 3, rng=random.Random(1)))
+        compact_groups = list(compact.getGroupUsers(compact.data, 2, 3, rng=random.Random(1)))
+        self.assertTrue(len(raw_groups) > 0)
+        self.assertEqual(raw_groups, [(list(compact.data.userIds(group)), group_type)
+                                      for group, group_type in compact_groups])
+
+        filtered = compact.filterDataset(50)
+        self.assertTrue(isinstance(filtered, CompactRatings))
+        self.assertTrue(filtered.toRatings().reset_index(drop=True).equals(
+            raw.filterDataset(50)[['userId', 'movieId', 'rating']].reset_index(drop=True)))
+
+    def test_appendRatings(self):
+        generator = DatasetGenerator(data=self.ratings, compact=True)
+        generator.getCoRatedIndex(generator.data)
+        new_ratings = DataFrame({'userId': [58340, 1], 'movieId': [3, 5], 'rating': [4.0, 2.5]},
+                                columns=['userId', 'movieId', 'rating'])
+        data = generator.appendRatings(new_ratings)
+        self.assertTrue(isinstance(data, CompactRatings))
+        raw = data.toRatings()
+        self.assertEqual(raw[(raw.userId == 58340) & (raw.movieId == 3)].rating.tolist(), [4.0])
+        self.assertEqual(generator.getCoRatedMovies(data, data.userCodes([1])), set(data.movieCodes([5])))
+
+
+if __name__ == '__main__':
+    unittest.main()
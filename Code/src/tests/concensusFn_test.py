@@ -4,8 +4,10 @@ import unittest
 from os import path
 from datasetGenerator import DatasetGenerator
 from concensusFn import least_misery, mean, multiplicative, most_pleasure, borda_count, purity
+from concensusFn import stack_groups, average_ranks, concensus_scores, kernel_of
 from pandas import Series
-from numpy import array_equal
+from numpy import array_equal, nan
+from numpy.testing import assert_equal, assert_allclose
 
 CURRENT_DIR = path.dirname(path.abspath(__file__))
 DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
@@ -44,10 +46,49 @@ class TestConcensusFn(unittest.TestCase):
         self.assertTrue(array_equal(model, expected))
 
     def test_purity(self):
-        expected = Series([0.759, 0.588, 0.531, 0.743, 0.790, 0.767, 0.663, 0.792, 0.708, 0.768], index=self.matrix.keys())
+        # 1 - std / mean of the ratings of every movie (std of the group, not of a sample)
+        expected = Series([0.679, 0.688, 0.447, 0.851, 0.802, 0.832, 0.716, 0.847, 0.630, 0.859], index=self.matrix.keys())
         model = purity(self.matrix)
-        self.assertTrue(array_equal(model, expected))
+        assert_allclose(model, expected, atol=5e-4)
+        assert_allclose(model, 1 - self.matrix.std(ddof=0) / self.matrix.mean())
+
+
+class TestConcensusKernels(unittest.TestCase):
+    def setUp(self):
+        dataFilename = path.join(DATA_TEST_DIR, 'concensus_ratings_test.csv')
+        generator = DatasetGenerator(dataFilename)
+        self.matrix = generator.getMatrix(generator.data)
+        self.functions = [least_misery, mean, multiplicative, most_pleasure, borda_count, purity]
+
+    def test_stack_groups(self):
+        values, mask = stack_groups([self.matrix, self.matrix.iloc[:2, :3]])
+        self.assertEqual(values.shape, (2, 4, 10))
+        self.assertEqual(mask[0].sum(), 40)
+        self.assertEqual(mask[1].sum(), 6)
+        assert_equal(values[1, :2, :3], self.matrix.values[:2, :3])
+
+    def test_batched_scores_equal_per_group(self):
+        groups = [self.matrix, self.matrix.iloc[1:, 2:], self.matrix.iloc[:2, :]]
+        values, mask = stack_groups(groups)
+        scores = concensus_scores([kernel_of(fn) for fn in self.functions], values, mask)
+        self.assertEqual(scores.shape, (len(self.functions), len(groups), 10))
+        for i, fn in enumerate(self.functions):
+            for j, group in enumerate(groups):
+                num_movies = group.shape[1]
+                assert_allclose(scores[i, j, :num_movies], fn(group).values)
+                self.assertTrue(all(s != s for s in scores[i, j, num_movies:]))
+
+    def test_average_ranks(self):
+        values, mask = stack_groups([[[3, 1, 3, 2, nan, 3]]])
+        assert_equal(average_ranks(values, mask)[0, 0], [4, 1, 4, 2, 0, 4])
 
+    def test_missing_ratings(self):
+        matrix = self.matrix.copy()
+        matrix.iloc[0, 0] = nan
+        assert_equal(mean(matrix)['A'], 9)
+        assert_equal(least_misery(matrix)['A'], 7)
+        assert_equal(multiplicative(matrix)['A'], 700)
+        assert_equal(borda_count(matrix)['A'], 4 + 10 + 9)
 
 
 if __name__ == '__main__':
@@ -3,6 +3,7 @@
 from os import path
 import unittest
 from datasetGenerator import DatasetGenerator
+from pandas import DataFrame
 from numpy import nan
 from numpy.testing import assert_equal
 
@@ -21,21 +22,57 @@ class TestDatasetGenerator(unittest.TestCase):
         #sim_users, rem_raitings = generator.getMostSimilarUsers(ratings, 196761, 3)
         #groups = generator.getGroupUsers(ratings, [3, 4, 6])
 
+    def test_appendRatings(self):
+        ratings = self.generator.data
+        self.generator.getCoRatedIndex(ratings)
+        self.generator.getNeighbourIndex(ratings)
+        self.generator.getMovieCounts(ratings)
+        new_ratings = DataFrame({
+            'userId': [58340, 58340, 1, 1],
+            'movieId': [3, 5, 3, 5],
+            'rating': [4.0, 2.5, 3.5, 5.0]
+        }, columns=['userId', 'movieId', 'rating'])
+        data = self.generator.appendRatings(new_ratings)
+        self.assertEqual(len(data), len(ratings) + 3)
+        self.assertEqual(data[(data.userId == 58340) & (data.movieId == 3)].rating.tolist(), [4.0])
+
+        expected = DatasetGenerator(data=data)
+        assert_equal(self.generator.getCoRatedIndex(data).bitsets, expected.getCoRatedIndex(data).bitsets)
+        assert_equal(self.generator.getRatingMatrix(data).toDense(), expected.getRatingMatrix(data).toDense())
+        self.assertEqual(self.generator.getMovieCounts(data).to_dict(), data.groupby('movieId').size().to_dict())
+        self.assertEqual(self.generator.getUserCounts(data).to_dict(), data.groupby('userId').size().to_dict())
+        assert_equal(self.generator.getNeighbourIndex(data).nearest(1, 3).values,
+                     expected.getNeighbourIndex(data).nearest(1, 3).values)
+
+    def test_appendRatingsStream(self):
+        chunks = [DataFrame({'userId': [1, 2], 'movieId': [3, 5], 'rating': [1.0, 2.0]}),
+                  DataFrame({'userId': [1], 'movieId': [3], 'rating': [3.0]})]
+        data = self.generator.appendRatingsStream(chunks, batch_size=2)
+        self.assertEqual(data[data.userId == 1].rating.tolist(), [3.0])
+        self.assertEqual(data[data.userId == 2].rating.tolist(), [2.0])
+
+    def test_getMatrix(self):
+        ratings = self.generator.data
+        self.assertEqual(self.generator.getMatrix(ratings).shape, (10, 10))
+        # The dense size limit is kept unless the caller opts out
+        self.assertRaises(ValueError, self.generator.getMatrix, ratings, max_cells=10)
+        self.assertEqual(self.generator.getMatrix(ratings, max_cells=None).shape, (10, 10))
+
     def test_getDistances(self):
         ratings = self.generator.getDatasetPercentage(percentage=1)
         distances = self.generator.getDistances(ratings, 55587)
         expected_distances = {
-            #userID: distance
+            #userID: distance (nan with 5 or less co-rated movies)
             55587: 0,
-            58340: 1.5*8/2,
-            91363: 6.0*8/4,
+            58340: nan,
+            91363: nan,
             95577: 8.0*8/6,
             121870: nan,
             127180: 14.0*8/8,
-            151659: 2.0*8/1,
+            151659: nan,
             155465: 9.0*8/6,
             196761: 9.0*8/6,
-            200012: 2.0*8/1
+            200012: nan
         }
 
         for user_id in distances.index:
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import tempfile
+import shutil
+import numpy as np
+from pandas.util.testing import assert_series_equal
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from ratingsStore import writeStore
+from datasetStats import DatasetStats, computeStats
+
+
+class TestDatasetStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=30, seed=1).getRatings()
+        # Ratings in random order, so every chunk has a part of the ratings of each user
+        self.ratings = self.ratings.sample(frac=1, random_state=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def assertSameStats(self, stats, ratings):
+        count_ratings_by_users = ratings.groupby('userId').size()
+        count_ratings_by_movies = ratings.groupby('movieId').size()
+        self.assertEqual(stats['numUsers'], ratings.userId.nunique())
+        self.assertEqual(stats['numMovies'], ratings.movieId.nunique())
+        self.assertEqual(stats['numRatings'], len(ratings))
+        assert_series_equal(stats['countRatingsByUsers'], count_ratings_by_users)
+        assert_series_equal(stats['countRatingsByMovies'], count_ratings_by_movies)
+        self.assertAlmostEqual(stats['meanRatingsByUsers'], count_ratings_by_users.mean())
+        self.assertAlmostEqual(stats['standardDeviationRatingsByMovies'], count_ratings_by_movies.std())
+        np.testing.assert_array_equal(stats['histRatingsByUsers'][0], np.histogram(count_ratings_by_users)[0])
+
+    def test_merge(self):
+        chunks = [self.ratings[start:start + 1000] for start in range(0, len(self.ratings), 1000)]
+        stats = DatasetStats.fromChunks(chunks[:3]).merge(DatasetStats.fromChunks(chunks[3:]))
+        self.assertSameStats(stats.stats(), self.ratings)
+        self.assertEqual(list(stats.userIds()), list(self.ratings.userId.unique()))
+        self.assertEqual(list(stats.movieIds()), list(self.ratings.movieId.unique()))
+
+        moments = stats.ratingMoments('movieId')
+        grouped = self.ratings.groupby('movieId').rating
+        np.testing.assert_allclose(moments['mean'].values, grouped.mean().values)
+        np.testing.assert_allclose(moments['std'].values, grouped.std().values)
+
+    def test_sources(self):
+        csv_filenames = []
+        for i, start in enumerate([0, 4000]):
+            csv_filenames.append(path.join(self.tmp_dir, 'ratings%d.csv' % i))
+            self.ratings[start:start + 4000].to_csv(csv_filenames[-1], index=False)
+        store = path.join(self.tmp_dir, 'store')
+        writeStore(self.ratings[8000:], store)
+        # Shards of the dataset in both formats, the store read by two processes
+        stats = computeStats(csv_filenames + [store], chunk_size=700, processes=2)
+        self.assertSameStats(stats.stats(), self.ratings)
+        self.assertEqual(list(stats.movieIds()), list(self.ratings.movieId.unique()))
+
+    def test_filters(self):
+        generator = DatasetGenerator(data=self.ratings)
+        stats = generator.getDatasetStats(self.ratings)
+        self.assertTrue(generator.getDatasetStats(self.ratings) is stats)
+        self.assertSameStats(generator.getStatsFromDataset(self.ratings), self.ratings)
+
+        filtered = generator.filterDataset(30)
+        self.assertEqual(sorted(stats.validUsers(30)), sorted(filtered.userId.unique()))
+        self.assertEqual(stats.summary(30)['filter']['numRatings'], len(filtered))
+
+        threshold = stats.userThreshold(100)
+        self.assertTrue(len(stats.validUsers(threshold)) >= 100)
+        self.assertTrue(len(stats.validUsers(threshold + 1)) < 100)
+
+        counts = self.ratings.groupby('movieId').size()
+        top = stats.mostRatedMovies(20)
+        self.assertEqual(list(top.values), sorted(counts.values, reverse=True)[:20])
+        self.assertTrue((counts[top.index] == top).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
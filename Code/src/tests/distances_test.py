@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+from pandas import read_csv, DataFrame
+from ratingMatrix import RatingMatrix
+from distances import DistanceEngine
+from numpy import nan
+from numpy.testing import assert_equal
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestDistanceEngine(unittest.TestCase):
+    def setUp(self):
+        ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        self.matrix = RatingMatrix.fromRatings(ratings)
+        self.engine = DistanceEngine(self.matrix)
+
+    def test_distances(self):
+        distances = self.engine.distances(55587)
+        expected_distances = {
+            #userID: distance (nan with 5 or less co-rated movies)
+            55587: 0,
+            58340: nan,
+            91363: nan,
+            95577: 8.0*8/6,
+            127180: 14.0*8/8,
+            151659: nan,
+            155465: 9.0*8/6,
+            196761: 9.0*8/6,
+            200012: nan
+        }
+        self.assertEqual(sorted(distances.index), sorted(expected_distances.keys()))
+        for user_id in distances.index:
+            assert_equal(distances[user_id], expected_distances[user_id])
+
+    def test_coRatedCounts(self):
+        counts = self.engine.coRatedCounts([55587, 121870])
+        self.assertEqual(counts.loc[58340, 55587], 2)
+        self.assertEqual(counts.loc[127180, 55587], 8)
+        self.assertEqual(counts.loc[55587, 121870], 0)
+        self.assertEqual(counts.loc[200012, 121870], 2)
+
+    def test_distancesMany(self):
+        distances = self.engine.distancesMany([55587, 196761])
+        single = self.engine.distances(196761)
+        assert_equal(distances[196761][single.index].values, single.values)
+        assert_equal(distances.loc[127180, 55587], 14.0)
+
+    def test_withMatrix(self):
+        new_ratings = DataFrame({'userId': [55587, 1], 'movieId': [3, 5], 'rating': [4.0, 2.5]},
+                                columns=['userId', 'movieId', 'rating'])
+        matrix = self.matrix.withRatings(new_ratings)
+        engine = self.engine.withMatrix(matrix, [55587, 1])
+        expected = DistanceEngine(matrix)
+        assert_equal(engine.num_rated, expected.num_rated)
+        assert_equal(engine.distancesMany([55587, 1]).values, expected.distancesMany([55587, 1]).values)
+
+
+if __name__ == '__main__':
+    unittest.main()
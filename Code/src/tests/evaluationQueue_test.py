@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+from os import path, listdir
+import unittest
+import tempfile
+import shutil
+import numpy as np
+from errors import EvaluationStoppedError
+from evaluationQueue import EvaluationQueue, requestStop
+
+
+class TestEvaluationQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.directory = path.join(self.tmp_dir, 'queue')
+        self.evaluated = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def evaluate(self, start, stop):
+        self.evaluated.append(start)
+        return {'values': np.arange(start, stop) * 2.}
+
+    def test_run(self):
+        queue = EvaluationQueue(self.directory, 45, shard_size=10, worker='a')
+        self.assertEqual(queue.meta['numShards'], 5)
+        self.assertEqual(list(queue.run(self.evaluate)['values']), list(np.arange(45) * 2.))
+        # An existing queue is opened with the same number of groups
+        self.assertTrue(EvaluationQueue(self.directory, 45).isDone())
+        self.assertRaises(ValueError, EvaluationQueue, self.directory, 46)
+
+    def test_workers(self):
+        worker_a = EvaluationQueue(self.directory, 30, shard_size=10, worker='a')
+        worker_b = EvaluationQueue(self.directory, 30, shard_size=10, worker='b')
+        shard = worker_a.claim()
+        self.assertEqual(worker_b.run(self.evaluate, wait=False), None)
+        self.assertEqual(sorted(self.evaluated), [10, 20])
+        self.assertFalse(worker_b.isDone())
+        worker_a.complete(shard, **self.evaluate(*worker_a.shardRange(shard)))
+        self.assertEqual(list(worker_b.results()['values']), list(np.arange(30) * 2.))
+
+    def test_expired_lease(self):
+        # The shard of a worker that died is evaluated by another one
+        EvaluationQueue(self.directory, 20, shard_size=10, worker='a').claim()
+        queue = EvaluationQueue(self.directory, 20, shard_size=10, lease=0, worker='b')
+        self.assertEqual(list(queue.run(self.evaluate, poll=0)['values']), list(np.arange(20) * 2.))
+        self.assertEqual(listdir(path.join(self.directory, 'claimed')), [])
+
+    def test_stop(self):
+        def evaluate(start, stop):
+            requestStop()
+            return self.evaluate(start, stop)
+
+        queue = EvaluationQueue(self.directory, 30, shard_size=10)
+        self.assertRaises(EvaluationStoppedError, queue.run, evaluate)
+        # The shard being evaluated is saved and the run continues with the others
+        self.assertEqual(queue.done(), [0])
+        self.assertFalse(requestStop())
+        queue.run(self.evaluate)
+        self.assertEqual(self.evaluated, [0, 10, 20])
+
+    def test_error(self):
+        def evaluate(start, stop):
+            raise KeyError(start)
+
+        queue = EvaluationQueue(self.directory, 10, shard_size=10)
+        self.assertRaises(KeyError, queue.run, evaluate)
+        # The claimed shard is returned to the queue
+        self.assertEqual(queue.claim(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import unittest
+from os import path
+import numpy as np
+from numpy.testing import assert_equal, assert_allclose
+from scipy.stats import kendalltau
+from datasetGenerator import DatasetGenerator
+from concensusFn import mean, least_misery, stack_groups
+from evaluation import top_positions, evaluate
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        dataFilename = path.join(DATA_TEST_DIR, 'concensus_ratings_test.csv')
+        self.generator = DatasetGenerator(dataFilename)
+
+    def test_top_positions(self):
+        keys = np.array([[5, 1, 9, 3, 7], [2, 8, 4, 6, 0]], dtype=float)
+        valid = np.array([[True, True, False, True, True], [True] * 5])
+        positions, positions_valid = top_positions(keys, valid, 3)
+        assert_equal(positions, [[4, 0, 3], [1, 3, 2]])
+        self.assertTrue(positions_valid.all())
+        positions, positions_valid = top_positions(keys, valid, 5)
+        assert_equal(positions[0, -1], 2)
+        self.assertFalse(positions_valid[0, -1])
+
+    def test_success(self):
+        values, mask = stack_groups([[[1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1], [2, 6, 5, 1, 3, 4]]])
+        # Concensus ranking: 5, 4, 3, 2, 1, 0
+        scores = np.array([[[1, 2, 3, 4, 5, 6]]], dtype=float)
+        results = evaluate(scores, values, mask, ns=[1, 2], ks=[2, 6], tau=True)
+        assert_allclose(results['success'][1], [[100.0 / 3]])
+        assert_allclose(results['unsuccess'][1], [[100.0 / 3]])
+        assert_allclose(results['success'][2], [[100.0 / 3]])
+        assert_allclose(results['unsuccess'][2], [[100.0 / 3]])
+        assert_allclose(results['precision'][6], [[1.0]])
+        expected_tau = np.mean([kendalltau(scores[0, 0], row)[0] for row in values[0]])
+        assert_allclose(results['kendall_tau'], [[expected_tau]])
+        ideal_dcg = 6 + 5 / np.log2(3)
+        expected_ndcg = np.mean([1.0, (1 + 2 / np.log2(3)) / ideal_dcg, (4 + 3 / np.log2(3)) / ideal_dcg])
+        assert_allclose(results['ndcg'][2], [[expected_ndcg]])
+
+    def test_tau_group_movies(self):
+        # Groups with a different number of movies, the first one padded with movies rated by nobody
+        values, mask = stack_groups([[[1, 2, 3, np.nan], [4, np.nan, 2, 5]], [[5, 3, 1, 2, 4, 1]] * 2])
+        scores = np.array([[[3, 1, 2, np.nan, np.nan, np.nan], [1, 2, 3, 4, 5, 6]]], dtype=float)
+        results = evaluate(scores, values, mask, ns=[1], tau=True)
+        rated = ~np.isnan(values[0, 1, :4])
+        expected_tau = np.mean([kendalltau(scores[0, 0, :3], values[0, 0, :3])[0],
+                                kendalltau(scores[0, 0, :4][rated], values[0, 1, :4][rated])[0]])
+        assert_allclose(results['kendall_tau'], [[expected_tau, kendalltau(scores[0, 1], values[1, 0])[0]]])
+        # Tau doesn't depend on the top movies of the other metrics
+        assert_allclose(evaluate(scores, values, mask, ns=[3], ks=[5], tau=True)['kendall_tau'], results['kendall_tau'])
+
+    def test_tau_many_movies(self):
+        # With the pairwise sign arrays it would take num_movies^2 cells
+        num_movies = 100000
+        rng = np.random.RandomState(0)
+        values = rng.randint(1, 11, (1, 2, num_movies)) / 2.
+        mask = np.ones(values.shape, dtype=bool)
+        mask[0, 1, :10] = False
+        scores = rng.rand(1, 1, num_movies)
+        results = evaluate(scores, values, mask, ns=[3], tau=True)
+        expected_tau = np.mean([kendalltau(scores[0, 0, row_mask], row[row_mask])[0]
+                                for row, row_mask in zip(values[0], mask[0])])
+        assert_allclose(results['kendall_tau'], [[expected_tau]])
+
+    def test_evaluateGroups(self):
+        concensusFns = [{'name': 'Mean', 'fn': mean}, {'name': 'Least misery', 'fn': least_misery}]
+        groups = [['Anne', 'John'], ['Mary', 'Paul', 'John']]
+        results = self.generator.evaluateGroups(self.generator.data, groups, concensusFns, ns=[3], ks=[3])
+        self.assertEqual(len(results), 4)
+        for j, group in enumerate(groups):
+            for name, success, unsuccess in self.generator.evaluateConcensusFns(self.generator.data, group, concensusFns):
+                row = results[(results.group == j) & (results.concensus_name == name)].iloc[0]
+                self.assertEqual(row.success_3, success)
+                self.assertEqual(row.unsuccess_3, unsuccess)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import unittest
+import random
+import numpy as np
+from errors import InvalidGroupError, MaxInvalidIterationsError
+from groupSampler import GroupSampler
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+
+
+class TestGroupSampler(unittest.TestCase):
+    def setUp(self):
+        self.ratings = SyntheticDatasetGenerator(400, 300, mean_ratings=40, seed=1).getRatings()
+        self.generator = DatasetGenerator(data=self.ratings)
+        self.sampler = GroupSampler(self.generator, self.ratings)
+
+    def test_groups(self):
+        for group_type in ['similar', 'disimilar', 'random']:
+            self.sampler.reset()
+            groups = list(self.sampler.groups(5, 4, group_type, random.Random(1)))
+            self.assertEqual(len(groups), 5)
+            users = [user_id for group in groups for user_id in group]
+            # Users are not repeated and every group co-rates enough movies
+            self.assertEqual(len(users), len(set(users)))
+            for group in groups:
+                self.assertEqual(len(group), 4)
+                self.assertTrue(len(self.generator.getCoRatedMovies(self.ratings, group)) >= 10)
+
+    def test_neighbourhood(self):
+        row = 0
+        counts = self.generator.getCoRatedIndex(self.ratings).coRatedCounts(self.sampler.matrix.user_ids[row])
+        counts.iloc[row] = 0
+        self.assertEqual(list(self.sampler.neighbourhood(row)), list((counts.values >= 10).nonzero()[0]))
+
+    def test_plan(self):
+        for group_type in ['similar', 'disimilar', 'random']:
+            self.assertEqual(self.sampler.plan(5, 3, group_type), 5)
+            self.assertEqual(self.sampler.plan(5, 1000, group_type), 0)
+        # Most neighbourhoods are large enough, but no group of 5 users co-rates 20 movies
+        sampler = GroupSampler(self.generator, self.ratings, min_co_rated=20)
+        active = sampler.active.copy()
+        self.assertTrue(np.mean([len(sampler.neighbourhood(row)) >= 4 for row in np.flatnonzero(active)]) > 0.9)
+        for group_type in ['similar', 'disimilar', 'random']:
+            self.assertEqual(sampler.plan(5, 5, group_type), 0)
+            self.assertRaises(MaxInvalidIterationsError, list, sampler.groups(1, 5, group_type, random.Random(1)))
+            sampler.reset()
+        self.assertTrue((sampler.active == active).all())
+
+    def test_infeasible(self):
+        sampler = GroupSampler(self.generator, self.ratings, min_co_rated=1000)
+        self.assertRaises(MaxInvalidIterationsError, list, sampler.groups(1, 3, 'similar', random.Random(1)))
+
+    def test_coverage(self):
+        # No group of 5 or 7 users co-rates 20 movies, but half of their members rate 20 movies
+        for min_coverage, expected in [(1.0, 0), (0.5, 5)]:
+            generator = DatasetGenerator(data=self.ratings, min_co_rated=20, min_coverage=min_coverage)
+            sampler = generator.getGroupSampler(self.ratings)
+            for size in [5, 7]:
+                for group_type in ['similar', 'disimilar', 'random']:
+                    sampler.reset()
+                    self.assertEqual(sampler.plan(5, size, group_type), expected)
+                    groups = [group for group, _ in generator.getGroupUsers(self.ratings, 5, size, [group_type],
+                                                                             random.Random(1))]
+                    self.assertEqual(len(groups), expected)
+                    for group in groups:
+                        self.assertEqual(len(group), size)
+                        movies = self.ratings[self.ratings.userId.isin(group)].groupby('movieId').size()
+                        self.assertTrue((movies >= np.ceil(min_coverage * size)).sum() >= 20)
+
+    def test_selectors(self):
+        # The selectors of the generator check the groups with the sampler
+        user_id = self.sampler.matrix.user_ids[0]
+        group = self.generator.getMostSimilarUsers(self.ratings, user_id, 3)
+        self.assertEqual(group[0], user_id)
+        self.assertTrue(self.sampler.isValid(self.sampler.matrix.userIndex(group)))
+        self.assertEqual(len(self.generator.getRandomUsers(self.ratings, 1, random.Random(1))), 1)
+        generator = DatasetGenerator(data=self.ratings, min_co_rated=1000)
+        self.assertRaises(InvalidGroupError, generator.getMostSimilarUsers, self.ratings, user_id, 3)
+        self.assertRaises(InvalidGroupError, generator.getMostDisimilarUsers, self.ratings, user_id, 3)
+        self.assertRaises(InvalidGroupError, generator.getRandomUsers, self.ratings, 3)
+
+    def test_getGroupUsers(self):
+        groups = list(self.generator.getGroupUsers(self.ratings, 3, 3, rng=random.Random(1)))
+        self.assertEqual([group_type for _, group_type in groups], ['similar'] * 3 + ['disimilar'] * 3 + ['random'] * 3)
+        # Groups that can't be generated are reported, other errors are not hidden
+        self.assertEqual(list(self.generator.getGroupUsers(self.ratings, 3, 1000)), [])
+        self.assertRaises(KeyError, list, self.generator.getGroupUsers(self.ratings, 3, 3, group_types=['unknown']))
+
+
+if __name__ == '__main__':
+    unittest.main()
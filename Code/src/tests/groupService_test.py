@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+from os import path
+import json
+import threading
+import time
+import unittest
+import urllib2
+from pandas import read_csv
+from groupService import LRUCache, GroupRecommender, ThreadingHTTPServer, makeHandler
+from concensusFn import mean
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+DATA_DIR = path.join(CURRENT_DIR, '..', '..', 'data')
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 3)
+        cache.get('c', lambda: 4)
+        # b was the least recently used
+        self.assertEqual(cache.get('a', lambda: 5), 1)
+        self.assertEqual(cache.get('b', lambda: 6), 6)
+        self.assertEqual(len(cache), 2)
+
+    def test_coalesce(self):
+        cache = LRUCache(2)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('key', compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_error_not_cached(self):
+        cache = LRUCache(2)
+
+        def fail():
+            raise ValueError()
+        self.assertRaises(ValueError, cache.get, 'key', fail)
+        self.assertEqual(cache.get('key', lambda: 1), 1)
+
+
+class TestGroupRecommender(unittest.TestCase):
+    def setUp(self):
+        ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        movies = read_csv(path.join(DATA_DIR, 'movies.csv'))
+        self.recommender = GroupRecommender(ratings, movies)
+        self.group = [155465, 55587]
+
+    def test_ranking(self):
+        ranking = self.recommender.ranking(self.group, 'mean')
+        expected = mean(self.recommender.generator.getGroupMatrix(self.recommender.ratings, sorted(self.group)))
+        self.assertEqual(sorted(ranking.index), sorted(expected.index))
+        self.assertEqual(list(ranking.values), sorted(expected.values, reverse=True))
+
+    def test_cached_by_sorted_group(self):
+        ranking = self.recommender.ranking(self.group, 'mean')
+        self.assertTrue(self.recommender.ranking(self.group[::-1], 'mean') is ranking)
+        self.assertEqual(self.recommender.rankings.hits, 1)
+
+    def test_recommend(self):
+        movies = self.recommender.recommend(self.group, 'least_misery', 2)
+        self.assertEqual(len(movies), 2)
+        self.assertEqual(set(movies[0]), {'movieId', 'title', 'score'})
+        self.assertTrue(movies[0]['score'] >= movies[1]['score'])
+
+    def test_movie_filter(self):
+        ranking = self.recommender.ranking(self.group, 'mean')
+        comedies = self.recommender.ranking(self.group, 'mean', 'Comedy and not Horror, after 1990')
+        expected = ranking[self.recommender.metadata.mask('Comedy and not Horror, after 1990', ranking.index.values)]
+        self.assertTrue(0 < len(comedies) < len(ranking))
+        self.assertEqual(sorted(comedies.index), sorted(expected.index))
+        self.assertTrue(self.recommender.ranking(self.group, 'mean', 'comedy and not horror, after 1990') is not ranking)
+        self.assertRaises(ValueError, self.recommender.recommend, self.group, 'mean', 3, 'Comedy and not Western2')
+
+    def test_unknown_concensus(self):
+        self.assertRaises(ValueError, self.recommender.recommend, self.group, 'unknown')
+
+    def test_http(self):
+        server = ThreadingHTTPServer(('localhost', 0), makeHandler(self.recommender))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://localhost:%d/recommend?users=155465,55587&concensus=mean&n=3' % server.server_address[1]
+            content = json.load(urllib2.urlopen(url))
+            self.assertEqual(content['group'], [55587, 155465])
+            self.assertEqual(content['movies'], self.recommender.recommend(self.group, 'mean', 3))
+            content = json.load(urllib2.urlopen(url + '&filter=Drama,+before+2000'))
+            self.assertEqual(content['movies'], self.recommender.recommend(self.group, 'mean', 3, 'Drama, before 2000'))
+            with self.assertRaises(urllib2.HTTPError) as context:
+                urllib2.urlopen(url.replace('mean', 'unknown'))
+            self.assertEqual(context.exception.code, 400)
+        finally:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import tempfile
+import shutil
+import numpy as np
+from ratingMatrix import RatingMatrix
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from matrixFactorization import ALSModel, candidateMovies
+
+
+class TestMatrixFactorization(unittest.TestCase):
+    def setUp(self):
+        self.ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=40, seed=1).getRatings()
+        self.matrix = RatingMatrix.fromRatings(self.ratings)
+        self.model = ALSModel(num_factors=5, iterations=5, seed=1).fit(self.matrix)
+
+    def test_fit(self):
+        baseline = np.sqrt(np.mean((self.matrix.matrix.data - self.matrix.matrix.data.mean()) ** 2))
+        self.assertTrue(self.model.rmse(self.matrix) < 0.8 * baseline)
+        # The chunks are independent, so the threads don't change the model
+        threaded = ALSModel(num_factors=5, iterations=5, threads=3, seed=1).fit(self.matrix)
+        np.testing.assert_array_equal(threaded.user_factors, self.model.user_factors)
+
+    def test_solve(self):
+        # Ridge regression of every user solved one by one
+        model = self.model
+        csr = self.matrix.matrix
+        solution = np.zeros_like(model.user_factors)
+        model._solveChunk(csr, model.movie_factors, solution, 0, csr.shape[0])
+        for row in [0, 150, 299]:
+            movies = csr.indices[csr.indptr[row]:csr.indptr[row + 1]]
+            factors = model.movie_factors[movies]
+            system = factors.T.dot(factors) + model.regularization * len(movies) * np.eye(model.num_factors)
+            target = factors.T.dot(csr.data[csr.indptr[row]:csr.indptr[row + 1]] - model.mean)
+            np.testing.assert_allclose(solution[row], np.linalg.solve(system, target))
+
+    def test_save(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = path.join(tmp_dir, 'model.npz')
+            self.model.save(filename)
+            model = ALSModel.load(filename)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(model.params(), self.model.params())
+        user_ids, movie_ids = self.matrix.user_ids[:4], self.matrix.movie_ids[:6]
+        np.testing.assert_array_equal(model.predict(user_ids, movie_ids).values,
+                                      self.model.predict(user_ids, movie_ids).values)
+
+    def test_groupMatrix(self):
+        generator = DatasetGenerator(data=self.ratings)
+        group = list(self.matrix.user_ids[[3, 1, 2]])
+        candidates = candidateMovies(self.matrix, group, 50)
+        co_rated = generator.getCoRatedMovies(self.ratings, group)
+        self.assertEqual(set(candidates[:len(co_rated)]), co_rated)
+
+        group_matrix = generator.getGroupMatrix(self.ratings, group, self.model, 50)
+        observed = self.matrix.subMatrix(group, candidates).toDataFrame()
+        self.assertEqual(group_matrix.shape, (3, 50))
+        self.assertFalse(group_matrix.isnull().values.any())
+        rated = observed.notnull().values
+        np.testing.assert_array_equal(group_matrix.values[rated], observed.values[rated])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import unittest
+import random
+import json
+import numpy as np
+from metrics import Metrics, metrics
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from datasetGenerator import DatasetGenerator
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(enabled=True, buckets=(10, 100, float('inf')))
+
+    def test_disabled(self):
+        disabled = Metrics()
+        with disabled.timer('stage'):
+            pass
+        disabled.increment('retries')
+        disabled.observe('sizes', 5)
+        self.assertEqual(disabled.snapshot(), {'timers': {}, 'counters': {}, 'histograms': {}})
+
+    def test_timer(self):
+        for _ in range(2):
+            with self.metrics.timer('stage'):
+                pass
+        timer = self.metrics.timers['stage']
+        self.assertEqual(timer['count'], 2)
+        self.assertTrue(timer['total'] >= timer['max'] >= 0)
+        self.assertTrue(timer['peak_rss_mb'] > 0)
+
+    def test_peak_rss(self):
+        with self.metrics.timer('all'):
+            with self.metrics.timer('large'):
+                values = np.ones(40 * 1024 * 1024)
+                del values
+            with self.metrics.timer('small'):
+                pass
+        peaks = dict((stage, timer['peak_rss_mb']) for stage, timer in self.metrics.timers.items())
+        # The 320 MB array is only in the peak of its stage and the enclosing one
+        self.assertTrue(peaks['large'] - peaks['small'] > 200)
+        self.assertEqual(peaks['all'], peaks['large'])
+
+    def test_counters_and_histograms(self):
+        self.metrics.increment('retries', labels={'group_type': 'similar'})
+        self.metrics.increment('retries', 2, labels={'group_type': 'similar'})
+        self.metrics.increment('retries', labels={'group_type': 'random'})
+        for value in [1, 10, 50, 1000]:
+            self.metrics.observe('sizes', value)
+        self.assertEqual(self.metrics.counters[('retries', (('group_type', 'similar'),))], 3)
+        self.assertEqual(self.metrics.histograms[('sizes', ())]['buckets'], [2, 1, 1])
+
+        data = json.loads(self.metrics.toJson())
+        self.assertEqual(data['histograms'][0]['buckets'], [[10.0, 2], [100.0, 1], ['+Inf', 1]])
+        text = self.metrics.toPrometheus()
+        self.assertIn('groups_retries_total{group_type="similar"} 3', text)
+        self.assertIn('groups_sizes_bucket{le="100.0"} 3', text)
+        self.assertIn('groups_sizes_bucket{le="+Inf"} 4', text)
+        self.assertIn('groups_sizes_count 4', text)
+
+    def test_merge(self):
+        other = Metrics(enabled=True, buckets=self.metrics.buckets)
+        for registry in [self.metrics, other]:
+            with registry.timer('stage'):
+                pass
+            registry.increment('retries')
+            registry.observe('sizes', 20)
+        self.metrics.merge(other.snapshot())
+        self.assertEqual(self.metrics.timers['stage']['count'], 2)
+        self.assertEqual(self.metrics.counters[('retries', ())], 2)
+        self.assertEqual(self.metrics.histograms[('sizes', ())]['buckets'], [0, 2, 0])
+
+    def test_datasetGenerator(self):
+        ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=40, seed=1).getRatings()
+        generator = DatasetGenerator(data=ratings)
+        metrics.reset()
+        metrics.enable()
+        try:
+            groups = list(generator.getGroupUsers(ratings, 2, 3, rng=random.Random(1)))
+        finally:
+            metrics.disable()
+        self.assertIn('build.coRatedIndex', metrics.timers)
+        self.assertIn('selectGroup.random', metrics.timers)
+        num_groups = sum(value for (name, _), value in metrics.counters.items() if name == 'groups')
+        self.assertEqual(num_groups, len(groups))
+        self.assertTrue(metrics.histograms[('neighbourhood_size', ())]['count'] > 0)
+        # Only the accepted groups are observed
+        self.assertEqual(metrics.histograms[('group_co_rated_movies', ())]['count'], len(groups))
+        metrics.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+from pandas import DataFrame
+from movieMetadata import MovieMetadata, MovieFilter
+
+
+class TestMovieMetadata(unittest.TestCase):
+    def setUp(self):
+        movies = DataFrame({
+            'movieId': [30, 10, 20, 40, 50],
+            'title': ['Scream (1996)', 'Airplane! (1980)', 'Shaun of the Dead (2004)', 'Fawlty Towers (1975-1979)',
+                      'Babylon 5'],
+            'genres': ['Comedy|Horror|Mystery', 'Comedy', 'Comedy|Horror', 'Comedy', '(no genres listed)']
+        }, columns=['movieId', 'title', 'genres'])
+        links = DataFrame({'movieId': [10, 20], 'imdbId': [80339, 365748], 'tmdbId': [813, np.nan]})
+        self.metadata = MovieMetadata(movies, links)
+
+    def test_parse(self):
+        movie_filter = MovieFilter.parse("Comedy and not Horror, after 1990")
+        self.assertEqual(movie_filter.genres, [('Comedy',)])
+        self.assertEqual(movie_filter.excluded, ['Horror'])
+        self.assertEqual((movie_filter.min_year, movie_filter.max_year), (1991, None))
+        movie_filter = MovieFilter.parse("horror or mystery and comedy between 1990 and 2000")
+        self.assertEqual(movie_filter.genres, [('horror', 'mystery'), ('comedy',)])
+        self.assertEqual((movie_filter.min_year, movie_filter.max_year), (1990, 2000))
+        # The text of a filter is parsed as the same filter
+        self.assertEqual(str(MovieFilter.parse(str(movie_filter))), str(movie_filter))
+        self.assertTrue(MovieFilter.parse(' ').isEmpty())
+
+    def test_mask(self):
+        self.assertEqual(list(self.metadata.select("Comedy and not Horror")), [10, 40])
+        self.assertEqual(list(self.metadata.select("Comedy and not Horror, after 1976")), [10])
+        self.assertEqual(list(self.metadata.select("Horror or Mystery, until 2000")), [30])
+        self.assertEqual(list(self.metadata.select(MovieFilter(min_year=1990))), [20, 30])
+        # Movies without metadata only pass empty filters
+        self.assertEqual(list(self.metadata.mask("Comedy", [20, 60, 10])), [True, False, True])
+        self.assertEqual(list(self.metadata.mask("", [20, 60])), [True, True])
+        self.assertRaises(ValueError, self.metadata.select, "Comedy and not Western")
+
+    def test_info(self):
+        self.assertEqual(self.metadata.genres, ['(no genres listed)', 'Comedy', 'Horror', 'Mystery'])
+        info = self.metadata.info(20)
+        self.assertEqual((info['title'], info['year'], info['genres']), ('Shaun of the Dead (2004)', 2004, ['Comedy', 'Horror']))
+        self.assertEqual((info['imdbId'], info['tmdbId']), (365748, None))
+        self.assertEqual(self.metadata.info(50)['year'], None)
+        self.assertEqual(self.metadata.title(60), None)
+        self.assertRaises(KeyError, self.metadata.info, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+from pandas import read_csv, DataFrame
+from ratingMatrix import RatingMatrix
+from neighbourIndex import NeighbourIndex, _sortDistances
+import numpy as np
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+def randomRatings(num_users=200, num_movies=60, seed=0):
+    rng = np.random.RandomState(seed)
+    rows = []
+    for user_id in range(num_users):
+        movie_ids = rng.choice(num_movies, rng.randint(5, 40), replace=False)
+        for movie_id in movie_ids:
+            rows.append((user_id, movie_id, rng.randint(1, 11) / 2.))
+    return DataFrame(rows, columns=['userId', 'movieId', 'rating'])
+
+
+class TestNeighbourIndex(unittest.TestCase):
+    def setUp(self):
+        ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        self.index = NeighbourIndex(RatingMatrix.fromRatings(ratings))
+
+    def test_nearest(self):
+        nearest = self.index.nearest(55587, 3)
+        # Ties are ordered by user id
+        self.assertEqual(list(nearest.index), [55587, 95577, 155465])
+        self.assertEqual(list(nearest.values), [0, 8.0*8/6, 9.0*8/6])
+
+    def test_farthest(self):
+        farthest = self.index.farthest(55587, 2)
+        self.assertEqual(list(farthest.index), [127180, 155465])
+
+    def test_candidates(self):
+        nearest = self.index.nearest(55587, 3, candidate_ids=[127180, 196761, 58340])
+        # 58340 has less than 6 co-rated movies
+        self.assertEqual(list(nearest.index), [196761, 127180])
+
+    def test_bounds(self):
+        index = NeighbourIndex(RatingMatrix.fromRatings(randomRatings()))
+        for user_id in [0, 7, 42]:
+            common, lower, upper = index.bounds(user_id)
+            exact_common, exact = index.engine.compute([user_id])
+            np.testing.assert_array_equal(common, exact_common[:, 0])
+            valid = ~np.isnan(exact[:, 0])
+            self.assertTrue(np.all(lower[valid] <= exact[valid, 0] + 1e-9))
+            self.assertTrue(np.all(exact[valid, 0] <= upper[valid] + 1e-9))
+
+    def test_exact(self):
+        index = NeighbourIndex(RatingMatrix.fromRatings(randomRatings()), chunk_size=4)
+        for user_id in range(0, 200, 10):
+            for farthest in [False, True]:
+                exact = _sortDistances(index.engine.distances(user_id).dropna(), farthest).head(5)
+                found = index.farthest(user_id, 5) if farthest else index.nearest(user_id, 5)
+                self.assertEqual(list(found.index), list(exact.index))
+        self.assertEqual(index.recall(range(0, 200, 10), 5), 1)
+        self.assertEqual(index.recall(range(0, 200, 10), 5, farthest=True), 1)
+
+    def test_recall(self):
+        index = NeighbourIndex(RatingMatrix.fromRatings(randomRatings()), max_candidates=4, chunk_size=4)
+        recall = index.recall(range(0, 200, 10), 5)
+        self.assertTrue(0 < recall < 1)
+        self.assertEqual(len(index.nearest(1, 5)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import shutil
+import tempfile
+import unittest
+from os import path
+import numpy as np
+from pandas import DataFrame
+from datasetGenerator import DatasetGenerator
+from parallelGroups import generateGroups, taskSeed
+
+
+class TestParallelGroups(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        random_state = np.random.RandomState(1985)
+        users, movies = np.nonzero(random_state.rand(40, 30) < 0.8)
+        ratings = DataFrame({
+            'userId': users + 1,
+            'movieId': movies + 1,
+            'rating': random_state.randint(1, 11, len(users)) / 2.0
+        }, columns=['userId', 'movieId', 'rating'])
+        dataFilename = path.join(self.tmp_dir, 'ratings.csv')
+        ratings.to_csv(dataFilename, index=False)
+        self.generator = DatasetGenerator(dataFilename)
+        self.group_sizes = [(3, 2), (2, 4)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_taskSeed(self):
+        self.assertEqual(taskSeed(1985, 2, 'similar'), taskSeed(1985, 2, 'similar'))
+        self.assertNotEqual(taskSeed(1985, 2, 'similar'), taskSeed(1985, 2, 'random'))
+        self.assertNotEqual(taskSeed(1985, 2, 'similar'), taskSeed(1986, 2, 'similar'))
+
+    def test_same_groups_for_any_number_of_processes(self):
+        ratings = self.generator.data
+        groups = generateGroups(self.generator, ratings, self.group_sizes, 1985, processes=1)
+        self.assertEqual(len(groups), 3 * (3 + 2))
+        self.assertEqual(generateGroups(self.generator, ratings, self.group_sizes, 1985, processes=3), groups)
+        self.assertNotEqual(generateGroups(self.generator, ratings, self.group_sizes, 1, processes=1), groups)
+
+    def test_users_not_repeated(self):
+        groups = generateGroups(self.generator, self.generator.data, self.group_sizes, 1985, processes=2)
+        for size in [2, 4]:
+            for group_type in ['similar', 'disimilar', 'random']:
+                users = [user_id for group, kind in groups if kind == group_type and len(group) == size for user_id in group]
+                self.assertEqual(len(users), len(set(users)))
+
+
+if __name__ == '__main__':
+    unittest.main()
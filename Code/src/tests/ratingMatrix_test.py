@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+from pandas import read_csv, concat, DataFrame
+from ratingMatrix import RatingMatrix
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from numpy import nan
+from numpy.testing import assert_equal
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestRatingMatrix(unittest.TestCase):
+    def setUp(self):
+        self.ratings = read_csv(path.join(DATA_TEST_DIR, 'ratings_test.csv'))
+        self.matrix = RatingMatrix.fromRatings(self.ratings)
+
+    def test_shape(self):
+        self.assertEqual(self.matrix.shape, (10, 10))
+        self.assertEqual(self.matrix.nnz, len(self.ratings))
+
+    def test_same_values_as_ratings(self):
+        matrix = self.matrix.toDataFrame()
+        assert_equal(list(matrix.index), sorted(self.ratings.userId.unique()))
+        assert_equal(list(matrix.columns), sorted(self.ratings.movieId.unique()))
+        for row in self.ratings.itertuples():
+            self.assertEqual(matrix.loc[row.userId, row.movieId], row.rating)
+        self.assertEqual(matrix.count().sum(), len(self.ratings))
+
+    def test_userRatings(self):
+        movie_idx, ratings = self.matrix.userRatings(58340)
+        assert_equal(self.matrix.movie_ids[movie_idx], [3, 786])
+        assert_equal(ratings, [1.0, 1.5])
+
+    def test_subMatrix(self):
+        matrix = self.matrix.subMatrix(user_ids=[58340, 55587], movie_ids=[786, 3, 5]).toDataFrame()
+        assert_equal(list(matrix.index), [55587, 58340])
+        assert_equal(matrix.values, [[1.0, 5.0, 3.0], [1.0, nan, 1.5]])
+
+    def test_fromDataFrame(self):
+        matrix = RatingMatrix.fromDataFrame(self.matrix.toDataFrame())
+        assert_equal(matrix.toDense(), self.matrix.toDense())
+        assert_equal(matrix.user_ids, self.matrix.user_ids)
+        assert_equal(matrix.movie_ids, self.matrix.movie_ids)
+
+    def test_withRatings(self):
+        new_ratings = DataFrame({
+            'userId': [58340, 1, 55587],
+            'movieId': [3, 5, 7],
+            'rating': [4.0, 2.5, 3.5]
+        }, columns=['userId', 'movieId', 'rating'])
+        matrix = self.matrix.withRatings(new_ratings)
+        expected = RatingMatrix.fromRatings(concat([self.ratings, new_ratings], sort=False))
+        assert_equal(matrix.user_ids, expected.user_ids)
+        assert_equal(matrix.movie_ids, expected.movie_ids)
+        assert_equal(matrix.toDense(), expected.toDense())
+        self.assertEqual(matrix.nnz, self.matrix.nnz + 2)
+
+    def test_withRatings_rows(self):
+        ratings = SyntheticDatasetGenerator(200, 100, mean_ratings=20, seed=1).getRatings()
+        previous = ratings[ratings.userId % 7 != 0]
+        matrix = RatingMatrix.fromRatings(previous)
+        # Changed ratings of previous users, new users and new movies
+        new_ratings = concat([previous[previous.userId % 5 == 0].sample(frac=0.5, random_state=1).assign(rating=1.0),
+                              ratings[ratings.userId % 7 == 0],
+                              DataFrame({'userId': [3, 1000], 'movieId': [5000, 3], 'rating': [2.0, 4.5]})], sort=False)
+        for new_matrix in [matrix.withRatings(new_ratings), matrix.withRatings(new_ratings[new_ratings.movieId < 5000])]:
+            expected = RatingMatrix.fromRatings(concat([previous, new_ratings[new_ratings.movieId.isin(new_matrix.movie_ids)]],
+                                                       sort=False))
+            assert_equal(new_matrix.user_ids, expected.user_ids)
+            assert_equal(new_matrix.movie_ids, expected.movie_ids)
+            assert_equal(new_matrix.matrix.indptr, expected.matrix.indptr)
+            assert_equal(new_matrix.matrix.indices, expected.matrix.indices)
+            assert_equal(new_matrix.matrix.data, expected.matrix.data)
+
+    def test_counts(self):
+        assert_equal(self.matrix.userCounts(), self.ratings.groupby('userId').size().values)
+        assert_equal(self.matrix.movieCounts(), self.ratings.groupby('movieId').size().values)
+        assert_equal(self.matrix.movieCounts([58340])[self.matrix.movieIndex([3, 786])], [1, 1])
+
+    def test_unknown_id(self):
+        self.assertRaises(KeyError, self.matrix.userIndex, 1)
+
+    def test_dense_view_limit(self):
+        self.assertRaises(ValueError, self.matrix.toDense, max_cells=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+from os import path
+import shutil
+import tempfile
+import unittest
+from pandas import read_csv
+from datasetGenerator import DatasetGenerator
+from ratingMatrix import RatingMatrix
+from ratingsStore import RatingsStore, writeStore, convertCsv, isStore
+from numpy.testing import assert_equal
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+class TestRatingsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_filename = path.join(DATA_TEST_DIR, 'ratings_test.csv')
+        self.store_dir = path.join(self.tmp_dir, 'ratings.store')
+        convertCsv(self.csv_filename, self.store_dir)
+        self.ratings = read_csv(self.csv_filename).sort_values(['userId', 'movieId']).reset_index(drop=True)
+        self.store = RatingsStore(self.store_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_roundtrip(self):
+        self.assertTrue(isStore(self.store_dir))
+        self.assertFalse(isStore(self.csv_filename))
+        self.assertEqual(len(self.store), len(self.ratings))
+        ratings = self.store.toDataFrame()
+        self.assertEqual(list(ratings.columns), list(self.ratings.columns))
+        assert_equal(ratings.values, self.ratings.values)
+
+    def test_compact_dtypes(self):
+        self.assertEqual(self.store.user_codes.dtype.name, 'int32')
+        self.assertEqual(self.store.movie_codes.dtype.name, 'int32')
+        self.assertEqual(self.store.half_stars.dtype.name, 'uint8')
+        self.assertEqual(self.store.timestamps.dtype.name, 'uint32')
+
+    def test_userRatings(self):
+        ratings = self.store.userRatings(58340)
+        assert_equal(ratings.movieId.values, [3, 786])
+        assert_equal(ratings.rating.values, [1.0, 1.5])
+        self.assertRaises(KeyError, self.store.userRatings, 1)
+
+    def test_movieRatings(self):
+        ratings = self.store.movieRatings(296)
+        assert_equal(ratings.userId.values, [91363, 121870, 151659, 200012])
+        assert_equal(ratings.rating.values, [1.5, 5.0, 3.0, 5.0])
+
+    def test_toRatingMatrix(self):
+        expected = RatingMatrix.fromRatings(self.ratings).toDataFrame()
+        assert_equal(self.store.toRatingMatrix().toDataFrame().values, expected.values)
+
+    def test_datasetGenerator(self):
+        generator = DatasetGenerator(self.store_dir)
+        ratings = self.ratings[['userId', 'movieId', 'rating']]
+        assert_equal(generator.data.toRatings().values, ratings.values)
+        # The matrix of the store has the same codes as a matrix built from the frame
+        matrix = generator.getRatingMatrix(generator.data)
+        expected = RatingMatrix.fromRatings(generator.data)
+        assert_equal(matrix.user_ids, expected.user_ids)
+        assert_equal(matrix.toDense(), expected.toDense())
+        # Filtered frames have their own matrix
+        filtered = generator.filterDataset(5)
+        assert_equal(generator.getRatingMatrix(filtered).toDense(), RatingMatrix.fromRatings(filtered).toDense())
+        assert_equal(DatasetGenerator(self.store_dir, compact=False).data.values, self.ratings.values)
+
+    def test_string_ids(self):
+        ratings = read_csv(path.join(DATA_TEST_DIR, 'concensus_ratings_test.csv'))
+        writeStore(ratings, self.store_dir)
+        store = RatingsStore(self.store_dir)
+        assert_equal(store.userRatings('Paul').rating.values, [10, 4, 3, 6, 10, 9, 6, 8, 10, 8])
+
+    def test_invalid_ratings(self):
+        ratings = self.ratings.copy()
+        ratings.loc[0, 'rating'] = 3.2
+        self.assertRaises(ValueError, writeStore, ratings, self.store_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,98 @@
 #!/usr/bin/env python
 
 from os import path
-from recommender import Recommender
+from recommender import Recommender, FILTERS_CACHE_SIZE
+from ratingMatrix import RatingMatrix
+from movieMetadata import MovieMetadata
+from pandas import DataFrame
+import numpy as np
 import unittest
 
 CURRENT_DIR = path.dirname(path.abspath(__file__))
 DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+DATA_DIR = path.join(CURRENT_DIR, '..', '..', 'data')
+
+
+def naivePredictions(dense, num_neighbours):
+    # Loop version of the mean centred cosine k nearest neighbours predictions
+    rated = ~np.isnan(dense)
+    means = np.nanmean(dense, axis=1)
+    centred = np.where(rated, dense - means[:, np.newaxis], 0)
+    norms = np.sqrt((centred ** 2).sum(axis=1))
+    num_users, num_movies = dense.shape
+    predictions = np.full(dense.shape, np.nan)
+    for u in range(num_users):
+        similarities = []
+        for v in range(num_users):
+            if v != u and norms[u] > 0 and norms[v] > 0:
+                similarity = centred[u].dot(centred[v]) / (norms[u] * norms[v])
+                if similarity > 0:
+                    similarities.append((similarity, v))
+        neighbours = sorted(similarities, reverse=True)[:num_neighbours]
+        for m in range(num_movies):
+            numerator = sum(s * centred[v, m] for s, v in neighbours if rated[v, m])
+            denominator = sum(s for s, v in neighbours if rated[v, m])
+            if denominator > 0:
+                predictions[u, m] = means[u] + numerator / denominator
+    return predictions
 
 
 class TestRecommender(unittest.TestCase):
     def setUp(self):
         dataFilename = path.join(DATA_TEST_DIR, 'matrix_test.csv')
         self.recommender = Recommender(dataFilename)
-        print self.recommender.matrix
+        print self.recommender.matrix.toDataFrame()
 
     def test_similarity(self):
         pass
 
+    def test_movie_ids(self):
+        self.assertEqual(list(self.recommender.matrix.movie_ids), [1, 2, 3, 5, 6, 7, 10])
+
+    def test_predict(self):
+        rng = np.random.RandomState(0)
+        dense = np.where(rng.rand(30, 20) < 0.4, rng.randint(1, 11, (30, 20)) / 2., np.nan)
+        matrix = RatingMatrix.fromDataFrame(DataFrame(dense))
+        recommender = Recommender(matrix=matrix, num_neighbours=5, batch_size=7)
+        expected = naivePredictions(matrix.toDense(), 5)
+        np.testing.assert_allclose(recommender.predict(np.arange(30)), expected)
+
+    def test_recommend(self):
+        recommendations = self.recommender.recommend(1667, 3)
+        # Only unseen movies, by descending prediction
+        self.assertEqual(list(recommendations.index), [2, 3, 7])
+        self.assertEqual(list(recommendations.values), sorted(recommendations.values, reverse=True))
+        # 768 rated all its movies the same, so it has no neighbours
+        self.assertEqual(len(self.recommender.recommend(768, 3)), 0)
+
+    def test_recommend_many(self):
+        recommender = Recommender(matrix=self.recommender.matrix, batch_size=2)
+        user_ids = list(recommender.matrix.user_ids)
+        recommendations = recommender.recommend_many(user_ids, 2)
+        for user_id in user_ids:
+            user_recommendations = recommendations[recommendations.userId == user_id]
+            expected = self.recommender.recommend(user_id, 2)
+            self.assertEqual(list(user_recommendations.movieId), list(expected.index))
+            np.testing.assert_allclose(user_recommendations.rating.values, expected.values)
+
+    def test_movie_filter(self):
+        metadata = MovieMetadata.fromCsv(path.join(DATA_DIR, 'movies.csv'))
+        recommender = Recommender(matrix=self.recommender.matrix, metadata=metadata)
+        # The unseen movies of 1667 are 2, 3, 7 and 5, and Jumanji (2) is not a comedy
+        recommendations = recommender.recommend(1667, 3, 'Comedy')
+        self.assertEqual(list(recommendations.index), [3, 7, 5])
+        expected = self.recommender.recommend(1667, 4)
+        np.testing.assert_allclose(recommendations.values, expected[[3, 7, 5]].values)
+
+        cols = recommender.movieColumns('Comedy and not Romance, before 2000')
+        self.assertEqual(list(recommender.matrix.movie_ids[cols]), [1, 5])
+        # Only the columns of the last filters are kept
+        for year in range(1900, 1900 + 2 * FILTERS_CACHE_SIZE):
+            recommender.movieColumns('Comedy, after %d' % year)
+        self.assertEqual(len(recommender._filtered), FILTERS_CACHE_SIZE)
+        np.testing.assert_allclose(recommender.predict(np.arange(5), 'Comedy'),
+                                   recommender.predict(np.arange(5))[:, [0, 2, 3, 5]])
+        self.assertRaises(ValueError, self.recommender.recommend, 1667, 3, 'Comedy')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import tempfile
+import shutil
+import numpy as np
+from pandas import DataFrame
+from resultsStore import ResultsStore, COLUMN_EXTENSION
+from resultsPlots import graphs, plotResults
+
+COLUMNS = ["group", "concensus_name", "group_type", "group_size", "success_value", "unsuccess_value"]
+
+
+def results(concensus_name, group_types, group_sizes, values):
+    return DataFrame({
+        "group": np.arange(len(values), dtype=np.int32),
+        "concensus_name": concensus_name,
+        "group_type": group_types,
+        "group_size": np.array(group_sizes, dtype=np.int32),
+        "success_value": np.array(values, dtype=np.float64),
+        "unsuccess_value": 100 - np.array(values, dtype=np.float64)
+    }, columns=COLUMNS)
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = ResultsStore(path.join(self.tmp_dir, 'evaluation'))
+        group_types = ['similar', 'similar', 'random', 'random', 'disimilar', 'disimilar']
+        group_sizes = [3, 3, 3, 3, 3, 3]
+        self.store.append(results('avg', group_types, group_sizes, [10., 20., 30., 50., 0., 100.]))
+        self.store.append(results('min', group_types, group_sizes, [40., 40., 10., 20., 60., 70.]))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_append(self):
+        self.assertEqual(len(self.store), 12)
+        frame = ResultsStore(self.store.directory).toDataFrame()
+        self.assertEqual(list(frame.columns), COLUMNS)
+        self.assertEqual(list(frame['concensus_name']), ['avg'] * 6 + ['min'] * 6)
+        self.assertEqual(list(frame['success_value'][6:]), [40., 40., 10., 20., 60., 70.])
+        self.assertTrue(isinstance(self.store.column('success_value'), np.memmap))
+        self.assertRaises(ValueError, self.store.append, DataFrame({'group': [1]}))
+
+    def test_reset(self):
+        store = ResultsStore(self.store.directory, reset=True)
+        self.assertEqual(len(store), 0)
+        self.assertFalse(path.isfile(path.join(store.directory, 'group' + COLUMN_EXTENSION)))
+
+    def test_partial_append(self):
+        # Rows written after the last saved meta are dropped by the next append
+        with open(path.join(self.store.directory, 'success_value' + COLUMN_EXTENSION), 'ab') as f:
+            f.write(np.zeros(3).tobytes())
+        store = ResultsStore(self.store.directory)
+        store.append(results('max', ['random'], [4], [90.]))
+        self.assertEqual(list(store.column('success_value')[-2:]), [70., 90.])
+
+    def test_aggregate(self):
+        summary = self.store.aggregate(['success_value'], ['group_size', 'concensus_name', 'group_type'])
+        self.assertEqual(len(summary), 6)
+        stats = summary.loc[(3, 'avg', 'random')]
+        self.assertEqual(stats[('success_value', 'mean')], np.mean([30., 50.]))
+        self.assertEqual(stats[('success_value', 'std')], np.std([30., 50.]))
+        self.assertEqual(stats[('success_value', 'count')], 2)
+        # t quantile of 1 degree of freedom
+        self.assertAlmostEqual(stats[('success_value', 'ci')], 12.706205 * np.std([30., 50.], ddof=1) / np.sqrt(2), 4)
+
+    def test_plotResults(self):
+        graph = graphs(self.store)[0]
+        self.assertEqual([data['label'] for data in graph['data']], ['avg', 'min'])
+        self.assertEqual(graph['data'][0]['means'], [15., 40., 50.])
+        filenames = plotResults(self.store, self.tmp_dir, processes=1)
+        self.assertEqual(sorted(path.basename(filename) for filename in filenames), ['Success 3_3.png', 'Unsuccess 3_3.png'])
+        self.assertTrue(all(path.isfile(filename) for filename in filenames))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+from os import path
+import unittest
+import tempfile
+import shutil
+import random
+import numpy as np
+from ratingMatrix import RatingMatrix
+from recommender import Recommender
+from datasetGenerator import DatasetGenerator
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+from distances import DistanceEngine
+from similarityStore import SimilarityStore, writeStore, isStore, SIMILARITIES
+
+
+def naiveScores(dense, u, v):
+    # Loop version of the metrics between the users of rows $u and $v of a dense matrix (0 if not rated)
+    a, b = dense[u], dense[v]
+    co_rated = (a > 0) & (b > 0)
+    mean_a, mean_b = a[a > 0].mean(), b[b > 0].mean()
+    movie_means = np.array([column[column > 0].mean() if (column > 0).any() else 0 for column in dense.T])
+    adjusted_a = np.where(a > 0, a - movie_means, 0)
+    adjusted_b = np.where(b > 0, b - movie_means, 0)
+    return {
+        'l1': np.abs(a[co_rated] - b[co_rated]).sum() * (a > 0).sum() / co_rated.sum(),
+        'pearson': ((a[co_rated] - mean_a) * (b[co_rated] - mean_b)).sum() /
+                   np.sqrt(((a[co_rated] - mean_a) ** 2).sum() * ((b[co_rated] - mean_b) ** 2).sum()),
+        'adjusted_cosine': adjusted_a.dot(adjusted_b) / np.linalg.norm(adjusted_a) / np.linalg.norm(adjusted_b),
+        'jaccard': co_rated.sum() / float(((a > 0) | (b > 0)).sum())
+    }
+
+
+class TestSimilarityStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ratings = SyntheticDatasetGenerator(300, 200, mean_ratings=40, seed=1).getRatings()
+        self.matrix = RatingMatrix.fromRatings(self.ratings)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def store(self, metric, k=10):
+        directory = path.join(self.tmp_dir, metric)
+        writeStore(self.matrix, directory, metric, k=k, block_size=64)
+        return SimilarityStore(directory, self.matrix)
+
+    def test_metrics(self):
+        dense = self.matrix.matrix.toarray()
+        for u, v in [(0, 5), (10, 200)]:
+            expected = naiveScores(dense, u, v)
+            for metric, similarity in SIMILARITIES.items():
+                scores, valid = similarity(self.matrix).scores(np.array([u]))
+                self.assertTrue(valid[0, v])
+                self.assertFalse(valid[0, u])
+                self.assertAlmostEqual(scores[0, v], expected[metric])
+
+    def test_neighbours(self):
+        store = self.store('l1')
+        self.assertTrue(isStore(store.directory))
+        user_id = self.matrix.user_ids[0]
+        exact = DistanceEngine(self.matrix).distances(user_id).dropna().drop(user_id).sort_values().head(10)
+        neighbours = store.neighbours(user_id)
+        self.assertEqual(list(neighbours.index), list(exact.index))
+        np.testing.assert_allclose(neighbours.values, exact.values, rtol=1e-6)
+        self.assertEqual(store.toSparse().nnz, (store.neighbour_rows >= 0).sum())
+
+    def test_ranked(self):
+        store = self.store('pearson')
+        scores, valid = SIMILARITIES['pearson'](self.matrix).scores(np.array([0]))
+        candidates = np.arange(100, 300)
+        valid_candidates = candidates[valid[0, candidates]]
+        exact = valid_candidates[np.argsort(-scores[0, valid_candidates], kind='mergesort')]
+        # Among the stored neighbours and scored again when they don't cover the candidates
+        for k in [1, 30]:
+            self.assertEqual(list(store.ranked(0, candidates, k)), list(exact[:k]))
+
+    def test_recommender(self):
+        store = self.store('jaccard')
+        recommender = Recommender(matrix=self.matrix, num_neighbours=5, similarities=store.directory)
+        neighbours = recommender.neighbours(np.array([0, 1]))
+        self.assertEqual(sorted(neighbours[0].indices), sorted(store.neighbour_rows[0, :5]))
+        self.assertEqual(recommender.recommend(self.matrix.user_ids[0], 3).shape, (3,))
+        self.assertRaises(ValueError, Recommender, matrix=self.matrix, similarities=self.store('l1').directory)
+
+    def test_groups(self):
+        store = self.store('l1', k=50)
+        generator = DatasetGenerator(data=self.ratings, similarities=store.directory)
+        self.assertTrue(generator.getSimilarityStore(self.ratings) is generator.getSimilarityStore(self.ratings))
+        self.assertEqual(generator.getSimilarityStore(self.ratings.head(100)), None)
+        groups = list(generator.getGroupUsers(self.ratings, 5, 3, group_types=['similar'], rng=random.Random(1)))
+        self.assertEqual(len(groups), 5)
+        for group, _ in groups:
+            self.assertTrue(len(generator.getCoRatedMovies(self.ratings, group)) >= 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+from os import path, listdir
+import shutil
+import tempfile
+import unittest
+from stageCache import StageCache, fileHash
+
+CURRENT_DIR = path.dirname(path.abspath(__file__))
+DATA_TEST_DIR = path.join(CURRENT_DIR, 'data_test')
+
+
+def stage_a():
+    return 1
+
+
+def stage_b():
+    return 2
+
+
+class TestStageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = StageCache(path.join(self.tmp_dir, 'cache'))
+        self.input_filename = path.join(DATA_TEST_DIR, 'ratings_test.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key(self):
+        key = self.cache.key('filter', {'num_ratings': 20}, inputs=[self.input_filename], code=[stage_a])
+        self.assertEqual(key, self.cache.key('filter', {'num_ratings': 20}, inputs=[self.input_filename], code=[stage_a]))
+        self.assertTrue(key.startswith('filter-'))
+        self.assertNotEqual(key, self.cache.key('filter', {'num_ratings': 10}, inputs=[self.input_filename], code=[stage_a]))
+        self.assertNotEqual(key, self.cache.key('filter', {'num_ratings': 20}, inputs=[path.join(DATA_TEST_DIR, 'matrix_test.csv')], code=[stage_a]))
+        self.assertNotEqual(key, self.cache.key('filter', {'num_ratings': 20}, inputs=[self.input_filename], code=[stage_b]))
+        self.assertNotEqual(key, self.cache.key('filter', {'num_ratings': 20}, inputs=[self.input_filename], code=[stage_a], dependencies=[key]))
+
+    def test_fileHash(self):
+        self.assertEqual(len(fileHash(self.input_filename)), 40)
+        self.assertNotEqual(fileHash(self.input_filename), fileHash(path.join(DATA_TEST_DIR, 'matrix_test.csv')))
+
+    def test_cached(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'groups': [[1, 2], [3, 4]]}
+
+        key = self.cache.key('groups')
+        self.assertFalse(key in self.cache)
+        self.assertEqual(self.cache.cached(key, compute), {'groups': [[1, 2], [3, 4]]})
+        self.assertTrue(key in self.cache)
+        self.assertEqual(self.cache.cached(key, compute), {'groups': [[1, 2], [3, 4]]})
+        self.assertEqual(len(calls), 1)
+        self.assertRaises(KeyError, self.cache.load, self.cache.key('other'))
+
+    def test_evict(self):
+        cache = StageCache(path.join(self.tmp_dir, 'small_cache'), max_bytes=3000)
+        for i in range(5):
+            cache.save(cache.key('stage', {'i': i}), 'x' * 1000)
+        self.assertEqual(len(listdir(cache.directory)), 2)
+        self.assertTrue(cache.key('stage', {'i': 4}) in cache)
+        self.assertFalse(cache.key('stage', {'i': 0}) in cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import shutil
+from os import path
+from pandas import read_csv
+from syntheticDatasetGenerator import SyntheticDatasetGenerator
+
+
+class TestSyntheticDatasetGenerator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.generator = SyntheticDatasetGenerator(2500, 300, mean_ratings=40, min_ratings=20, seed=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_getRatings(self):
+        ratings = self.generator.getRatings()
+        self.assertEqual(list(ratings.columns), ['userId', 'movieId', 'rating', 'timestamp'])
+        self.assertFalse(ratings.duplicated(['userId', 'movieId']).any())
+        self.assertTrue(ratings.rating.isin([i / 2. for i in range(1, 11)]).all())
+        self.assertEqual(ratings.userId.nunique(), 2500)
+        self.assertTrue((ratings.groupby('userId').size() >= 20).all())
+        self.assertTrue(ratings.movieId.between(1, 300).all())
+        self.assertTrue(ratings[['userId', 'movieId']].equals(ratings[['userId', 'movieId']].sort_values(['userId', 'movieId'])))
+
+    def test_seed(self):
+        ratings = self.generator.getRatings()
+        same = SyntheticDatasetGenerator(2500, 300, mean_ratings=40, min_ratings=20, seed=7).getRatings()
+        other = SyntheticDatasetGenerator(2500, 300, mean_ratings=40, min_ratings=20, seed=8).getRatings()
+        self.assertTrue(ratings.equals(same))
+        self.assertFalse(ratings.equals(other))
+
+    def test_iterChunks(self):
+        # The ratings don't depend on the chunk size
+        chunks = list(self.generator.iterChunks(chunk_size=1))
+        self.assertEqual(len(chunks), 3)
+        ratings = chunks[0].append(chunks[1:], ignore_index=True)
+        self.assertTrue(ratings.equals(self.generator.getRatings()))
+
+    def test_write(self):
+        filename = path.join(self.tmp_dir, 'ratings.csv')
+        num_ratings = self.generator.write(filename, chunk_size=1)
+        ratings = read_csv(filename)
+        self.assertEqual(len(ratings), num_ratings)
+        self.assertTrue(ratings.equals(self.generator.getRatings()))
+
+    def test_fromNumRatings(self):
+        generator = SyntheticDatasetGenerator.fromNumRatings(100000, 300, mean_ratings=40, min_ratings=20, seed=7)
+        num_ratings = sum(len(chunk) for chunk in generator.iterChunks())
+        self.assertTrue(90000 < num_ratings < 110000)
+
+
+if __name__ == '__main__':
+    unittest.main()